@@ -0,0 +1,6 @@
+"""part1, part2, part3이 함께 쓰는 모듈
+
+각 part의 config.py가 저장소 루트를 sys.path에 추가하므로 part 폴더에서 실행한 스크립트도
+`from common.result_cache import ResultCache`처럼 import할 수 있습니다. 이 패키지의 모듈은 part의 config를
+import하지 않고 필요한 설정을 인자로 받습니다.
+"""
@@ -0,0 +1,89 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def threads_per_worker(workers):
+    """동시 실행 수가 workers일 때 요청 하나가 쓸 연산 스레드 수 (합이 코어 수를 넘지 않도록)"""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+def configure_threads(threads=None, faiss_threads=None):
+    """torch, FAISS(OpenMP), numpy BLAS의 연산 스레드 수를 함께 설정하고 적용한 값을 반환합니다.
+
+    각 라이브러리가 코어 수만큼 스레드 풀을 따로 만들면 동시 요청이 늘수록 스레드가 코어를 두고 다퉈
+    처리량이 오히려 떨어지므로, 동시 실행 수 x threads가 코어 수를 넘지 않게 맞춥니다.
+    설치되지 않은 라이브러리는 건너뜁니다.
+    """
+    threads = threads or os.cpu_count() or 1
+    faiss_threads = faiss_threads or threads
+    applied = {}
+    try:
+        import torch
+        torch.set_num_threads(threads)
+        applied['torch'] = threads
+    except ImportError:
+        pass
+    try:
+        import faiss
+        faiss.omp_set_num_threads(faiss_threads)
+        applied['faiss'] = faiss_threads
+    except ImportError:
+        pass
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=threads, user_api='blas')
+        applied['blas'] = threads
+    except ImportError:
+        pass
+    return applied
+
+class ConcurrentSearcher:
+    """검색 함수를 제한된 스레드 풀에서 동시에 실행합니다.
+
+    처리 중이거나 대기 중인 요청이 max_pending개에 이르면 submit()이 자리가 날 때까지 기다리므로
+    부하가 몰려도 대기열과 메모리가 무한히 늘지 않습니다. 엔진은 인덱스 스냅샷을 통째로 교체하므로
+    검색 도중 인덱스를 다시 구축하거나 세그먼트를 다시 매핑해도 됩니다.
+    """
+
+    def __init__(self, search, max_workers=None, max_pending=None, threads=None):
+        """
+        Args:
+            search: 검색 함수 (예: engine.search)
+            max_workers: 동시에 실행할 검색 수 (기본값: 코어 수)
+            max_pending: 실행 중 + 대기 중인 요청의 최대 수 (기본값: max_workers * 2)
+            threads: 요청 하나가 쓸 torch/FAISS 연산 스레드 수 (기본값: 코어 수 / max_workers)
+        """
+        self.search = search
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.threads = configure_threads(threads or threads_per_worker(self.max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='search')
+        self._slots = threading.BoundedSemaphore(max_pending or self.max_workers * 2)
+
+    def submit(self, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self.search, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def map(self, queries, **kwargs):
+        """검색어 순서대로 결과를 내보냅니다 (동시에 처리하되 대기 중인 요청 수는 제한)."""
+        pending = deque()
+        for query in queries:
+            if len(pending) >= self.max_workers * 2:
+                yield pending.popleft().result()
+            pending.append(self.submit(query, **kwargs))
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
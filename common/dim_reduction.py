@@ -0,0 +1,99 @@
+import numpy as np
+
+REDUCTION_METHODS = ('pca', 'truncate')
+
+def _normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+class Projection:
+    """카탈로그 벡터로 학습한 차원 축소. 카탈로그와 쿼리 벡터에 똑같이 적용합니다.
+
+    - pca: 카탈로그 벡터의 평균을 빼고 분산이 큰 주성분 dimension개로 사영
+    - truncate: 앞쪽 dimension개 성분만 사용 (matryoshka 방식으로 학습된 임베딩용, 예: text-embedding-3)
+    사영한 벡터는 다시 L2 정규화하므로 내적이 그대로 코사인 유사도입니다.
+    """
+
+    def __init__(self, method, mean, components, explained_variance=None):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"지원하지 않는 차원 축소 방식: {method} (사용 가능: {list(REDUCTION_METHODS)})")
+        self.method = method
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (원래 차원, 축소 차원)
+        self.explained_variance = explained_variance
+        self.source_dimension, self.dimension = self.components.shape
+
+    @classmethod
+    def fit(cls, vectors, dimension, method='pca'):
+        """(N, D) 카탈로그 벡터로 D -> dimension 사영을 학습합니다."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        source_dimension = vectors.shape[1]
+        if not 0 < dimension <= source_dimension:
+            raise ValueError(f"축소 차원은 1 이상 {source_dimension} 이하여야 합니다: {dimension}")
+        if method == 'truncate':
+            return cls(method, np.zeros(source_dimension, dtype=np.float32),
+                       np.eye(source_dimension, dimension, dtype=np.float32))
+        if method != 'pca':
+            raise ValueError(f"지원하지 않는 차원 축소 방식: {method} (사용 가능: {list(REDUCTION_METHODS)})")
+        mean = vectors.mean(axis=0)
+        # D x D 공분산의 고유 분해 (N이 커도 D 크기 행렬만 다룸)
+        centered = vectors - mean
+        covariance = (centered.T @ centered).astype(np.float64) / max(1, len(vectors) - 1)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:dimension]
+        explained = float(eigenvalues[order].sum() / max(eigenvalues.sum(), 1e-12))
+        return cls(method, mean, eigenvectors[:, order], explained)
+
+    def transform(self, vectors):
+        """벡터(들)를 축소 차원으로 사영하고 L2 정규화합니다."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        reduced = (vectors - self.mean) @ self.components
+        return np.ascontiguousarray(_normalize_rows(reduced), dtype=np.float32)
+
+    def arrays(self):
+        """세그먼트에 기록할 배열"""
+        return {'projection_mean': self.mean, 'projection_components': self.components}
+
+    def describe(self):
+        """manifest에 기록할 설명"""
+        return {'method': self.method, 'source_dimension': int(self.source_dimension), 'dimension': int(self.dimension),
+                'explained_variance': self.explained_variance}
+
+    @classmethod
+    def from_segment(cls, segment, description):
+        if 'projection_components' not in segment.arrays:
+            return None
+        return cls(description['method'], segment['projection_mean'], segment['projection_components'],
+                   description.get('explained_variance'))
+
+def recall_at_k(full_queries, full_catalog, reduced_queries, reduced_catalog, ks=(1, 5, 10), exclude=None,
+                chunk_size=1024):
+    """축소 전 차원의 상위 k개 중 축소 후 상위 k개에도 남은 비율 (k별 평균)
+
+    exclude: 쿼리별로 이웃에서 뺄 카탈로그 행 번호 (쿼리가 카탈로그 벡터 자신일 때)
+    """
+    ks = [k for k in ks if k <= len(full_catalog) - (1 if exclude is not None else 0)]
+    if not ks:
+        return {}
+    hits = {k: 0.0 for k in ks}
+    max_k = max(ks)
+    for start in range(0, len(full_queries), chunk_size):
+        end = min(start + chunk_size, len(full_queries))
+        full_scores = full_queries[start:end] @ full_catalog.T
+        reduced_scores = reduced_queries[start:end] @ reduced_catalog.T
+        if exclude is not None:
+            rows = np.arange(end - start)
+            full_scores[rows, exclude[start:end]] = -np.inf
+            reduced_scores[rows, exclude[start:end]] = -np.inf
+        full_top = np.argsort(-full_scores, axis=1, kind='stable')[:, :max_k]
+        reduced_top = np.argsort(-reduced_scores, axis=1, kind='stable')[:, :max_k]
+        for k in ks:
+            for full_row, reduced_row in zip(full_top[:, :k], reduced_top[:, :k]):
+                hits[k] += len(np.intersect1d(full_row, reduced_row, assume_unique=True)) / k
+    return {k: hits[k] / max(1, len(full_queries)) for k in ks}
+
+def sample_rows(count, limit, seed=0):
+    """평가에 쓸 행 번호를 최대 limit개 고정된 시드로 뽑습니다."""
+    if count <= limit:
+        return np.arange(count)
+    return np.sort(np.random.default_rng(seed).choice(count, limit, replace=False))
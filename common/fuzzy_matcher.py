@@ -0,0 +1,171 @@
+import re
+from collections import Counter, defaultdict
+from itertools import combinations
+
+# 한글 음절 = 0xAC00 + (초성 * 21 + 중성) * 28 + 종성
+CHOSEONG = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+JUNGSEONG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+JONGSEONG = ' ㄱㄲㄳㄴㄵㄶㄷㄹㄺㄻㄼㄽㄾㄿㅀㅁㅂㅄㅅㅆㅇㅈㅊㅋㅌㅍㅎ'
+
+TOKEN_PATTERN = re.compile(r'[^\W_]+')
+
+# 메뉴 용어에는 없지만 검색어 끝에 자주 붙는 어미/조사 (교정 대상에서 제외)
+QUERY_ENDINGS = ('해주세요', '하려면', '해줘', '하기', '하는', '에서', '으로', '을', '를', '은', '는', '이', '가', '로', '의')
+
+def decompose(text):
+    """한글 음절을 자모로 분해합니다 (한글이 아닌 글자는 소문자로 그대로 둠)."""
+    jamo = []
+    for ch in text.lower():
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            jamo.append(CHOSEONG[code // 588])
+            jamo.append(JUNGSEONG[(code % 588) // 28])
+            if code % 28:
+                jamo.append(JONGSEONG[code % 28])
+        else:
+            jamo.append(ch)
+    return ''.join(jamo)
+
+def edit_distance(a, b, max_distance):
+    """인접 전치를 포함한 편집 거리 (max_distance를 넘으면 max_distance + 1)"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class FuzzyMatcher:
+    """자모 단위 symmetric-delete 색인으로 오타 난 검색어를 메뉴 용어로 교정합니다.
+
+    메뉴의 page_name, Service, hierarchy에서 나온 단어를 자모로 분해해 색인하고,
+    검색어의 단어가 색인에 없으면 편집 거리가 가장 가까운 단어를 검색어에 덧붙입니다.
+    삭제 변형 색인은 메뉴 수천 개에 수십 MiB이므로 메뉴 용어에 없는 단어를 처음 찾을 때 만듭니다.
+    """
+
+    def __init__(self, terms, max_distance=2):
+        self.max_distance = max_distance
+        self.frequency = Counter(term for term in terms if len(term) >= 2)
+        self.terms = list(self.frequency)
+        self.jamo_terms = [decompose(term) for term in self.terms]
+        self.vocabulary = set(self.terms)
+        self._deletes = None
+
+    @property
+    def deletes(self):
+        """자모 삭제 변형 -> 용어 번호 목록 (처음 조회할 때 만듦)"""
+        deletes = self._deletes
+        if deletes is None:
+            # 동시에 처음 조회하면 중복으로 만들 수 있지만 결과는 같음
+            deletes = defaultdict(list)
+            for term_id, jamo in enumerate(self.jamo_terms):
+                for variant in self._delete_variants(jamo, self.max_distance):
+                    deletes[variant].append(term_id)
+            self._deletes = deletes
+        return deletes
+
+    @classmethod
+    def from_menu_data(cls, menu_data, max_distance=2):
+        terms = []
+        for item in menu_data:
+            texts = [item.get('page_name', ''), item.get('Service', '')] + list(item.get('hierarchy', []))
+            for text in texts:
+                terms.extend(TOKEN_PATTERN.findall(text.lower()))
+        return cls(terms, max_distance)
+
+    @staticmethod
+    def _delete_variants(jamo, max_distance):
+        variants = {jamo}
+        for distance in range(1, min(max_distance, len(jamo) - 1) + 1):
+            for positions in combinations(range(len(jamo)), distance):
+                variants.add(''.join(ch for i, ch in enumerate(jamo) if i not in positions))
+        return variants
+
+    def _allowed_distance(self, jamo):
+        # 짧은 단어는 조금만 틀려도 다른 단어가 되므로 허용 거리를 줄임
+        if len(jamo) < 4:
+            return 0
+        if len(jamo) < 9:
+            return min(1, self.max_distance)
+        return self.max_distance
+
+    def lookup(self, word, max_distance=None):
+        """편집 거리 안에 있는 메뉴 용어를 (용어, 거리) 목록으로 반환합니다 (가까운 순, 같으면 자주 쓰이는 순)."""
+        jamo = decompose(word)
+        if max_distance is None:
+            max_distance = self._allowed_distance(jamo)
+        max_distance = min(max_distance, self.max_distance)
+
+        deletes = self.deletes
+        candidates = set()
+        for variant in self._delete_variants(jamo, max_distance):
+            candidates.update(deletes.get(variant, ()))
+
+        matches = []
+        for term_id in candidates:
+            distance = edit_distance(jamo, self.jamo_terms[term_id], max_distance)
+            if distance <= max_distance:
+                matches.append((self.terms[term_id], distance))
+        matches.sort(key=lambda m: (m[1], -self.frequency[m[0]]))
+        return matches
+
+    def correct(self, word):
+        """단어 하나를 메뉴 용어로 교정합니다. 메뉴 용어이거나 메뉴 용어로 나눌 수 있으면 그대로, 고칠 수 없으면 None
+
+        검색어 끝의 어미/조사('하기', '을' 등)는 떼고 앞부분만 교정해 그 메뉴 용어를 반환합니다.
+        붙여 쓴 단어를 조각마다 교정하면 메뉴에 없는 합성어가 생기므로(예: '적금만기' → '적금단기')
+        단어 전체가 메뉴 용어 하나와 가까울 때만 교정하고, 편집 거리가 같은 후보가 둘 이상이면 교정하지 않습니다.
+        """
+        if len(word) < 2 or self.is_known(word):
+            return word
+        candidates = []
+        for ending in QUERY_ENDINGS:
+            if word.endswith(ending) and len(word) - len(ending) >= 2:
+                stem = word[:-len(ending)]
+                if self.is_known(stem):
+                    return word
+                match = self._best_match(stem)
+                if match:
+                    candidates.append(match)
+        match = self._best_match(word)
+        if match:
+            candidates.append(match)
+        candidates.sort(key=lambda m: m[1])
+        if not candidates or (len(candidates) > 1 and candidates[1][1] == candidates[0][1]
+                              and candidates[1][0] != candidates[0][0]):
+            return None
+        return candidates[0][0]
+
+    def is_known(self, word):
+        """메뉴 용어이거나 메뉴 용어 여러 개를 붙여 쓴 단어인지 (예: '적금' + '만기')"""
+        word = word.lower()
+        # splittable[i]: word[:i]를 메뉴 용어(2글자 이상)로 나눌 수 있는지
+        splittable = [True] + [False] * len(word)
+        for end in range(2, len(word) + 1):
+            splittable[end] = any(splittable[start] and word[start:end] in self.vocabulary
+                                  for start in range(end - 1))
+        return splittable[-1]
+
+    def _best_match(self, word):
+        matches = self.lookup(word)
+        if not matches or (len(matches) > 1 and matches[1][1] == matches[0][1]):
+            return None
+        return matches[0]
+
+    def rewrite(self, query):
+        """색인에 없는 단어를 교정한 메뉴 용어를 원래 검색어 뒤에 덧붙여 반환합니다 (교정할 단어가 없으면 그대로)."""
+        corrections = []
+        for word in TOKEN_PATTERN.findall(query):
+            corrected = self.correct(word)
+            if corrected and corrected != word and corrected not in corrections:
+                corrections.append(corrected)
+        return ' '.join([query] + corrections)
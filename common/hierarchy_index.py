@@ -0,0 +1,137 @@
+import numpy as np
+
+def section_path(item):
+    """메뉴 한 건이 속한 구역 경로: (Category, Service, hierarchy의 상위 단계들)
+
+    hierarchy의 마지막 단계가 페이지 자신이면 빼고, 첫 단계가 Service와 같으면 중복이므로 뺍니다.
+    """
+    hierarchy = [str(name).strip() for name in item.get('hierarchy') or []]
+    hierarchy = [name for name in hierarchy if name]
+    if hierarchy and hierarchy[-1] == str(item.get('page_name', '')).strip():
+        hierarchy = hierarchy[:-1]
+    service = str(item.get('Service', '')).strip()
+    if hierarchy and hierarchy[0] == service:
+        hierarchy = hierarchy[1:]
+    top = [name for name in (str(item.get('Category', '')).strip(), service) if name]
+    return tuple(top + hierarchy)
+
+class HierarchyTree:
+    """메뉴 계층(Category > Service > hierarchy) 트리와 구역별 중심 벡터
+
+    메뉴 행은 트리를 깊이 우선으로 훑은 순서(order)로 배치해 두므로 구역마다 하위 메뉴가
+    order[starts[node]:ends[node]] 연속 구간이고, 그 구역에 바로 달린 메뉴는 order[starts[node]:direct_ends[node]]입니다.
+    구역 중심 벡터는 하위 메뉴 벡터 평균을 정규화한 것으로, 쿼리와의 내적으로 구역이 유망한지 판단합니다.
+    """
+
+    def __init__(self, paths, parents, children, order, starts, direct_ends, ends, centroids):
+        self.paths = paths
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.children = children  # 노드별 자식 노드 번호 배열
+        self.order = np.asarray(order, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.direct_ends = np.asarray(direct_ends, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        self.counts = self.ends - self.starts
+        self.centroids = centroids
+
+    @classmethod
+    def build(cls, menu_data, vectors):
+        """메뉴 데이터와 메뉴별 (N, D) 벡터로 트리를 만듭니다 (노드 0은 루트)."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        node_ids = {(): 0}
+        paths, parents, members = [()], [-1], [[]]
+        for row, item in enumerate(menu_data):
+            path = section_path(item)
+            node = 0
+            for depth in range(1, len(path) + 1):
+                child = node_ids.get(path[:depth])
+                if child is None:
+                    child = node_ids[path[:depth]] = len(paths)
+                    paths.append(path[:depth])
+                    parents.append(node)
+                    members.append([])
+                node = child
+            members[node].append(row)
+
+        children = [[] for _ in paths]
+        for node in range(1, len(paths)):
+            children[parents[node]].append(node)
+
+        # 깊이 우선 순서로 행을 배치: 바로 달린 메뉴 다음에 자식 구역들의 메뉴
+        count = len(paths)
+        order, starts, direct_ends, ends = [], [0] * count, [0] * count, [0] * count
+        stack = [(0, False)]
+        while stack:
+            node, finished = stack.pop()
+            if finished:
+                ends[node] = len(order)
+                continue
+            starts[node] = len(order)
+            order.extend(members[node])
+            direct_ends[node] = len(order)
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children[node]))
+
+        # 자식 노드 번호는 항상 부모보다 크므로 뒤에서부터 부모로 벡터 합을 누적
+        sums = np.zeros((count, vectors.shape[1]), dtype=np.float64)
+        for node in range(count - 1, -1, -1):
+            if members[node]:
+                sums[node] += vectors[members[node]].sum(axis=0)
+            if node:
+                sums[parents[node]] += sums[node]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.ascontiguousarray(sums / np.maximum(norms, 1e-12), dtype=np.float32)
+        return cls(paths, parents, [np.asarray(c, dtype=np.int64) for c in children], order, starts, direct_ends,
+                   ends, centroids)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def descend(self, query_vector, beam=4, leaf_size=32):
+        """루트부터 단계마다 중심 벡터 점수가 높은 구역 beam개로만 내려가며 점수를 매길 메뉴 행을 모읍니다.
+
+        하위 메뉴가 leaf_size개 이하인 구역은 더 내려가지 않고 통째로 후보에 넣습니다.
+        Returns: (후보 메뉴 행 번호, 점수를 매긴 구역 번호, 그 구역 점수)
+        """
+        frontier = [0]
+        segments, nodes, scores = [], [], []
+        while frontier:
+            child_ids = []
+            for node in frontier:
+                if self.counts[node] <= leaf_size:
+                    segments.append(self.order[self.starts[node]:self.ends[node]])
+                    continue
+                segments.append(self.order[self.starts[node]:self.direct_ends[node]])
+                child_ids.append(self.children[node])
+            if not child_ids:
+                break
+            child_ids = np.concatenate(child_ids)
+            if not len(child_ids):
+                break
+            child_scores = self.centroids[child_ids] @ query_vector
+            nodes.append(child_ids)
+            scores.append(child_scores)
+            keep = min(beam, len(child_ids))
+            frontier = child_ids[np.argpartition(-child_scores, keep - 1)[:keep]].tolist()
+        rows = np.concatenate(segments) if segments else np.zeros(0, dtype=np.int64)
+        if not nodes:
+            return rows, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return rows, np.concatenate(nodes), np.concatenate(scores)
+
+    def top_sections(self, nodes, scores, k, min_items=2):
+        """점수를 매긴 구역 중 메뉴가 min_items개 이상인 상위 k개의 (구역 번호, 점수)"""
+        eligible = self.counts[nodes] >= min_items
+        nodes, scores = nodes[eligible], scores[eligible]
+        order = np.argsort(-scores, kind='stable')[:k]
+        return nodes[order], scores[order]
+
+    def section(self, node):
+        """구역 결과 한 건 (경로, 메뉴 수)"""
+        path = self.paths[node]
+        return {
+            'section': ' > '.join(path),
+            'path': list(path),
+            'category': path[0] if path else None,
+            'service': path[1] if len(path) > 1 else None,
+            'item_count': int(self.counts[node])
+        }
@@ -0,0 +1,258 @@
+import json
+import mmap
+import os
+import tempfile
+import time
+from collections.abc import Sequence
+
+import numpy as np
+
+# 세그먼트 파일 구조
+#   MAGIC(8) | 헤더 길이(8, little-endian) | JSON 헤더 | 배열 영역 (헤더 끝 다음 ALIGNMENT 경계에서 시작)
+# 헤더: {"format": FORMAT_VERSION, "meta": {...}, "arrays": {이름: {"dtype", "shape", "offset"}}, "records": {...}}
+# offset은 배열 영역 시작 기준이며 각 배열은 ALIGNMENT 바이트 경계에 정렬
+# records: 메뉴 dict 저장 방식. "interned"는 문자열 테이블 + 필드별 정수 id 배열, "json"은 레코드별 JSON
+MAGIC = b'MENUSEG1'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def _encode_strings(strings):
+    blobs = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(blobs), dtype=np.uint8)
+
+def encode_records(records):
+    """메뉴 dict 목록을 세그먼트 배열로 직렬화합니다. (배열 dict, 헤더의 records 항목)을 반환합니다.
+
+    모든 레코드가 같은 키를 갖고 값이 문자열 또는 문자열 목록이면 문자열을 한 번씩만 저장(intern)하고
+    필드별 id 배열로 나타내며, 그렇지 않으면 레코드별 JSON으로 저장합니다.
+    """
+    first = records[0] if records else {}
+    kinds = {key: 'list' if isinstance(value, list) else 'str' for key, value in first.items()}
+
+    def internable(record):
+        if not isinstance(record, dict) or record.keys() != kinds.keys():
+            return False
+        for key, kind in kinds.items():
+            value = record[key]
+            if kind == 'str' and not isinstance(value, str):
+                return False
+            if kind == 'list' and not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+                return False
+        return True
+
+    if not all(internable(record) for record in records):
+        offsets, blob = _encode_strings([json.dumps(record, ensure_ascii=False) for record in records])
+        return {'record_offsets': offsets, 'record_blob': blob}, {'encoding': 'json', 'count': len(records)}
+
+    table = {}
+    def intern(string):
+        return table.setdefault(string, len(table))
+
+    arrays = {}
+    for i, (key, kind) in enumerate(kinds.items()):
+        if kind == 'str':
+            arrays[f'record_field_{i}'] = np.array([intern(record[key]) for record in records], dtype=np.int32)
+        else:
+            lengths = [len(record[key]) for record in records]
+            offsets = np.zeros(len(records) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            arrays[f'record_field_{i}_offsets'] = offsets
+            arrays[f'record_field_{i}'] = np.array([intern(v) for record in records for v in record[key]], dtype=np.int32)
+    arrays['string_offsets'], arrays['string_blob'] = _encode_strings(list(table))
+    return arrays, {'encoding': 'interned', 'count': len(records), 'fields': [[key, kind] for key, kind in kinds.items()]}
+
+def write_segment(path, arrays, meta, records=None):
+    """배열과 메타데이터를 세그먼트 파일로 기록하고 os.replace로 원자적으로 교체합니다.
+
+    이미 기존 파일을 매핑한 프로세스는 이전 버전을 계속 읽고, 새로 여는 프로세스는 새 버전을 읽습니다.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    records_header = None
+    if records is not None:
+        record_arrays, records_header = encode_records(records)
+        arrays.update(record_arrays)
+
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'format': FORMAT_VERSION, 'meta': meta, 'arrays': layout, 'records': records_header},
+                        ensure_ascii=False).encode('utf-8')
+    data_start = _align(16 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.segment-', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                array.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class MappedRecords(Sequence):
+    """세그먼트에 저장된 메뉴 dict를 접근할 때만 디코딩하는 읽기 전용 시퀀스"""
+
+    def __init__(self, arrays, spec):
+        self.arrays = arrays
+        self.spec = spec
+        self._count = spec['count']
+
+    def __len__(self):
+        return self._count
+
+    def _string(self, offsets, blob, idx):
+        return blob[int(offsets[idx]):int(offsets[idx + 1])].tobytes().decode('utf-8')
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        arrays = self.arrays
+        if self.spec['encoding'] == 'json':
+            return json.loads(self._string(arrays['record_offsets'], arrays['record_blob'], idx))
+
+        string_offsets, string_blob = arrays['string_offsets'], arrays['string_blob']
+        record = {}
+        for i, (key, kind) in enumerate(self.spec['fields']):
+            ids = arrays[f'record_field_{i}']
+            if kind == 'str':
+                record[key] = self._string(string_offsets, string_blob, ids[idx])
+            else:
+                offsets = arrays[f'record_field_{i}_offsets']
+                record[key] = [self._string(string_offsets, string_blob, string_id)
+                               for string_id in ids[int(offsets[idx]):int(offsets[idx + 1])]]
+        return record
+
+class IndexSegment:
+    """읽기 전용으로 매핑한 세그먼트 파일
+
+    배열은 mmap 위의 numpy 뷰라 같은 파일을 연 워커들이 페이지 캐시의 한 사본을 공유합니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.inode = os.fstat(f.fileno()).st_ino
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:8] != MAGIC:
+            raise ValueError(f"세그먼트 파일 형식이 아닙니다: {path}")
+        header_size = int.from_bytes(self._mmap[8:16], 'little')
+        header = json.loads(self._mmap[16:16 + header_size].decode('utf-8'))
+        if header.get('format') != FORMAT_VERSION:
+            raise ValueError(f"지원하지 않는 세그먼트 형식 버전: {header.get('format')}")
+        self.meta = header['meta']
+        data_start = _align(16 + header_size)
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            if count == 0:
+                self.arrays[name] = np.empty(spec['shape'], dtype=dtype)
+                continue
+            self.arrays[name] = np.frombuffer(self._mmap, dtype=dtype, count=count,
+                                              offset=data_start + spec['offset']).reshape(spec['shape'])
+        self.records = MappedRecords(self.arrays, header['records']) if header.get('records') else None
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def is_stale(self):
+        """같은 경로에 새 버전이 게시되었는지 여부"""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except FileNotFoundError:
+            return False
+
+class MappedFlatIndex:
+    """매핑된 (정규화된) 벡터 위의 내적 검색. faiss.IndexFlatIP.search와 같은 형식으로 반환합니다.
+
+    FAISS 인덱스에 벡터를 넣으면 프로세스마다 사본이 생기므로 세그먼트에서 읽은 벡터는 이 클래스로 검색합니다.
+    """
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.ntotal, self.d = vectors.shape
+
+    def search(self, queries, k):
+        return self.top_k(queries @ self.vectors.T, k)
+
+    @staticmethod
+    def top_k(scores, k):
+        """(Q, N) 점수 행렬에서 행마다 부분 정렬로 상위 k개의 (점수, 인덱스)를 구합니다 (모자라면 인덱스 -1)."""
+        k_found = min(k, scores.shape[1])
+        top_scores = np.full((len(scores), k), -np.inf, dtype=np.float32)
+        top_indices = np.full((len(scores), k), -1, dtype=np.int64)
+        if k_found:
+            top = np.argpartition(-scores, k_found - 1, axis=1)[:, :k_found]
+            top_values = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_values, axis=1, kind='stable')
+            top_indices[:, :k_found] = np.take_along_axis(top, order, axis=1)
+            top_scores[:, :k_found] = np.take_along_axis(top_values, order, axis=1)
+        return top_scores, top_indices
+
+# 인덱스 아티팩트: 세그먼트의 meta에 아래 manifest를 담은 파일 (build_index.py로 생성)
+MANIFEST_KEYS = ('engine', 'version', 'model', 'dimension', 'weights', 'data_hash', 'record_count', 'built_at', 'timings')
+
+def make_manifest(engine, model, dimension, weights, data_hash, record_count, timings=None, **extra):
+    built_at = time.time()
+    manifest = {
+        'engine': engine,
+        # 빌드 시각 + 데이터 해시 앞부분 (정렬하면 빌드 순서)
+        'version': time.strftime('%Y%m%d%H%M%S', time.gmtime(built_at)) + '-' + data_hash[:8],
+        'model': model,
+        'dimension': int(dimension),
+        'weights': weights,
+        'data_hash': data_hash,
+        'record_count': int(record_count),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(built_at)),
+        'timings': timings or {}
+    }
+    manifest.update(extra)
+    return manifest
+
+def check_manifest(segment, engine):
+    """세그먼트의 manifest가 이 엔진이 읽을 수 있는 아티팩트인지 확인하고 manifest를 반환합니다."""
+    manifest = segment.meta
+    missing = [key for key in MANIFEST_KEYS if key not in manifest]
+    if missing:
+        raise ValueError(f"아티팩트 manifest에 필요한 항목이 없습니다: {missing} ({segment.path})")
+    if manifest['engine'] != engine:
+        raise ValueError(f"{engine} 아티팩트가 아닙니다: engine={manifest['engine']} ({segment.path})")
+    if segment.records is None or len(segment.records) != manifest['record_count']:
+        raise ValueError(f"메뉴 데이터 수가 manifest와 다릅니다 ({segment.path})")
+    field_embeddings = segment.arrays.get('field_embeddings')
+    if field_embeddings is None or field_embeddings.shape[1:] != (manifest['record_count'], manifest['dimension']):
+        raise ValueError(f"필드 벡터 크기가 manifest와 다릅니다 ({segment.path})")
+    return manifest
+
+def publish_artifact(directory, name, arrays, manifest, records):
+    """<name>-<version>.seg로 기록한 뒤 <name>.seg 심볼릭 링크를 새 버전으로 원자적으로 교체합니다.
+
+    이전 버전 파일은 남겨 두므로 링크만 되돌리면 롤백할 수 있습니다. (버전 파일 경로, 링크 경로)를 반환합니다.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}-{manifest['version']}.seg")
+    write_segment(path, arrays, manifest, records)
+    link = os.path.join(directory, f"{name}.seg")
+    tmp_link = f"{link}.{os.getpid()}.tmp"
+    os.symlink(os.path.basename(path), tmp_link)
+    os.replace(tmp_link, link)
+    return path, link
@@ -0,0 +1,221 @@
+import random
+import threading
+import time
+from typing import Dict, Optional
+import httpx
+import openai
+from openai import OpenAI
+
+# 재시도하면 성공할 수 있는 오류 (네트워크, 타임아웃, 속도 제한, 서버 오류)
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError
+)
+
+class CircuitOpenError(RuntimeError):
+    """회로 차단기가 열려 있어 요청을 보내지 않았음"""
+
+class DeadlineExceededError(TimeoutError):
+    """재시도를 포함한 전체 제한 시간 초과"""
+
+def estimate_tokens(text: str) -> int:
+    """토크나이저 없이 토큰 수를 보수적으로 추정 (ASCII 4자당 1토큰, 한글 등은 글자당 1토큰)"""
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+class TokenBucket:
+    """분당 토큰 수 제한"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int, deadline: float):
+        """토큰이 찰 때까지 기다립니다. deadline(monotonic)까지 못 얻으면 DeadlineExceededError."""
+        tokens = min(float(tokens), self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            if now + wait > deadline:
+                raise DeadlineExceededError("토큰 속도 제한 대기 시간이 제한 시간을 넘습니다.")
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """연속 실패가 쌓이면 일정 시간 요청을 차단하고, 이후 한 번의 시험 요청으로 복구 여부를 확인"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            # 반열림 상태: 시험 요청 하나만 통과
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+class _Endpoint:
+    """OpenAI 클라이언트의 create()와 같은 모양으로 호출되는 엔드포인트"""
+
+    def __init__(self, owner: 'ResilientOpenAIClient', name: str, create):
+        self._owner = owner
+        self._name = name
+        self._create = create
+
+    def create(self, **kwargs):
+        return self._owner.call(self._name, self._create, **kwargs)
+
+class _Namespace:
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+class ResilientOpenAIClient:
+    """연결 풀, 엔드포인트별 동시성/토큰 속도 제한, 지터 재시도, 제한 시간, 회로 차단기를 갖춘 OpenAI 클라이언트
+
+    `client.chat.completions.create(...)`, `client.embeddings.create(...)` 형태로 OpenAI 클라이언트와 같이 사용합니다.
+    회로가 열려 있으면 네트워크 대기 없이 바로 CircuitOpenError를 던집니다.
+    """
+
+    # from_config()가 part의 config 모듈에서 읽는 설정 이름
+    CONFIG_NAMES = {
+        'api_key': 'OPENAI_API_KEY', 'base_url': 'OPENAI_BASE_URL', 'timeout': 'OPENAI_TIMEOUT',
+        'deadline': 'OPENAI_DEADLINE', 'max_retries': 'OPENAI_MAX_RETRIES', 'max_connections': 'OPENAI_MAX_CONNECTIONS',
+        'concurrency': 'OPENAI_CONCURRENCY', 'tokens_per_minute': 'OPENAI_TOKENS_PER_MINUTE',
+        'breaker_failures': 'OPENAI_BREAKER_FAILURES', 'breaker_reset': 'OPENAI_BREAKER_RESET'
+    }
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 timeout: float = 10.0, deadline: float = 30.0, max_retries: int = 3, max_connections: int = 20,
+                 concurrency: Optional[Dict[str, int]] = None, tokens_per_minute: Optional[Dict[str, int]] = None,
+                 breaker_failures: int = 5, breaker_reset: float = 30.0):
+        concurrency = concurrency or {}
+        tokens_per_minute = tokens_per_minute or {}
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = 0.5
+        self.backoff_max = 8.0
+
+        # 재시도는 이 클래스에서 처리하므로 SDK 자체 재시도는 끔
+        self._client = OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            max_retries=0,
+            http_client=httpx.Client(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=timeout
+            )
+        )
+
+        endpoints = ('chat', 'embeddings')
+        self._semaphores = {name: threading.BoundedSemaphore(concurrency.get(name, 4)) for name in endpoints}
+        self._buckets = {name: TokenBucket(tokens_per_minute[name]) for name in endpoints if tokens_per_minute.get(name)}
+        self.breakers = {name: CircuitBreaker(breaker_failures, breaker_reset) for name in endpoints}
+
+        self.chat = _Namespace(completions=_Endpoint(self, 'chat', self._client.chat.completions.create))
+        self.embeddings = _Endpoint(self, 'embeddings', self._client.embeddings.create)
+
+    @classmethod
+    def from_config(cls, config, **overrides) -> 'ResilientOpenAIClient':
+        """part의 config 모듈에 있는 OPENAI_* 설정으로 만듭니다 (overrides가 우선)."""
+        settings = {name: getattr(config, key) for name, key in cls.CONFIG_NAMES.items() if hasattr(config, key)}
+        settings.update(overrides)
+        return cls(**settings)
+
+    def is_available(self, endpoint: str) -> bool:
+        """회로가 닫혀 있어(또는 시험 요청 가능해) 요청을 보낼 수 있는지 여부"""
+        return not self.breakers[endpoint].is_open
+
+    def _estimate_request_tokens(self, endpoint: str, kwargs) -> int:
+        if endpoint == 'chat':
+            prompt = "".join(str(message.get('content', '')) for message in kwargs.get('messages', []))
+            return estimate_tokens(prompt) + int(kwargs.get('max_tokens') or 0)
+        inputs = kwargs.get('input', '')
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return sum(estimate_tokens(text) for text in inputs)
+
+    def call(self, endpoint: str, create, deadline: Optional[float] = None, **kwargs):
+        """제한 시간 안에서 재시도하며 요청을 보냅니다."""
+        breaker = self.breakers[endpoint]
+        if not breaker.allow():
+            raise CircuitOpenError(f"OpenAI {endpoint} 회로가 열려 있습니다.")
+
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        try:
+            bucket = self._buckets.get(endpoint)
+            if bucket is not None:
+                bucket.acquire(self._estimate_request_tokens(endpoint, kwargs), deadline_at)
+
+            semaphore = self._semaphores[endpoint]
+            if not semaphore.acquire(timeout=max(0.0, deadline_at - time.monotonic())):
+                raise DeadlineExceededError(f"OpenAI {endpoint} 동시 요청 대기 시간 초과")
+        except DeadlineExceededError:
+            # 로컬 대기로 인한 초과는 서버 상태와 무관하므로 회로 실패로 세지 않음
+            if breaker.probing:
+                breaker.record_failure()
+            raise
+
+        try:
+            attempt = 0
+            while True:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    breaker.record_failure()
+                    raise DeadlineExceededError(f"OpenAI {endpoint} 요청 제한 시간 초과")
+                try:
+                    response = create(timeout=min(self.timeout, remaining), **kwargs)
+                    breaker.record_success()
+                    return response
+                except RETRYABLE_ERRORS as e:
+                    attempt += 1
+                    if attempt > self.max_retries:
+                        breaker.record_failure()
+                        raise
+                    # 지수 백오프 + 전체 지터
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1))))
+                    if time.monotonic() + delay >= deadline_at:
+                        breaker.record_failure()
+                        raise DeadlineExceededError(f"OpenAI {endpoint} 요청 제한 시간 초과: {e}") from e
+                    time.sleep(delay)
+                except Exception:
+                    # 잘못된 요청(400, 인증 오류 등)은 서버 장애가 아니므로 회로를 열지 않음
+                    if breaker.probing:
+                        breaker.record_success()
+                    raise
+        finally:
+            semaphore.release()
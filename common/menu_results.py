@@ -0,0 +1,30 @@
+from typing import Any, Dict
+
+def convert_result(row: Dict[str, Any]) -> Dict[str, Any]:
+    """part1 DataFrame 행 또는 part2 결과 dict 하나를 part3 벡터 검색 결과 형식으로 변환 (part3 결과는 그대로)"""
+    if 'menu_name' in row:
+        return row
+    if 'page_name' in row:
+        menu_data = {
+            'Category': row['Category'],
+            'Service': row['Service'],
+            'page_name': row['page_name'],
+            'hierarchy': list(row.get('hierarchy', []))
+        }
+        score = float(row['weighted_similarity'])
+    else:
+        menu_data = {
+            'Category': row['category'],
+            'Service': row['service'],
+            'page_name': row['menu_item'],
+            'hierarchy': []
+        }
+        score = float(row['weighted_score'])
+
+    return {
+        'menu_name': menu_data['page_name'],
+        'menu_data': menu_data,
+        'vector_score': score,
+        'keyword_score': 0.0,
+        'vector_similarity': score
+    }
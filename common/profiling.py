@@ -0,0 +1,108 @@
+import cProfile
+import itertools
+import logging
+import os
+import random
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger(__name__)
+
+class Profiler:
+    """요청 단위 cProfile 캡처와 인덱스 구축 등의 tracemalloc 메모리 보고 (모두 opt-in)
+
+    - sample_rate 비율의 요청(또는 profile=True로 요청한 검색)만 cProfile로 기록해 .prof 파일로 저장
+      (snakeviz, flameprof, `python -m pstats` 등으로 확인)
+    - trace_memory=True이면 memory()로 감싼 구간의 최대/잔존 메모리와 할당이 많은 코드 위치를 보고
+    꺼져 있으면 sampled()는 비교 한 번으로 False, memory()는 아무것도 하지 않는 컨텍스트를 반환합니다.
+    """
+
+    def __init__(self, output_dir='profiles', sample_rate=0.0, trace_memory=False, top_allocations=10):
+        self.output_dir = str(output_dir)
+        self.sample_rate = sample_rate
+        self.trace_memory = trace_memory
+        self.top_allocations = top_allocations
+        self.last_profile = None  # 마지막으로 저장한 .prof 경로
+        self.last_memory_report = None  # 마지막 메모리 보고 (dict)
+        self._cpu_lock = threading.Lock()  # cProfile은 한 번에 하나만 활성화할 수 있음
+        self._counter = itertools.count()
+
+    def sampled(self, requested=False):
+        """이번 요청을 기록할지 여부 (요청 플래그 또는 표본 추출)"""
+        return requested or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def _path(self, name, suffix):
+        os.makedirs(self.output_dir, exist_ok=True)
+        label = re.sub(r'[^\w.-]+', '_', name)[:40]
+        return os.path.join(self.output_dir,
+                            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(self._counter)}-{label}{suffix}")
+
+    @contextmanager
+    def profile(self, name):
+        """블록 실행을 cProfile로 기록해 파일로 저장합니다 (저장 경로를 yield, 다른 기록이 진행 중이면 None)."""
+        if not self._cpu_lock.acquire(blocking=False):
+            yield None
+            return
+        try:
+            path = self._path(name, '.prof')
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield path
+            finally:
+                profile.disable()
+                profile.dump_stats(path)
+                self.last_profile = path
+                logger.info("cProfile 저장: %s", path)
+        finally:
+            self._cpu_lock.release()
+
+    def memory(self, name):
+        """trace_memory가 켜져 있으면 tracemalloc으로 구간의 메모리 사용을 보고하는 컨텍스트"""
+        return self._trace_memory(name) if self.trace_memory else nullcontext()
+
+    @contextmanager
+    def _trace_memory(self, name):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(1)
+        else:
+            # 바깥 구간이 이미 추적 중이면 그대로 두고 이 구간의 최대값만 새로 잼
+            tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        baseline, _ = tracemalloc.get_traced_memory()
+        report = {'name': name}
+        start = time.perf_counter()
+        try:
+            yield report
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            if started:
+                tracemalloc.stop()
+            report.update({
+                'seconds': time.perf_counter() - start,
+                'peak_bytes': peak - baseline,
+                'retained_bytes': current - baseline,
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'size_bytes': stat.size_diff, 'count': stat.count_diff}
+                    for stat in after.compare_to(before, 'lineno')[:self.top_allocations]
+                ]
+            })
+            report['path'] = self._write_memory_report(report)
+            self.last_memory_report = report
+            logger.info("메모리 보고 %s: 최대 %.1f MiB, 잔존 %.1f MiB (%s)", name,
+                        report['peak_bytes'] / 2 ** 20, report['retained_bytes'] / 2 ** 20, report['path'])
+
+    def _write_memory_report(self, report):
+        path = self._path(report['name'], '.mem.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{report['name']}: {report['seconds']:.3f}s\n")
+            f.write(f"peak: {report['peak_bytes'] / 2 ** 20:.2f} MiB\n")
+            f.write(f"retained: {report['retained_bytes'] / 2 ** 20:.2f} MiB\n\n")
+            for stat in report['top_allocations']:
+                f.write(f"{stat['size_bytes'] / 2 ** 10:>12.1f} KiB {stat['count']:>8} blocks  {stat['location']}\n")
+        return path
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+def normalize_query(query):
+    """NFC 정규화와 공백 정리 (임베딩 결과가 달라지지 않는 범위에서만 정규화)"""
+    return ' '.join(unicodedata.normalize('NFC', query).split())
+
+def content_hash(data):
+    """JSON으로 직렬화 가능한 데이터(메뉴 목록 등)의 내용 해시"""
+    payload = json.dumps(data, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def file_hash(path):
+    """파일 내용 해시"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ResultCache:
+    """search() 결과 캐시
+
+    프로세스 내 LRU를 먼저 보고, 없으면 같은 호스트의 워커 프로세스들이 함께 쓰는 SQLite 파일을 봅니다.
+    키에 정규화된 검색어와 엔진, 모델 ID, 가중치, 데이터 해시 등을 모두 넣으므로
+    메뉴 데이터나 모델이 바뀌면 이전 결과는 자연히 조회되지 않고 용량 제한에 따라 정리됩니다.
+    결과는 직렬화된 상태로 보관하므로 반환값을 수정해도 캐시에는 영향이 없습니다.
+    """
+
+    def __init__(self, engine, path, max_entries=1024, max_rows=100000):
+        self.engine = engine
+        self.path = str(path) if path else None
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        if self.path:
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS results ("
+                    "key TEXT PRIMARY KEY, engine TEXT, value BLOB, created REAL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS results_created ON results (engine, created)")
+
+    def _connection(self):
+        # sqlite3 연결은 스레드 간에 공유하지 않음
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def make_key(self, query, **params):
+        payload = json.dumps([self.engine, normalize_query(query), params],
+                             ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, query, **params):
+        key = self.make_key(query, **params)
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+
+        if blob is None and self.path:
+            try:
+                row = self._connection().execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                blob = row[0] if row is not None else None
+            except sqlite3.Error:
+                blob = None
+
+        try:
+            value = pickle.loads(blob) if blob is not None else None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, blob)
+        return value
+
+    def set(self, query, value, **params):
+        key = self.make_key(query, **params)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._remember(key, blob)
+            self._writes += 1
+            prune = self._writes % 1000 == 0
+
+        if not self.path:
+            return
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, engine, value, created) VALUES (?, ?, ?, ?)",
+                    (key, self.engine, blob, time.time())
+                )
+                if prune:
+                    # 오래된 항목부터 정리해 파일 크기를 제한
+                    conn.execute(
+                        "DELETE FROM results WHERE engine = ? AND key IN ("
+                        "SELECT key FROM results WHERE engine = ? ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                        (self.engine, self.engine, self.max_rows)
+                    )
+        except sqlite3.Error:
+            # 공유 캐시 쓰기 실패는 검색 결과에 영향을 주지 않음
+            pass
+
+    def _remember(self, key, blob):
+        self._memory[key] = blob
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / total if total else 0.0}
@@ -0,0 +1,101 @@
+"""part1/part2 검색 엔진을 별도 프로세스로 띄워 표준 입출력으로 검색하는 워커
+
+    python -m common.search_worker --part part1 --data /path/ia-data.json [--artifact menu_index.seg]
+
+part마다 config, search_engine 등 같은 이름의 최상위 모듈이 있으므로 다른 part(예: part3)의 프로세스 안에서
+import하지 않고 이 워커 프로세스에서만 불러옵니다. 저장소 루트에서 실행하면 그 part 폴더를 sys.path 맨 앞에 두고
+작업 폴더를 옮긴 뒤 엔진을 만듭니다.
+
+프로토콜 (한 줄에 JSON 하나, UTF-8):
+    시작: {"ready": true, "part": ...} 또는 {"error": ...} (그 뒤 종료)
+    요청: {"id": 번호, "query": 검색어, "max_results": 개수}
+    응답: {"id": 번호, "results": [part3 벡터 검색 결과 형식]} 또는 {"id": 번호, "error": ...}
+표준 입력이 닫히면 종료합니다. 엔진이 출력하는 로그는 표준 오류로 보냅니다.
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+
+from common.menu_results import convert_result
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARTS = ('part1', 'part2')
+
+def load_engine(part, data_file, artifact=None, model_id=None):
+    """part1/part2 검색 엔진을 만듭니다 (그 part 폴더가 sys.path 맨 앞에 있어야 함).
+
+    artifact(기본값: 그 part의 build_index.py가 게시한 artifacts/menu_index.seg)가 있고 data_file로 만든 것이면
+    인코딩 없이 매핑하고, 없으면 data_file로 인덱스를 구축합니다 (part2는 model_id 모델 사용).
+    """
+    import search_engine
+    artifact = artifact or os.path.join(ROOT_DIR, part, 'artifacts', 'menu_index.seg')
+    if part == 'part1':
+        if os.path.exists(artifact):
+            try:
+                return search_engine.SearchEngine.load_artifact(artifact, data_file, use_cache=False)
+            except ValueError as e:
+                print(f"아티팩트를 쓸 수 없어 인덱스를 새로 구축합니다: {e}", file=sys.stderr)
+        return search_engine.SearchEngine(data_file, use_cache=False)
+
+    import main
+    import model_manager
+    manager = model_manager.ModelManager()
+    if os.path.exists(artifact):
+        try:
+            return search_engine.SearchEngine.load_artifact(manager, artifact, data_file, use_cache=False)
+        except ValueError as e:
+            print(f"아티팩트를 쓸 수 없어 인덱스를 새로 구축합니다: {e}", file=sys.stderr)
+    manager.load_model(model_id)
+    engine = search_engine.SearchEngine(manager, use_cache=False)
+    engine.build_index(main.load_menu_data(data_file))
+    return engine
+
+def search(engine, query, max_results):
+    """검색 결과를 part3 벡터 검색 결과 형식으로 변환 (part1은 DataFrame, part2는 dict 리스트를 반환)"""
+    results = engine.search(query)
+    rows = results.to_dict('records') if hasattr(results, 'to_dict') else list(results)
+    return [convert_result(row) for row in rows[:max_results]]
+
+def serve(engine, part, stdin, stdout):
+    def reply(message):
+        stdout.write(json.dumps(message, ensure_ascii=False, default=str) + '\n')
+        stdout.flush()
+
+    reply({'ready': True, 'part': part})
+    for line in stdin:
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        try:
+            reply({'id': request.get('id'), 'results': search(engine, request['query'], int(request.get('max_results', 5)))})
+        except Exception as e:
+            reply({'id': request.get('id'), 'error': f"{type(e).__name__}: {e}"})
+
+def main():
+    parser = argparse.ArgumentParser(description="part1/part2 검색 엔진을 표준 입출력 JSON 줄 프로토콜로 제공합니다.")
+    parser.add_argument('--part', required=True, choices=PARTS)
+    parser.add_argument('--data', required=True, help="메뉴 데이터 파일 (절대 경로)")
+    parser.add_argument('--artifact', help="엔진 아티팩트 경로 (없으면 그 part의 artifacts/menu_index.seg)")
+    parser.add_argument('--model', help="part2 엔진이 아티팩트 없이 인덱스를 구축할 때 쓸 모델")
+    args = parser.parse_args()
+
+    # 엔진의 print 출력이 프로토콜에 섞이지 않도록 표준 출력은 응답 전용으로 씀
+    protocol = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    requests = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    sys.stdout = sys.stderr
+    part_dir = os.path.join(ROOT_DIR, args.part)
+    sys.path.insert(0, part_dir)
+    os.chdir(part_dir)
+    try:
+        engine = load_engine(args.part, args.data, args.artifact, args.model)
+    except Exception as e:
+        protocol.write(json.dumps({'error': f"{type(e).__name__}: {e}"}, ensure_ascii=False) + '\n')
+        protocol.flush()
+        sys.exit(1)
+    serve(engine, args.part, requests, protocol)
+
+if __name__ == "__main__":
+    main()
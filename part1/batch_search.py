@@ -0,0 +1,97 @@
+import argparse
+import csv
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from search_engine import SearchEngine
+from config import TOP_K_RESULTS, BATCH_SIZE, BATCH_WORKERS
+from common.concurrency import configure_threads, threads_per_worker
+
+_engine = None
+
+def iter_queries(path):
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = csv.reader(f)
+            header = next(rows, None)
+            if header is None:
+                return
+            col = header.index('query') if 'query' in header else 0
+            if 'query' not in header and header[col].strip():
+                yield header[col].strip()
+            for row in rows:
+                if len(row) > col and row[col].strip():
+                    yield row[col].strip()
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                query = record.get('query') if isinstance(record, dict) else record
+                if query:
+                    yield str(query)
+
+def iter_batches(queries, batch_size):
+    queries = iter(queries)
+    while True:
+        batch = list(islice(queries, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def init_worker(json_file_path, segment_path=None, threads=None):
+    global _engine
+    # 워커들의 torch/BLAS 연산 스레드 합이 코어 수를 넘지 않도록 제한
+    configure_threads(threads)
+    # 세그먼트를 매핑하면 워커 수와 관계없이 벡터는 한 사본만 메모리에 올라간다 (일괄 검색은 결과 캐시를 쓰지 않음)
+    _engine = SearchEngine.from_segment(segment_path, use_cache=False) if segment_path else SearchEngine(json_file_path, use_cache=False)
+
+def search_batch(queries, top_k=TOP_K_RESULTS):
+    # 배치 전체를 한 번에 임베딩하고 결합 행렬과의 행렬 곱 한 번으로 검색어별 상위 결과를 구한다
+    return [{'query': query, 'results': results.to_dict('records')}
+            for query, results in zip(queries, _engine.search_many(queries, top_k))]
+
+def run(input_path, output_path, json_file_path='ia-data.json', batch_size=BATCH_SIZE,
+        workers=BATCH_WORKERS, top_k=TOP_K_RESULTS, segment_path=None):
+    batches = iter_batches(iter_queries(input_path), batch_size)
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        def write(records):
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            return len(records)
+        if workers <= 1:
+            init_worker(json_file_path, segment_path, threads_per_worker(1))
+            for batch in batches:
+                count += write(search_batch(batch, top_k))
+            return count
+        # 처리 중인 배치 수를 제한해 메모리 사용량이 파일 크기가 아닌 배치 크기에 비례하도록 한다
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(json_file_path, segment_path, threads_per_worker(workers))) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(search_batch, batch, top_k))
+                if len(pending) >= workers * 2:
+                    count += write(pending.popleft().result())
+            while pending:
+                count += write(pending.popleft().result())
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="검색어 파일(JSONL/CSV)을 일괄 검색해 JSONL로 저장합니다.")
+    parser.add_argument('input', help="검색어 파일 (.jsonl 또는 .csv)")
+    parser.add_argument('output', help="결과 JSONL 파일")
+    parser.add_argument('--data', default='ia-data.json', help="메뉴 데이터 파일")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS)
+    parser.add_argument('--top-k', type=int, default=TOP_K_RESULTS)
+    parser.add_argument('--segment', help="SearchEngine.save_segment()로 만든 인덱스 세그먼트 (주면 --data 대신 사용)")
+    args = parser.parse_args()
+    count = run(args.input, args.output, args.data, args.batch_size, args.workers, args.top_k, args.segment)
+    print(f"{count}개 검색어 처리 완료: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,29 @@
-TOP_K_RESULTS = 5 
\ No newline at end of file
+import os
+import sys
+# 공용 모듈(common 패키지)을 import할 수 있도록 저장소 루트를 경로에 추가
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+TOP_K_RESULTS = 5
+FIELD_WEIGHTS = {'page': 0.4, 'full': 0.4, 'context': 0.2}
+BATCH_SIZE = 256
+BATCH_WORKERS = 1
+RESULT_CACHE_PATH = 'result_cache.sqlite3'
+RESULT_CACHE_SIZE = 1024
+FUZZY_ENABLED = True
+FUZZY_MAX_DISTANCE = 2
+ARTIFACT_DIR = 'artifacts'
+ARTIFACT_NAME = 'menu_index'
+SEARCH_WORKERS = None
+SEARCH_THREADS = None
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_MEMORY = os.getenv('PROFILE_MEMORY') == '1'
+REDUCED_DIMENSION = None
+REDUCTION_METHOD = 'pca'
+REDUCTION_EVAL_QUERIES = 1000
+REDUCTION_EVAL_KS = (1, 5, 10)
+HIERARCHY_BEAM = 4
+HIERARCHY_LEAF_SIZE = 32
+HIERARCHY_SECTIONS = 3
+HIERARCHY_SECTION_MIN_ITEMS = 2
@@ -3,6 +3,7 @@ import numpy as np
 
 class EmbeddingManager:
     def __init__(self, model_name='jhgan/ko-sroberta-multitask'):
+        self.model_name = model_name
         self.model = SentenceTransformer(model_name)
     def create_embeddings(self, texts):
         return self.model.encode(texts, convert_to_numpy=True, normalize_embeddings=True)
@@ -1,4 +1,6 @@
+import os
 from search_engine import SearchEngine
+from config import ARTIFACT_DIR, ARTIFACT_NAME
 
 def format_similarity_score(score):
     return f"{score:.4f}"
@@ -17,7 +19,16 @@ def display_results(query, results):
 
 def main():
     print("검색 엔진 초기화 중...")
-    search_engine = SearchEngine('ia-data.json')
+    artifact_path = os.path.join(ARTIFACT_DIR, f"{ARTIFACT_NAME}.seg")
+    search_engine = None
+    if os.path.exists(artifact_path):
+        # build_index.py로 미리 만든 아티팩트가 현재 데이터와 맞으면 임베딩 계산 없이 시작
+        try:
+            search_engine = SearchEngine.load_artifact(artifact_path, 'ia-data.json')
+        except ValueError as e:
+            print(f"아티팩트를 사용할 수 없어 새로 빌드합니다: {e}")
+    if search_engine is None:
+        search_engine = SearchEngine('ia-data.json')
     while True:
         query = input("\n검색어를 입력하세요 (종료하려면 'q' 입력): ")
         if query.lower() == 'q':
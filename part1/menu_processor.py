@@ -1,13 +1,41 @@
 import json
+from numbers import Real
+from config import FIELD_WEIGHTS
 
 class MenuProcessor:
-    def __init__(self, json_file_path):
-        with open(json_file_path, encoding='utf-8') as f:
-            self.menu_data = json.load(f)
-        self.page_names = [item['page_name'] for item in self.menu_data]
-        self.context_texts = [f"{item['Category']} {item['Service']} {' '.join(item['hierarchy'])}" for item in self.menu_data]
-        self.full_texts = [f"{item['Category']} {item['Service']} {item['page_name']} {' '.join(item['hierarchy'])}" for item in self.menu_data]
+    def __init__(self, json_file_path=None, menu_data=None):
+        # menu_data: 이미 읽은 메뉴 목록 (세그먼트의 MappedRecords 등)
+        if menu_data is None:
+            with open(json_file_path, encoding='utf-8') as f:
+                menu_data = json.load(f)
+        self.menu_data = menu_data
+    # 임베딩 생성에만 쓰이므로 필요할 때 만듦
+    @property
+    def page_names(self):
+        return [item['page_name'] for item in self.menu_data]
+    @property
+    def context_texts(self):
+        return [f"{item['Category']} {item['Service']} {' '.join(item['hierarchy'])}" for item in self.menu_data]
+    @property
+    def full_texts(self):
+        return [f"{item['Category']} {item['Service']} {item['page_name']} {' '.join(item['hierarchy'])}" for item in self.menu_data]
     def get_menu_item(self, idx):
         return self.menu_data[idx]
-    def calculate_weighted_similarity(self, full, page, context):
-        return 0.4 * page + 0.4 * full + 0.2 * context 
\ No newline at end of file
+    def resolve_weights(self, weights=None):
+        if not weights:
+            return FIELD_WEIGHTS
+        unknown = set(weights) - set(FIELD_WEIGHTS)
+        if unknown:
+            raise ValueError(f"알 수 없는 가중치 필드: {sorted(unknown)} (사용 가능: {sorted(FIELD_WEIGHTS)})")
+        merged = {**FIELD_WEIGHTS, **weights}
+        # part2 SearchEngine.resolve_weights와 같은 검증
+        if not all(isinstance(value, Real) and not isinstance(value, bool) for value in merged.values()):
+            raise ValueError("가중치는 숫자여야 합니다.")
+        if any(value < 0 for value in merged.values()):
+            raise ValueError("가중치는 0 이상이어야 합니다.")
+        if not any(merged.values()):
+            raise ValueError("가중치가 모두 0일 수는 없습니다.")
+        return merged
+    def calculate_weighted_similarity(self, full, page, context, weights=None):
+        weights = self.resolve_weights(weights)
+        return weights['page'] * page + weights['full'] * full + weights['context'] * context 
\ No newline at end of file
@@ -1,35 +1,282 @@
+import time
+import numpy as np
 import pandas as pd
 from embeddings import EmbeddingManager
 from menu_processor import MenuProcessor
-from config import TOP_K_RESULTS
+from config import (FIELD_WEIGHTS, TOP_K_RESULTS, RESULT_CACHE_PATH, RESULT_CACHE_SIZE, FUZZY_ENABLED, FUZZY_MAX_DISTANCE,
+                    PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY, REDUCED_DIMENSION, REDUCTION_METHOD,
+                    REDUCTION_EVAL_QUERIES, REDUCTION_EVAL_KS, HIERARCHY_BEAM, HIERARCHY_LEAF_SIZE, HIERARCHY_SECTIONS,
+                    HIERARCHY_SECTION_MIN_ITEMS)
+from common.result_cache import ResultCache, file_hash
+from common.fuzzy_matcher import FuzzyMatcher
+from common.profiling import Profiler
+from common.dim_reduction import Projection, recall_at_k, sample_rows
+from common.hierarchy_index import HierarchyTree
+from common.index_store import IndexSegment, MappedFlatIndex, write_segment, make_manifest, check_manifest
+
+class IndexSnapshot:
+    # 한 번 만든 뒤 바뀌지 않는 인덱스 상태 (모델, 메뉴 데이터, 필드 임베딩)
+    # 엔진은 세그먼트를 다시 매핑할 때 새 스냅샷을 만들어 참조 하나만 교체하므로 진행 중인 검색은 시작할 때의 스냅샷으로 끝남
+    def __init__(self, embedding_manager, menu_processor, data_hash, field_embeddings, segment=None,
+                 projection=None, reduction=None):
+        self.embedding_manager = embedding_manager
+        self.menu_processor = menu_processor
+        self.data_hash = data_hash
+        self.field_embeddings = field_embeddings
+        self.full_embeddings, self.page_embeddings, self.context_embeddings = field_embeddings
+        self.segment = segment
+        # 차원 축소를 했으면 쿼리도 같은 사영을 거침 (reduction: 방식, 차원, 축소 전 대비 recall@k)
+        self.projection = projection
+        self.reduction = reduction
+        self._hierarchy = None
+        self._fuzzy_matcher = None
+        self._weighted_embeddings = None
+    def weighted_embeddings(self, weights):
+        # 종합 점수는 필드 유사도의 선형 결합이므로 결합된 (N, D) 행렬 하나와의 내적과 같음
+        # 기본 가중치 행렬은 한 번만 만들고, 아티팩트에 같은 가중치로 만든 행렬이 있으면 매핑한 배열을 그대로 사용
+        if weights != FIELD_WEIGHTS:
+            return self.menu_processor.calculate_weighted_similarity(self.full_embeddings, self.page_embeddings, self.context_embeddings, weights)
+        if self._weighted_embeddings is None:
+            if self.segment is not None and self.segment.meta['weights'] == FIELD_WEIGHTS and 'weighted_embeddings' in self.segment.arrays:
+                self._weighted_embeddings = self.segment['weighted_embeddings']
+            else:
+                self._weighted_embeddings = np.ascontiguousarray(self.menu_processor.calculate_weighted_similarity(
+                    self.full_embeddings, self.page_embeddings, self.context_embeddings))
+        return self._weighted_embeddings
+    def hierarchy(self):
+        # 메뉴 계층 트리 (처음 요청할 때 기본 가중치로 결합한 벡터로 구역 중심 벡터를 만들어 둠)
+        if self._hierarchy is None:
+            self._hierarchy = HierarchyTree.build(self.menu_processor.menu_data, self.menu_processor.calculate_weighted_similarity(
+                self.full_embeddings, self.page_embeddings, self.context_embeddings))
+        return self._hierarchy
+    def embed_queries(self, queries):
+        embeddings = self.embedding_manager.create_embeddings(queries)
+        return self.projection.transform(embeddings) if self.projection is not None else embeddings
+    def embed_query(self, query):
+        return self.embed_queries([query])[0]
+    def field_similarities(self, query_embeddings):
+        # 쌓아 둔 (3N, D) 행렬과 한 번의 행렬 곱으로 모든 필드의 유사도를 계산 -> (3, N) 또는 (Q, 3, N)
+        fields, n, dim = self.field_embeddings.shape
+        scores = query_embeddings @ self.field_embeddings.reshape(fields * n, dim).T
+        return scores.reshape(scores.shape[:-1] + (fields, n))
+    def make_result(self, i, full_sim, page_sim, context_sim, weights=None):
+        menu_item = self.menu_processor.get_menu_item(i)
+        return {
+            'Category': menu_item['Category'],
+            'Service': menu_item['Service'],
+            'page_name': menu_item['page_name'],
+            'hierarchy': menu_item['hierarchy'],
+            'full_similarity': full_sim,
+            'page_similarity': page_sim,
+            'context_similarity': context_sim,
+            'weighted_similarity': self.menu_processor.calculate_weighted_similarity(full_sim, page_sim, context_sim, weights)
+        }
+    @property
+    def fuzzy_matcher(self):
+        # 오타 색인은 프로세스마다 수십 MiB이므로 처음 교정할 때 만듦 (세그먼트를 매핑한 워커도 교정 전에는 만들지 않음)
+        if self._fuzzy_matcher is None and FUZZY_ENABLED:
+            self._fuzzy_matcher = FuzzyMatcher.from_menu_data(self.menu_processor.menu_data, FUZZY_MAX_DISTANCE)
+        return self._fuzzy_matcher
+    def rewrite_query(self, query):
+        # 오타를 메뉴 용어로 교정한 뒤 임베딩
+        matcher = self.fuzzy_matcher
+        return matcher.rewrite(query) if matcher is not None else query
+
+def _snapshot_attribute(name):
+    # 현재 스냅샷의 속성을 읽는 엔진 속성
+    return property(lambda self: getattr(self.snapshot, name))
 
 class SearchEngine:
-    def __init__(self, json_file_path):
-        self.menu_processor = MenuProcessor(json_file_path)
-        self.embedding_manager = EmbeddingManager()
-        self._create_embeddings()
-    def _create_embeddings(self):
-        self.full_embeddings = self.embedding_manager.create_embeddings(self.menu_processor.full_texts)
-        self.page_embeddings = self.embedding_manager.create_embeddings(self.menu_processor.page_names)
-        self.context_embeddings = self.embedding_manager.create_embeddings(self.menu_processor.context_texts)
-    def search(self, query):
-        query_embedding = self.embedding_manager.create_query_embedding(query)
-        full_sim = self.embedding_manager.calculate_similarities(query_embedding, self.full_embeddings)
-        page_sim = self.embedding_manager.calculate_similarities(query_embedding, self.page_embeddings)
-        context_sim = self.embedding_manager.calculate_similarities(query_embedding, self.context_embeddings)
-        results = []
-        for i in range(len(self.menu_processor.menu_data)):
-            weighted = self.menu_processor.calculate_weighted_similarity(full_sim[i], page_sim[i], context_sim[i])
-            menu_item = self.menu_processor.get_menu_item(i)
-            results.append({
-                'Category': menu_item['Category'],
-                'Service': menu_item['Service'],
-                'page_name': menu_item['page_name'],
-                'hierarchy': menu_item['hierarchy'],
-                'full_similarity': full_sim[i],
-                'page_similarity': page_sim[i],
-                'context_similarity': context_sim[i],
-                'weighted_similarity': weighted
-            })
-        results_df = pd.DataFrame(results)
-        return results_df.sort_values('weighted_similarity', ascending=False).head(TOP_K_RESULTS) 
\ No newline at end of file
+    # 인덱스 상태는 모두 현재 스냅샷에서 읽음 (읽기 전용)
+    embedding_manager = _snapshot_attribute('embedding_manager')
+    menu_processor = _snapshot_attribute('menu_processor')
+    data_hash = _snapshot_attribute('data_hash')
+    fuzzy_matcher = _snapshot_attribute('fuzzy_matcher')
+    field_embeddings = _snapshot_attribute('field_embeddings')
+    full_embeddings = _snapshot_attribute('full_embeddings')
+    page_embeddings = _snapshot_attribute('page_embeddings')
+    context_embeddings = _snapshot_attribute('context_embeddings')
+    segment = _snapshot_attribute('segment')
+    projection = _snapshot_attribute('projection')
+    reduction = _snapshot_attribute('reduction')
+    def __init__(self, json_file_path, use_cache=True, reduced_dimension=REDUCED_DIMENSION, reduction_method=REDUCTION_METHOD):
+        # reduced_dimension: 임베딩을 이 차원으로 줄여 저장 (None이면 모델 차원 그대로, reduction_method: 'pca' 또는 'truncate')
+        menu_processor = MenuProcessor(json_file_path)
+        start = time.perf_counter()
+        embedding_manager = EmbeddingManager()
+        self.build_timings = {'model_load': time.perf_counter() - start}
+        # 기본적으로 꺼져 있음 (PROFILE_SAMPLE_RATE/PROFILE_MEMORY 환경 변수 또는 search(..., profile=True))
+        self.profiler = Profiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY)
+        self.result_cache = ResultCache('part1', RESULT_CACHE_PATH, RESULT_CACHE_SIZE) if use_cache else None
+        field_embeddings = self._create_embeddings(embedding_manager, menu_processor)
+        projection, reduction = None, None
+        if reduced_dimension and reduced_dimension < field_embeddings.shape[2]:
+            field_embeddings, projection, reduction = self._reduce(field_embeddings, reduced_dimension, reduction_method)
+        self.snapshot = IndexSnapshot(embedding_manager, menu_processor, file_hash(json_file_path), field_embeddings,
+                                      projection=projection, reduction=reduction)
+    @classmethod
+    def from_segment(cls, segment_path, use_cache=True):
+        # save_segment()/build_index.py로 만든 아티팩트를 읽기 전용으로 매핑해 임베딩 계산 없이 엔진 생성
+        # 같은 파일을 연 워커 프로세스들은 벡터와 메뉴 데이터의 한 사본(페이지 캐시)을 공유
+        return cls._from_segment(IndexSegment(segment_path), use_cache)
+    @classmethod
+    def load_artifact(cls, artifact_path, data_file=None, use_cache=True):
+        # manifest를 검증한 뒤 로드, data_file을 주면 그 파일로 만든 아티팩트인지도 확인
+        segment = IndexSegment(artifact_path)
+        manifest = check_manifest(segment, 'part1')
+        if data_file is not None and file_hash(data_file) != manifest['data_hash']:
+            raise ValueError(f"아티팩트가 {data_file}의 현재 내용으로 만들어지지 않았습니다 (version={manifest['version']})")
+        return cls._from_segment(segment, use_cache)
+    @classmethod
+    def _from_segment(cls, segment, use_cache):
+        engine = cls.__new__(cls)
+        engine.snapshot = None
+        engine.build_timings = {}
+        engine.profiler = Profiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY)
+        engine.result_cache = ResultCache('part1', RESULT_CACHE_PATH, RESULT_CACHE_SIZE) if use_cache else None
+        engine._attach_segment(segment)
+        return engine
+    def _attach_segment(self, segment):
+        manifest = check_manifest(segment, 'part1')
+        embedding_manager = self.snapshot.embedding_manager if self.snapshot is not None else None
+        if embedding_manager is None or embedding_manager.model_name != manifest['model']:
+            embedding_manager = EmbeddingManager(manifest['model'])
+        # 새 스냅샷을 다 만든 뒤 참조 하나만 교체
+        reduction = manifest.get('reduction')
+        projection = Projection.from_segment(segment, reduction) if reduction else None
+        self.snapshot = IndexSnapshot(embedding_manager, MenuProcessor(menu_data=segment.records), manifest['data_hash'],
+                                      segment['field_embeddings'], segment, projection, reduction)
+    def artifact_arrays(self):
+        snapshot = self.snapshot
+        arrays = {
+            'field_embeddings': snapshot.field_embeddings,
+            'weighted_embeddings': snapshot.menu_processor.calculate_weighted_similarity(
+                snapshot.full_embeddings, snapshot.page_embeddings, snapshot.context_embeddings)
+        }
+        if snapshot.projection is not None:
+            arrays.update(snapshot.projection.arrays())
+        return arrays
+    def manifest(self, timings=None):
+        snapshot = self.snapshot
+        return make_manifest('part1', snapshot.embedding_manager.model_name, snapshot.field_embeddings.shape[2], FIELD_WEIGHTS,
+                             snapshot.data_hash, len(snapshot.menu_processor.menu_data), {**self.build_timings, **(timings or {})},
+                             reduction=snapshot.reduction)
+    def save_segment(self, segment_path, timings=None):
+        # 임베딩과 메뉴 데이터를 manifest와 함께 기록 (같은 경로의 이전 버전은 원자적으로 교체됨)
+        write_segment(segment_path, self.artifact_arrays(), self.manifest(timings), list(self.snapshot.menu_processor.menu_data))
+    def reload_segment(self):
+        # 같은 경로에 새 버전이 게시되었으면 다시 매핑 (바뀌었으면 True)
+        segment = self.segment
+        if segment is None or not segment.is_stale():
+            return False
+        self._attach_segment(IndexSegment(segment.path))
+        return True
+    def _create_embeddings(self, embedding_manager, menu_processor):
+        start = time.perf_counter()
+        # 필드별 임베딩을 (3, N, D) 연속 배열 하나로 쌓아 두고, 필드별 행렬은 그 뷰로 사용
+        with self.profiler.memory('create_embeddings'):
+            field_embeddings = np.ascontiguousarray(np.stack([
+                embedding_manager.create_embeddings(menu_processor.full_texts),
+                embedding_manager.create_embeddings(menu_processor.page_names),
+                embedding_manager.create_embeddings(menu_processor.context_texts)
+            ]))
+        self.build_timings['encode'] = time.perf_counter() - start
+        return field_embeddings
+    def _reduce(self, field_embeddings, dimension, method):
+        start = time.perf_counter()
+        # 세 필드를 같은 쿼리 벡터와 비교하므로 필드 임베딩을 모두 모아 사영 하나를 학습
+        projection = Projection.fit(field_embeddings.reshape(-1, field_embeddings.shape[2]), dimension, method)
+        reduced = np.ascontiguousarray(np.stack([projection.transform(f) for f in field_embeddings]))
+        # page_name 임베딩을 쿼리로 종합 점수 상위 k개가 축소 전과 얼마나 겹치는지 기록 (쿼리 자신인 메뉴는 이웃에서 제외)
+        rows = sample_rows(field_embeddings.shape[1], REDUCTION_EVAL_QUERIES)
+        recall = recall_at_k(field_embeddings[1][rows], self._combine_fields(field_embeddings),
+                             reduced[1][rows], self._combine_fields(reduced), REDUCTION_EVAL_KS, exclude=rows)
+        reduction = {**projection.describe(), 'eval_queries': len(rows),
+                     'recall': {f"@{k}": round(value, 4) for k, value in recall.items()}}
+        self.build_timings['reduce'] = time.perf_counter() - start
+        return reduced, projection, reduction
+    def _combine_fields(self, field_embeddings):
+        # 종합 점수는 필드 유사도의 선형 결합이므로 결합된 행렬과의 내적과 같음
+        full, page, context = field_embeddings
+        return FIELD_WEIGHTS['full'] * full + FIELD_WEIGHTS['page'] * page + FIELD_WEIGHTS['context'] * context
+    # 아래 메서드는 호출 시점의 스냅샷으로 계산 (여러 단계를 한 스냅샷으로 처리하려면 self.snapshot을 직접 사용)
+    def field_similarities(self, query_embeddings):
+        return self.snapshot.field_similarities(query_embeddings)
+    def make_result(self, i, full_sim, page_sim, context_sim, weights=None):
+        return self.snapshot.make_result(i, full_sim, page_sim, context_sim, weights)
+    def rewrite_query(self, query):
+        return self.snapshot.rewrite_query(query)
+    def _cache_params(self, snapshot, weights, top_k=TOP_K_RESULTS):
+        return {'model': snapshot.embedding_manager.model_name, 'data': snapshot.data_hash, 'top_k': top_k, 'weights': weights,
+                'projection': snapshot.projection.describe() if snapshot.projection is not None else None}
+    def search(self, query, weights=None, profile=False):
+        # weights: {'page': .., 'full': .., 'context': ..} 중 바꿀 값만 지정 (나머지는 config.FIELD_WEIGHTS)
+        # 여러 스레드에서 동시에 호출해도 되며, 각 호출은 시작할 때의 스냅샷 하나로 계산
+        # profile=True이거나 PROFILE_SAMPLE_RATE 비율에 뽑힌 검색은 cProfile로 기록해 PROFILE_DIR에 저장
+        if self.profiler.sampled(profile):
+            with self.profiler.profile(f"search-{query}"):
+                return self._search(query, weights)
+        return self._search(query, weights)
+    def _search(self, query, weights):
+        snapshot = self.snapshot
+        weights = snapshot.menu_processor.resolve_weights(weights)
+        query = snapshot.rewrite_query(query)
+        if self.result_cache is not None:
+            cached = self.result_cache.get(query, **self._cache_params(snapshot, weights))
+            if cached is not None:
+                return cached
+        query_embedding = snapshot.embed_query(query)
+        full_sim, page_sim, context_sim = snapshot.field_similarities(query_embedding)
+        scores = snapshot.menu_processor.calculate_weighted_similarity(full_sim, page_sim, context_sim, weights)
+        # 상위 TOP_K만 골라 DataFrame 생성
+        top_k = min(TOP_K_RESULTS, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        results = [snapshot.make_result(i, full_sim[i], page_sim[i], context_sim[i], weights) for i in top]
+        results_df = pd.DataFrame(results, index=top)
+        if self.result_cache is not None:
+            self.result_cache.set(query, results_df, **self._cache_params(snapshot, weights))
+        return results_df
+    def search_many(self, queries, top_k=TOP_K_RESULTS, weights=None):
+        # 여러 검색어를 한 번에 검색해 검색어마다 search()와 같은 형식의 DataFrame을 반환
+        # 캐시에 없는 검색어만 모아 한 번에 임베딩하고, 결합 행렬과의 (검색어 x 메뉴) 행렬 곱 한 번 + 행별 부분 정렬로 상위 top_k를 고름
+        snapshot = self.snapshot
+        weights = snapshot.menu_processor.resolve_weights(weights)
+        queries = [snapshot.rewrite_query(query) for query in queries]
+        cache_params = self._cache_params(snapshot, weights, top_k)
+        results = [self.result_cache.get(query, **cache_params) if self.result_cache is not None else None for query in queries]
+        # 같은 검색어가 여러 번 있으면 한 번만 계산
+        pending = list(dict.fromkeys(query for query, result in zip(queries, results) if result is None))
+        if not pending:
+            return results
+        query_embeddings = snapshot.embed_queries(pending)
+        _, tops = MappedFlatIndex.top_k(query_embeddings @ snapshot.weighted_embeddings(weights).T, top_k)
+        computed = {}
+        for query, q, top in zip(pending, query_embeddings, tops):
+            top = top[top >= 0]
+            full_sim, page_sim, context_sim = snapshot.field_embeddings[:, top] @ q
+            rows = [snapshot.make_result(i, full_sim[j], page_sim[j], context_sim[j], weights) for j, i in enumerate(top)]
+            computed[query] = pd.DataFrame(rows, index=top)
+            if self.result_cache is not None:
+                self.result_cache.set(query, computed[query], **cache_params)
+        return [result if result is not None else computed[query] for query, result in zip(queries, results)]
+    def search_hierarchical(self, query, top_k=TOP_K_RESULTS, weights=None, beam=HIERARCHY_BEAM, sections=HIERARCHY_SECTIONS):
+        # 계층 트리를 위에서부터 내려가며 구역 중심 벡터 점수가 높은 beam개 구역 안의 메뉴만 점수 계산
+        # (메뉴가 많을수록 점수 계산이 크게 줄지만 다른 구역의 메뉴는 놓칠 수 있음)
+        # part2와 같은 형식의 dict를 반환: {'results': search()와 같은 형식의 DataFrame, 'sections': 구역 결과 DataFrame,
+        # 'scored_items': 점수를 매긴 메뉴 수}
+        snapshot = self.snapshot
+        weights = snapshot.menu_processor.resolve_weights(weights)
+        query_embedding = snapshot.embed_query(snapshot.rewrite_query(query))
+        tree = snapshot.hierarchy()
+        rows, nodes, node_scores = tree.descend(query_embedding, beam, HIERARCHY_LEAF_SIZE)
+        full_sim, page_sim, context_sim = snapshot.field_embeddings[:, rows] @ query_embedding
+        scores = snapshot.menu_processor.calculate_weighted_similarity(full_sim, page_sim, context_sim, weights)
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+        top = top[np.argsort(-scores[top], kind='stable')]
+        results = [snapshot.make_result(rows[i], full_sim[i], page_sim[i], context_sim[i], weights) for i in top]
+        section_nodes, section_scores = tree.top_sections(nodes, node_scores, sections, HIERARCHY_SECTION_MIN_ITEMS)
+        section_results = [{**tree.section(node), 'similarity': float(score)} for node, score in zip(section_nodes, section_scores)]
+        return {'results': pd.DataFrame(results, index=rows[top]), 'sections': pd.DataFrame(section_results),
+                'scored_items': len(rows)}
@@ -0,0 +1,120 @@
+import argparse
+import csv
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional
+from model_manager import ModelManager
+from search_engine import SearchEngine
+from main import load_menu_data
+from config import TOP_K_RESULTS, BATCH_SIZE, BATCH_WORKERS
+from common.concurrency import configure_threads, threads_per_worker
+
+DEFAULT_MODEL = "jhgan/ko-sroberta-multitask"
+
+_engine = None
+
+def iter_queries(path: str) -> Iterator[str]:
+    """JSONL 또는 CSV 파일에서 검색어를 한 줄씩 스트리밍합니다."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = csv.reader(f)
+            header = next(rows, None)
+            if header is None:
+                return
+            col = header.index('query') if 'query' in header else 0
+            # 'query' 헤더가 없으면 첫 행도 검색어로 취급
+            if 'query' not in header and header[col].strip():
+                yield header[col].strip()
+            for row in rows:
+                if len(row) > col and row[col].strip():
+                    yield row[col].strip()
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                query = record.get('query') if isinstance(record, dict) else record
+                if query:
+                    yield str(query)
+
+def iter_batches(queries: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """검색어 스트림을 batch_size 단위로 묶습니다."""
+    queries = iter(queries)
+    while True:
+        batch = list(islice(queries, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def init_worker(model_id: str, menu_file: str, segment_path: Optional[str] = None, threads: Optional[int] = None):
+    """워커 프로세스마다 모델을 로드하고 인덱스를 구축합니다 (세그먼트가 있으면 매핑만 함).
+
+    threads: 워커 하나가 쓸 torch/FAISS 연산 스레드 수 (워커들의 합이 코어 수를 넘지 않게)
+    """
+    global _engine
+    configure_threads(threads)
+    model_manager = ModelManager()
+    # 일괄 검색은 한 번씩만 처리하므로 결과 캐시를 쓰지 않음
+    if segment_path:
+        _engine = SearchEngine.from_segment(model_manager, segment_path, use_cache=False)
+        return
+    model_manager.load_model(model_id)
+    _engine = SearchEngine(model_manager, use_cache=False)
+    _engine.build_index(load_menu_data(menu_file))
+
+def search_batch(queries: List[str], top_k: int = TOP_K_RESULTS) -> List[Dict]:
+    """배치 전체를 한 번에 인코딩하고 FAISS 검색 한 번으로 쿼리별 상위 결과를 구합니다."""
+    return [{'query': query, 'results': results}
+            for query, results in zip(queries, _engine.search_many(queries, top_k))]
+
+def run(input_path: str, output_path: str, model_id: str = DEFAULT_MODEL, menu_file: str = "ia-data.json",
+        batch_size: int = BATCH_SIZE, workers: int = BATCH_WORKERS, top_k: int = TOP_K_RESULTS,
+        segment_path: Optional[str] = None) -> int:
+    """검색어 파일을 일괄 검색하여 결과를 JSONL로 순서대로 기록합니다."""
+    batches = iter_batches(iter_queries(input_path), batch_size)
+    count = 0
+    with open(output_path, 'w', encoding='utf-8') as out:
+        def write(records):
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+            out.flush()
+            return len(records)
+
+        if workers <= 1:
+            init_worker(model_id, menu_file, segment_path, threads_per_worker(1))
+            for batch in batches:
+                count += write(search_batch(batch, top_k))
+            return count
+
+        # 처리 중인 배치 수를 제한해 메모리 사용량이 파일 크기가 아닌 배치 크기에 비례하도록 함
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(model_id, menu_file, segment_path, threads_per_worker(workers))) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(search_batch, batch, top_k))
+                if len(pending) >= workers * 2:
+                    count += write(pending.popleft().result())
+            while pending:
+                count += write(pending.popleft().result())
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="검색어 파일(JSONL/CSV)을 일괄 검색해 JSONL로 저장합니다.")
+    parser.add_argument('input', help="검색어 파일 (.jsonl 또는 .csv)")
+    parser.add_argument('output', help="결과 JSONL 파일")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="사용할 임베딩 모델 ID")
+    parser.add_argument('--data', default='ia-data.json', help="메뉴 데이터 파일")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=BATCH_WORKERS)
+    parser.add_argument('--top-k', type=int, default=TOP_K_RESULTS)
+    parser.add_argument('--segment', help="SearchEngine.save_segment()로 만든 인덱스 세그먼트 (주면 --model, --data 대신 사용)")
+    args = parser.parse_args()
+    count = run(args.input, args.output, args.model, args.data, args.batch_size, args.workers, args.top_k,
+                args.segment)
+    print(f"{count}개 검색어 처리 완료: {args.output}")
+
+if __name__ == "__main__":
+    main()
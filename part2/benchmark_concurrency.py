@@ -0,0 +1,83 @@
+import argparse
+import os
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from model_manager import ModelManager
+from search_engine import SearchEngine
+from batch_search import iter_queries, DEFAULT_MODEL
+from main import load_menu_data
+from config import SEARCH_WORKERS, SEARCH_THREADS
+from common.concurrency import ConcurrentSearcher, threads_per_worker
+
+def worker_counts(max_workers: int) -> List[int]:
+    """1, 2, 4, ... max_workers"""
+    counts, n = [], 1
+    while n < max_workers:
+        counts.append(n)
+        n *= 2
+    return counts + [max_workers]
+
+def measure(engine: SearchEngine, queries: List[str], workers: int, threads: Optional[int] = None) -> Dict[str, float]:
+    """동시 실행 수 workers로 queries 전체를 검색해 QPS와 지연 시간 분위수를 잽니다."""
+    latencies = []
+
+    def timed_search(query):
+        start = time.perf_counter()
+        engine.search(query)
+        latencies.append(time.perf_counter() - start)
+
+    with ConcurrentSearcher(timed_search, max_workers=workers, threads=threads) as searcher:
+        # 스레드 풀과 연산 스레드 준비 (측정에서 제외)
+        for _ in searcher.map(queries[:workers]):
+            pass
+        latencies.clear()
+        start = time.perf_counter()
+        for _ in searcher.map(queries):
+            pass
+        elapsed = time.perf_counter() - start
+    return {
+        'workers': workers,
+        'threads': threads,
+        'qps': len(queries) / elapsed,
+        'p50_ms': float(np.percentile(latencies, 50)) * 1000.0,
+        'p95_ms': float(np.percentile(latencies, 95)) * 1000.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="동시 실행 수에 따른 검색 처리량(QPS)을 측정합니다.")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="임베딩 모델 ID")
+    parser.add_argument('--data', default='ia-data.json', help="메뉴 데이터 파일")
+    parser.add_argument('--segment', help="인덱스 세그먼트/아티팩트 (주면 --model, --data 대신 사용)")
+    parser.add_argument('--queries', help="검색어 파일 (.jsonl 또는 .csv, 없으면 메뉴 페이지명 사용)")
+    parser.add_argument('--requests', type=int, default=500, help="측정할 검색 수")
+    parser.add_argument('--max-workers', type=int, default=SEARCH_WORKERS)
+    parser.add_argument('--oversubscribe', action='store_true',
+                        help="비교용: 동시 실행 수와 관계없이 요청마다 코어 수만큼 연산 스레드 사용")
+    args = parser.parse_args()
+
+    model_manager = ModelManager()
+    if args.segment:
+        engine = SearchEngine.from_segment(model_manager, args.segment, use_cache=False)
+    else:
+        model_manager.load_model(args.model)
+        engine = SearchEngine(model_manager, use_cache=False)
+        engine.build_index(load_menu_data(args.data))
+
+    if args.queries:
+        queries = list(iter_queries(args.queries))
+    else:
+        queries = [item['page_name'] for item in engine.menu_data]
+    queries = (queries * (args.requests // max(1, len(queries)) + 1))[:args.requests]
+
+    print(f"{'workers':>7} {'threads':>7} {'QPS':>9} {'p50(ms)':>9} {'p95(ms)':>9} {'scaling':>8}")
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        threads = os.cpu_count() if args.oversubscribe else SEARCH_THREADS or threads_per_worker(workers)
+        result = measure(engine, queries, workers, threads)
+        baseline = baseline or result['qps']
+        print(f"{result['workers']:>7} {result['threads']:>7} {result['qps']:>9.1f} "
+              f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['qps'] / baseline:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import time
+from typing import Dict, List
+from model_manager import ModelManager
+from search_engine import SearchEngine
+from batch_search import iter_queries, DEFAULT_MODEL
+from main import load_menu_data
+from config import TOP_K_RESULTS, HIERARCHY_BEAM
+
+def measure(engine: SearchEngine, queries: List[str], beam: int, top_k: int) -> Dict[str, float]:
+    """계층 검색 결과가 전체 검색 상위 top_k와 얼마나 겹치는지와 점수를 매긴 메뉴 비율, 지연 시간을 잽니다."""
+    overlap, scored, hierarchical_time, flat_time = 0.0, 0, 0.0, 0.0
+    for query in queries:
+        start = time.perf_counter()
+        flat = engine.search(query, top_k=top_k)
+        flat_time += time.perf_counter() - start
+        start = time.perf_counter()
+        result = engine.search_hierarchical(query, top_k=top_k, beam=beam)
+        hierarchical_time += time.perf_counter() - start
+        expected = {(r['category'], r['service'], r['menu_item']) for r in flat}
+        found = {(r['category'], r['service'], r['menu_item']) for r in result['results']}
+        overlap += len(expected & found) / max(1, len(expected))
+        scored += result['scored_items']
+    return {
+        'beam': beam,
+        'recall': overlap / len(queries),
+        'scored': scored / len(queries) / len(engine.menu_data),
+        'flat_ms': flat_time / len(queries) * 1000.0,
+        'hierarchical_ms': hierarchical_time / len(queries) * 1000.0
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="계층 검색의 beam 크기별 recall과 점수 계산 비율을 측정합니다.")
+    parser.add_argument('--model', default=DEFAULT_MODEL, help="임베딩 모델 ID")
+    parser.add_argument('--data', default='ia-data.json', help="메뉴 데이터 파일")
+    parser.add_argument('--queries', help="검색어 파일 (.jsonl 또는 .csv, 없으면 메뉴 페이지명 사용)")
+    parser.add_argument('--limit', type=int, default=300, help="측정할 검색어 수")
+    parser.add_argument('--beams', type=int, nargs='+', default=[1, 2, HIERARCHY_BEAM, 8, 16])
+    parser.add_argument('--top-k', type=int, default=TOP_K_RESULTS)
+    args = parser.parse_args()
+
+    model_manager = ModelManager()
+    model_manager.load_model(args.model)
+    # 결과 캐시를 쓰면 전체 검색 시간이 캐시 조회 시간이 되므로 끔
+    engine = SearchEngine(model_manager, use_cache=False)
+    engine.build_index(load_menu_data(args.data))
+
+    if args.queries:
+        queries = list(iter_queries(args.queries))
+    else:
+        queries = [item['page_name'] for item in engine.menu_data]
+    step = max(1, len(queries) // args.limit)
+    queries = queries[::step][:args.limit]
+
+    print(f"{'beam':>5} {'recall@' + str(args.top_k):>9} {'scored':>8} {'flat(ms)':>9} {'tree(ms)':>9}")
+    for beam in args.beams:
+        result = measure(engine, queries, beam, args.top_k)
+        print(f"{result['beam']:>5} {result['recall']:>9.3f} {result['scored']:>7.1%} "
+              f"{result['flat_ms']:>9.2f} {result['hierarchical_ms']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
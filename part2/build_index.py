@@ -0,0 +1,56 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, Tuple
+from model_manager import ModelManager
+from search_engine import SearchEngine
+from main import load_menu_data
+from config import ARTIFACT_DIR, ARTIFACT_NAME, REDUCED_DIMENSION, REDUCTION_METHOD
+from common.index_store import IndexSegment, check_manifest, publish_artifact
+
+def build(model_id: str, menu_file: str, output_dir: str = ARTIFACT_DIR, name: str = ARTIFACT_NAME,
+          reduced_dimension: int = REDUCED_DIMENSION, reduction_method: str = REDUCTION_METHOD) -> Tuple[str, str, Dict[str, Any]]:
+    """메뉴 데이터로 인덱스를 구축해 버전이 붙은 아티팩트를 게시하고 (파일 경로, 링크 경로, manifest)를 반환합니다."""
+    timings = {}
+    start = time.perf_counter()
+    model_manager = ModelManager()
+    if not model_manager.load_model(model_id):
+        raise ValueError(f"모델을 로드할 수 없습니다: {model_id}")
+    timings['model_load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    menu_data = load_menu_data(menu_file)
+    if not menu_data:
+        raise ValueError(f"메뉴 데이터를 찾을 수 없습니다: {menu_file}")
+    timings['data_load'] = time.perf_counter() - start
+
+    engine = SearchEngine(model_manager, use_cache=False, reduced_dimension=reduced_dimension,
+                          reduction_method=reduction_method)
+    engine.build_index(menu_data)
+    manifest = engine.manifest(timings)
+    start = time.perf_counter()
+    path, link = publish_artifact(str(output_dir), name, engine.artifact_arrays(), manifest, list(menu_data))
+    # 기록 시간은 manifest를 쓴 뒤에야 알 수 있으므로 출력에만 포함
+    manifest['timings']['write'] = time.perf_counter() - start
+    return path, link, manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="메뉴 데이터로 검색 인덱스 아티팩트를 오프라인 빌드합니다.")
+    parser.add_argument('--model', default='jhgan/ko-sroberta-multitask', help="임베딩 모델 ID")
+    parser.add_argument('--data', default='ia-data.json', help="메뉴 데이터 파일")
+    parser.add_argument('--output-dir', default=str(ARTIFACT_DIR), help="아티팩트 디렉터리")
+    parser.add_argument('--name', default=ARTIFACT_NAME, help="아티팩트 이름 (<name>.seg 링크가 최신 버전을 가리킴)")
+    parser.add_argument('--dimension', type=int, default=REDUCED_DIMENSION,
+                        help="저장할 벡터 차원 (모델 차원보다 작으면 축소하고 recall@k를 manifest에 기록)")
+    parser.add_argument('--method', choices=['pca', 'truncate'], default=REDUCTION_METHOD, help="차원 축소 방식")
+    parser.add_argument('--show', metavar='ARTIFACT', help="빌드하지 않고 아티팩트의 manifest만 출력")
+    args = parser.parse_args()
+    if args.show:
+        print(json.dumps(check_manifest(IndexSegment(args.show), 'part2'), ensure_ascii=False, indent=2))
+        return
+    path, link, manifest = build(args.model, args.data, args.output_dir, args.name, args.dimension, args.method)
+    print(f"버전 {manifest['version']} 게시 완료: {path} ({link})")
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,15 @@
+import os
+import sys
 from pathlib import Path
 
-ROOT_DIR = Path(__file__).parent.parent
+ROOT_DIR = Path(__file__).resolve().parent.parent
+# 공용 모듈(common 패키지)을 import할 수 있도록 저장소 루트를 경로에 추가
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
 DATA_DIR = ROOT_DIR / "part2" / "data"
 MODEL_CACHE_DIR = ROOT_DIR / "part2" / "model_cache"
+RESULT_CACHE_PATH = ROOT_DIR / "part2" / "result_cache.sqlite3"  # None이면 프로세스 내 캐시만 사용
+RESULT_CACHE_SIZE = 1024  # 프로세스 내 LRU 항목 수
 
 AVAILABLE_MODELS = {
     "jhgan/ko-sroberta-multitask": {
@@ -23,4 +30,57 @@ AVAILABLE_MODELS = {
 }
 
 TOP_K_RESULTS = 5
-SIMILARITY_THRESHOLD = 0.5 
\ No newline at end of file
+SIMILARITY_THRESHOLD = 0.5 
+
+# 요청별 가중치 검색 (search(query, weights=...))
+EXACT_SCAN_MAX_ITEMS = 50000  # 메뉴 수가 이보다 많으면 가중치별 결합 인덱스를 만들어 재사용 (결과는 같음)
+WEIGHTED_INDEX_CACHE_SIZE = 4  # 보관할 가중치별 결합 인덱스 수
+
+BATCH_SIZE = 256
+BATCH_WORKERS = 1
+
+# 오타 교정 (fuzzy_matcher.py)
+FUZZY_ENABLED = True
+FUZZY_MAX_DISTANCE = 2  # 자모 단위 최대 편집 거리
+
+# OpenAI 매칭 설정
+OPENAI_PREFILTER_K = 60  # 로컬 색인으로 미리 좁힐 후보 수 (None이면 전체 메뉴 사용)
+OPENAI_CHUNK_SIZE = 100  # 한 번의 요청에 넣을 최대 후보 수 (넘으면 나눠서 병렬 요청 후 한 번 더 병합 요청하므로 PREFILTER_K보다 크게)
+OPENAI_MAX_WORKERS = 4  # 동시에 보낼 최대 요청 수
+
+# OpenAI 클라이언트 설정 (llm_client.py)
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # 로컬 가짜 서버 등 다른 주소로 보낼 때 설정
+OPENAI_TIMEOUT = 10.0  # 요청 1회 타임아웃(초)
+OPENAI_DEADLINE = 30.0  # 재시도를 포함한 요청 전체 제한 시간(초)
+OPENAI_MAX_RETRIES = 3  # 타임아웃/속도 제한/서버 오류 시 재시도 횟수
+OPENAI_MAX_CONNECTIONS = 20  # 연결 풀 크기
+OPENAI_CONCURRENCY = {'chat': 4, 'embeddings': 8}  # 엔드포인트별 동시 요청 수
+OPENAI_TOKENS_PER_MINUTE = {'chat': 90000, 'embeddings': 1000000}  # 엔드포인트별 분당 토큰 제한
+OPENAI_BREAKER_FAILURES = 5  # 연속 실패가 이 횟수에 이르면 회로 차단
+OPENAI_BREAKER_RESET = 30.0  # 회로 차단 후 시험 요청까지 대기 시간(초)
+
+# 오프라인 인덱스 빌드 (build_index.py)
+ARTIFACT_DIR = ROOT_DIR / "part2" / "artifacts"
+ARTIFACT_NAME = "menu_index"  # <ARTIFACT_NAME>.seg 링크가 최신 버전을 가리킴
+
+# 동시 검색 (concurrency.py)
+SEARCH_WORKERS = os.cpu_count() or 1  # 동시에 실행할 검색 수 (벤치마크는 1부터 이 값까지 측정)
+SEARCH_THREADS = None  # 검색 하나가 쓸 torch/FAISS 연산 스레드 수 (None이면 코어 수 / SEARCH_WORKERS)
+
+# 프로파일링 (profiling.py, 기본값은 꺼짐)
+PROFILE_DIR = os.getenv('PROFILE_DIR', str(ROOT_DIR / "part2" / "profiles"))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # cProfile로 기록할 검색 비율 (0이면 profile=True로 요청한 검색만)
+PROFILE_MEMORY = os.getenv('PROFILE_MEMORY') == '1'  # build_index()의 tracemalloc 메모리 보고
+
+# 차원 축소 (dim_reduction.py)
+REDUCED_DIMENSION = None  # 저장할 벡터 차원 (예: 256). None이면 모델 차원 그대로
+REDUCTION_METHOD = 'pca'  # 'pca' 또는 'truncate'(matryoshka 방식으로 학습된 모델)
+REDUCTION_EVAL_QUERIES = 1000  # 축소 전/후 recall@k 비교에 쓸 쿼리 수 (메뉴 page_name 벡터에서 추출)
+REDUCTION_EVAL_KS = (1, 5, 10)
+
+# 계층 검색 (hierarchy_index.py, search_hierarchical())
+HIERARCHY_BEAM = 4  # 단계마다 내려갈 구역 수 (클수록 정확하지만 점수를 매길 메뉴가 늘어남)
+HIERARCHY_LEAF_SIZE = 32  # 하위 메뉴가 이 수 이하인 구역은 더 내려가지 않고 통째로 점수 계산
+HIERARCHY_SECTIONS = 3  # 함께 반환할 구역 결과 수
+HIERARCHY_SECTION_MIN_ITEMS = 2  # 구역 결과로 낼 최소 메뉴 수 (메뉴 하나뿐인 구역은 그 메뉴와 같음)
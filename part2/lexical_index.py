@@ -0,0 +1,47 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from typing import List, Tuple
+
+class LexicalIndex:
+    """문자 n-gram TF-IDF 역색인. 임베딩 모델 없이 후보 메뉴를 빠르게 좁히는 데 사용합니다."""
+
+    def __init__(self, texts: List[str], ngram_sizes: Tuple[int, ...] = (1, 2)):
+        self.ngram_sizes = ngram_sizes
+        self.size = len(texts)
+        doc_grams = [Counter(self._grams(text)) for text in texts]
+
+        document_frequency = Counter()
+        for grams in doc_grams:
+            document_frequency.update(grams.keys())
+        self.idf = {
+            gram: math.log((1 + self.size) / (1 + df)) + 1.0
+            for gram, df in document_frequency.items()
+        }
+
+        # gram -> [(문서 번호, 가중치)], 문서 벡터는 L2 정규화
+        self.postings = defaultdict(list)
+        for doc_id, grams in enumerate(doc_grams):
+            weights = {gram: (1 + math.log(tf)) * self.idf[gram] for gram, tf in grams.items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for gram, weight in weights.items():
+                self.postings[gram].append((doc_id, weight / norm))
+
+    def _grams(self, text: str) -> List[str]:
+        """공백을 제거한 소문자 문자열의 n-gram 목록"""
+        text = ''.join(text.lower().split())
+        return [text[i:i + n] for n in self.ngram_sizes for i in range(len(text) - n + 1)]
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """쿼리와 코사인 유사도가 높은 상위 k개 (문서 번호, 점수)를 반환합니다."""
+        grams = Counter(self._grams(query))
+        weights = {gram: (1 + math.log(tf)) * self.idf[gram] for gram, tf in grams.items() if gram in self.idf}
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        if not norm:
+            return []
+
+        scores = defaultdict(float)
+        for gram, weight in weights.items():
+            for doc_id, doc_weight in self.postings[gram]:
+                scores[doc_id] += weight * doc_weight
+        return heapq.nlargest(k, ((doc_id, score / norm) for doc_id, score in scores.items()), key=lambda x: x[1])
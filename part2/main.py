@@ -1,7 +1,8 @@
 import json
 from model_manager import ModelManager
 from search_engine import SearchEngine
-from config import DATA_DIR
+from config import DATA_DIR, ARTIFACT_DIR, ARTIFACT_NAME
+from common.index_store import IndexSegment, check_manifest
 import os
 
 def format_similarity_score(score):
@@ -59,9 +60,18 @@ def main():
                 print("올바른 번호를 입력해주세요.")
         except ValueError:
             print("숫자를 입력해주세요.")
-    print("\n검색 인덱스 구축 중...")
-    search_engine.build_index(menu_data)
-    print("검색 인덱스 구축 완료!")
+    artifact_path = os.path.join(ARTIFACT_DIR, f"{ARTIFACT_NAME}.seg")
+    if os.path.exists(artifact_path):
+        # build_index.py로 미리 만든 아티팩트가 같은 모델/데이터로 만들어졌으면 인덱스 구축 없이 시작
+        try:
+            if check_manifest(IndexSegment(artifact_path), 'part2')['model'] == model_id:
+                search_engine = SearchEngine.load_artifact(model_manager, artifact_path, "ia-data.json")
+        except ValueError as e:
+            print(f"아티팩트를 사용할 수 없어 새로 구축합니다: {e}")
+    if search_engine.index is None:
+        print("\n검색 인덱스 구축 중...")
+        search_engine.build_index(menu_data)
+        print("검색 인덱스 구축 완료!")
     while True:
         query = input("\n검색어를 입력하세요 (종료하려면 'q' 입력): ")
         if query.lower() == 'q':
@@ -1,11 +1,29 @@
+import threading
+from typing import NamedTuple
 from sentence_transformers import SentenceTransformer
 from config import AVAILABLE_MODELS, MODEL_CACHE_DIR
 
+class LoadedModel(NamedTuple):
+    """로드된 모델 (모델 ID와 모델 객체를 한 번에 바꾸기 위한 불변 쌍)"""
+    model_id: str
+    model: SentenceTransformer
+
+    def encode(self, texts):
+        return self.model.encode(texts, convert_to_tensor=True)
+
 class ModelManager:
     def __init__(self):
-        self.current_model = None
-        self.model_name = None
+        self.active = None  # LoadedModel, load_model()이 참조 하나만 교체
         self.available_models = AVAILABLE_MODELS
+        self._load_lock = threading.Lock()
+    @property
+    def current_model(self):
+        active = self.active
+        return active.model if active else None
+    @property
+    def model_name(self):
+        active = self.active
+        return active.model_id if active else None
     def list_available_models(self):
         return {
             model_id: {
@@ -18,19 +36,23 @@ class ModelManager:
     def load_model(self, model_id):
         if model_id not in self.available_models:
             raise ValueError(f"Model {model_id} not found in available models")
-        self.current_model = SentenceTransformer(model_id, cache_folder=str(MODEL_CACHE_DIR))
-        self.model_name = model_id
+        # 동시에 들어온 로드는 순서대로 처리하고, 진행 중인 encode는 교체 전 모델로 끝까지 수행
+        with self._load_lock:
+            if self.model_name != model_id:
+                self.active = LoadedModel(model_id, SentenceTransformer(model_id, cache_folder=str(MODEL_CACHE_DIR)))
         return True
     def get_current_model_info(self):
-        if not self.current_model:
+        active = self.active
+        if not active:
             return None
         return {
-            "model_id": self.model_name,
-            "name": self.available_models[self.model_name]["name"],
-            "dimension": self.available_models[self.model_name]["dimension"],
-            "description": self.available_models[self.model_name]["description"]
+            "model_id": active.model_id,
+            "name": self.available_models[active.model_id]["name"],
+            "dimension": self.available_models[active.model_id]["dimension"],
+            "description": self.available_models[active.model_id]["description"]
         }
     def encode(self, texts):
-        if not self.current_model:
+        active = self.active
+        if not active:
             raise ValueError("No model loaded. Please load a model first.")
-        return self.current_model.encode(texts, convert_to_tensor=True) 
\ No newline at end of file
+        return active.encode(texts)
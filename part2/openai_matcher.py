@@ -1,29 +1,48 @@
-import openai
 import json
 import os
-from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional
 import logging
+from lexical_index import LexicalIndex
+import config
+from config import OPENAI_PREFILTER_K, OPENAI_CHUNK_SIZE, OPENAI_MAX_WORKERS, FUZZY_ENABLED, FUZZY_MAX_DISTANCE
+from common.fuzzy_matcher import FuzzyMatcher
+from common.llm_client import ResilientOpenAIClient, CircuitOpenError
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class OpenAIMenuMatcher:
-    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo"):
+    def __init__(self, api_key: str = None, model: str = "gpt-3.5-turbo",
+                 prefilter_k: Optional[int] = OPENAI_PREFILTER_K, chunk_size: Optional[int] = OPENAI_CHUNK_SIZE,
+                 max_workers: int = OPENAI_MAX_WORKERS, search_engine=None,
+                 client: Optional[ResilientOpenAIClient] = None):
         """
         OpenAI를 사용한 메뉴 매칭 시스템 초기화
         
         Args:
             api_key: OpenAI API 키 (환경변수 OPENAI_API_KEY에서도 읽을 수 있음)
             model: 사용할 OpenAI 모델명
+            prefilter_k: 프롬프트에 넣기 전에 로컬 색인으로 좁힐 후보 수 (None이면 전체 메뉴)
+            chunk_size: 한 번의 요청에 넣을 최대 후보 수 (넘으면 나눠서 병렬 요청 후 병합)
+            max_workers: 동시에 보낼 최대 요청 수
+            search_engine: 인덱스가 구축된 SearchEngine (주면 벡터 검색으로 후보를 좁힘, 없으면 문자 n-gram 색인 사용)
+            client: OpenAI 클라이언트 (기본값: 설정 파일 기반 ResilientOpenAIClient)
         """
         self.model = model
+        self.prefilter_k = prefilter_k
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.search_engine = search_engine
+        self.lexical_index = None
+        self.fuzzy_matcher = None
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         
         if not self.api_key:
             raise ValueError("OpenAI API 키가 필요합니다. 환경변수 OPENAI_API_KEY를 설정하거나 api_key 매개변수를 전달하세요.")
         
-        openai.api_key = self.api_key
+        self.client = client or ResilientOpenAIClient.from_config(config, api_key=self.api_key)
         self.menu_data = []
         
     def load_menu_data(self, menu_file: str = "ia-data.json"):
@@ -38,6 +57,9 @@ class OpenAIMenuMatcher:
                     self.menu_data = data["menu"]
                 else:
                     self.menu_data = data
+            self.lexical_index = LexicalIndex([self._menu_search_text(item) for item in self.menu_data])
+            if FUZZY_ENABLED:
+                self.fuzzy_matcher = FuzzyMatcher.from_menu_data(self.menu_data, FUZZY_MAX_DISTANCE)
             logger.info(f"메뉴 데이터 {len(self.menu_data)}개 로드 완료")
         except Exception as e:
             logger.error(f"메뉴 데이터 로드 실패: {e}")
@@ -57,20 +79,76 @@ class OpenAIMenuMatcher:
         if not self.menu_data:
             raise ValueError("메뉴 데이터가 로드되지 않았습니다. load_menu_data()를 먼저 호출하세요.")
         
-        # 메뉴 이름 리스트 생성
-        menu_names = []
-        for item in self.menu_data:
-            if isinstance(item, dict):
-                name = item.get('name', item.get('menu_name', str(item)))
-            else:
-                name = str(item)
-            menu_names.append(name)
+        candidates = self._prefilter(query)
+        if not candidates:
+            return []
+        
+        # OpenAI 회로가 열려 있으면 기다리지 않고 로컬 색인 결과를 그대로 반환
+        if not self.client.is_available('chat'):
+            return self._local_results(candidates, top_k)
+        
+        try:
+            return self._rank_chunks(query, candidates, top_k)
+        except CircuitOpenError:
+            return self._local_results(candidates, top_k)
+    
+    def _rank_chunks(self, query: str, candidates: List[int], top_k: int) -> List[Dict]:
+        """후보가 많으면 나눠서 병렬로 순위를 매긴 뒤 병합합니다."""
+        if self.chunk_size and len(candidates) > self.chunk_size:
+            chunks = [candidates[i:i + self.chunk_size] for i in range(0, len(candidates), self.chunk_size)]
+        else:
+            chunks = [candidates]
+        
+        if len(chunks) == 1:
+            return self._rank_candidates(query, chunks[0], top_k)
+        
+        # 후보 묶음별로 병렬 요청해 묶음마다 상위 top_k개씩 고름
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            chunk_results = list(executor.map(lambda chunk: self._rank_candidates(query, chunk, top_k), chunks))
+        # confidence는 프롬프트마다 따로 매긴 값이라 묶음끼리 비교할 수 없으므로,
+        # 묶음별로 고른 후보를 로컬 색인 순서대로 모아 한 번의 요청으로 최종 순위를 매김
+        selected = {result['menu_index'] for results in chunk_results for result in results}
+        finalists = [idx for idx in candidates if idx in selected]
+        if not finalists:
+            return []
+        return self._rank_candidates(query, finalists, top_k)
+    
+    def _local_results(self, candidates: List[int], top_k: int) -> List[Dict]:
+        """로컬 색인 순위를 그대로 결과 형식으로 변환 (OpenAI를 쓸 수 없을 때)"""
+        logger.warning("OpenAI 사용 불가: 로컬 색인 결과로 대체합니다.")
+        return [
+            {
+                'menu': self.menu_data[idx],
+                'name': self._menu_label(self.menu_data[idx]),
+                'similarity_reason': '로컬 검색 결과 (OpenAI 사용 불가)',
+                'confidence': 0.0
+            }
+            for idx in candidates[:top_k]
+        ]
+    
+    def _prefilter(self, query: str) -> List[int]:
+        """LLM에 보낼 후보 메뉴 인덱스를 로컬 색인으로 좁힙니다."""
+        if not self.prefilter_k or self.prefilter_k >= len(self.menu_data):
+            return list(range(len(self.menu_data)))
+        if self.search_engine is not None and self.search_engine.index:
+            return self.search_engine.candidate_indices(query, self.prefilter_k)
+        if self.lexical_index is None or self.lexical_index.size != len(self.menu_data):
+            self.lexical_index = LexicalIndex([self._menu_search_text(item) for item in self.menu_data])
+        # 오타를 메뉴 용어로 교정해 겹치는 n-gram을 늘림 (LLM에는 원래 쿼리를 보냄)
+        if self.fuzzy_matcher is not None:
+            query = self.fuzzy_matcher.rewrite(query)
+        # 겹치는 글자가 전혀 없으면 관련 없는 메뉴를 LLM에 보내지 않도록 후보 없음
+        return [idx for idx, _ in self.lexical_index.search(query, self.prefilter_k)]
+    
+    def _rank_candidates(self, query: str, candidates: List[int], top_k: int) -> List[Dict]:
+        """후보 메뉴 목록만 프롬프트에 넣어 OpenAI로 순위를 매깁니다."""
+        menu_names = [self._menu_label(self.menu_data[idx]) for idx in candidates]
         
         # OpenAI API 호출을 위한 프롬프트 생성
         prompt = self._create_matching_prompt(query, menu_names, top_k)
         
         try:
-            response = openai.ChatCompletion.create(
+            response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "당신은 한국 음식 메뉴 매칭 전문가입니다. 사용자가 입력한 메뉴와 가장 유사한 메뉴들을 찾아주세요."},
@@ -81,12 +159,30 @@ class OpenAIMenuMatcher:
             )
             
             result = response.choices[0].message.content.strip()
-            return self._parse_ai_response(result, top_k)
+            return self._parse_ai_response(result, top_k, candidates)
             
         except Exception as e:
             logger.error(f"OpenAI API 호출 실패: {e}")
             raise
     
+    def _menu_label(self, item) -> str:
+        """프롬프트에 넣을 메뉴 표시 문자열 (ia-data.json은 page_name/Service 키를 사용)"""
+        if not isinstance(item, dict):
+            return str(item)
+        name = item.get('page_name') or item.get('name') or item.get('menu_name')
+        if not name:
+            return str(item)
+        service = item.get('Service')
+        return f"{name} ({service})" if service else name
+    
+    def _menu_search_text(self, item) -> str:
+        """로컬 색인에 넣을 메뉴 텍스트"""
+        if not isinstance(item, dict):
+            return str(item)
+        parts = [item.get('page_name') or item.get('name') or item.get('menu_name') or '',
+                 item.get('Service', ''), ' '.join(item.get('hierarchy', []))]
+        return ' '.join(part for part in parts if part)
+    
     def _create_matching_prompt(self, query: str, menu_names: List[str], top_k: int) -> str:
         """AI 매칭을 위한 프롬프트 생성"""
         menu_list = "\n".join([f"{i+1}. {name}" for i, name in enumerate(menu_names)])
@@ -121,8 +217,8 @@ confidence는 0.0~1.0 사이의 값으로, 높을수록 더 유사함을 의미
 """
         return prompt
     
-    def _parse_ai_response(self, response: str, top_k: int) -> List[Dict]:
-        """AI 응답을 파싱하여 결과 반환"""
+    def _parse_ai_response(self, response: str, top_k: int, candidates: Optional[List[int]] = None) -> List[Dict]:
+        """AI 응답을 파싱하여 결과 반환 (candidates가 있으면 응답 번호를 해당 메뉴 인덱스로 변환)"""
         try:
             # JSON 부분 추출
             start_idx = response.find('{')
@@ -140,10 +236,13 @@ confidence는 0.0~1.0 사이의 값으로, 높을수록 더 유사함을 의미
             
             for match in matches[:top_k]:
                 index = match.get('index', 0) - 1  # 1-based to 0-based
+                if candidates is not None:
+                    index = candidates[index] if 0 <= index < len(candidates) else -1
                 if 0 <= index < len(self.menu_data):
                     menu_item = self.menu_data[index]
                     results.append({
                         'menu': menu_item,
+                        'menu_index': index,
                         'name': match.get('name', ''),
                         'similarity_reason': match.get('similarity_reason', ''),
                         'confidence': match.get('confidence', 0.0)
@@ -162,8 +261,8 @@ confidence는 0.0~1.0 사이의 값으로, 높을수록 더 유사함을 의미
     def get_menu_details(self, menu_item: Dict) -> str:
         """메뉴 상세 정보 문자열 생성"""
         if isinstance(menu_item, dict):
-            name = menu_item.get('name', menu_item.get('menu_name', '알 수 없음'))
-            category = menu_item.get('category', '')
+            name = menu_item.get('page_name') or menu_item.get('name') or menu_item.get('menu_name') or '알 수 없음'
+            category = menu_item.get('Category', menu_item.get('category', ''))
             price = menu_item.get('price', '')
             description = menu_item.get('description', '')
             
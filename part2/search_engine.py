@@ -1,86 +1,564 @@
 import json
+import threading
+import time
+from collections import OrderedDict
+from numbers import Real
 import numpy as np
 import faiss
 from typing import List, Dict, Tuple, Any
-from config import TOP_K_RESULTS
+from config import (
+    AVAILABLE_MODELS, TOP_K_RESULTS, RESULT_CACHE_PATH, RESULT_CACHE_SIZE, FUZZY_ENABLED, FUZZY_MAX_DISTANCE,
+    EXACT_SCAN_MAX_ITEMS, WEIGHTED_INDEX_CACHE_SIZE, PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY,
+    REDUCED_DIMENSION, REDUCTION_METHOD, REDUCTION_EVAL_QUERIES, REDUCTION_EVAL_KS, HIERARCHY_BEAM, HIERARCHY_LEAF_SIZE,
+    HIERARCHY_SECTIONS, HIERARCHY_SECTION_MIN_ITEMS
+)
+from common.result_cache import ResultCache, content_hash
+from common.fuzzy_matcher import FuzzyMatcher
+from common.profiling import Profiler
+from common.dim_reduction import Projection, recall_at_k, sample_rows
+from common.hierarchy_index import HierarchyTree
+from common.index_store import IndexSegment, MappedFlatIndex, write_segment, make_manifest, check_manifest
+
+# field_embeddings의 필드 순서
+FIELDS = ('page_name', 'service', 'context')
+
+def normalize_embeddings(embeddings):
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+def combine_fields(field_embeddings: np.ndarray, weights: Dict[str, float]) -> np.ndarray:
+    """(3, N, D) 필드 행렬을 가중치로 결합해 정규화한 (N, D) 행렬"""
+    combined = np.ascontiguousarray(np.tensordot(
+        np.array([weights[field] for field in FIELDS], dtype='float32'), field_embeddings, axes=1
+    ))
+    return normalize_embeddings(combined)
+
+class IndexSnapshot:
+    """한 번 구축한 뒤 바뀌지 않는 인덱스 상태 (모델, 메뉴 데이터, 필드 벡터, 결합 인덱스)
+
+    엔진은 인덱스를 다시 구축하거나 세그먼트를 다시 매핑할 때 새 스냅샷을 만들어 참조 하나만 교체하므로,
+    교체 도중에 들어온 검색도 시작할 때 잡은 스냅샷으로 끝까지 일관되게 계산합니다.
+    쿼리는 스냅샷을 만들 때의 모델로 인코딩하므로 ModelManager의 모델이 바뀌어도 인덱스와 섞이지 않습니다.
+    """
+
+    def __init__(self, model, menu_data, data_hash: str, weights: Dict[str, float], field_embeddings: np.ndarray,
+                 field_gram: np.ndarray, index=None,
+                 segment: IndexSegment = None, build_timings: Dict[str, float] = None,
+                 projection: Projection = None, reduction: Dict[str, Any] = None):
+        self.model = model
+        self.menu_data = menu_data
+        self.data_hash = data_hash
+        self.weights = weights
+        self.field_embeddings = field_embeddings
+        self.page_name_embeddings, self.service_embeddings, self.context_embeddings = field_embeddings
+        self.field_gram = field_gram
+        self.dimension = field_embeddings.shape[2]
+        self.segment = segment
+        self.build_timings = build_timings or {}
+        # 차원 축소를 했으면 쿼리도 같은 사영을 거쳐야 함 (reduction: 방식, 차원, 축소 전 대비 recall@k)
+        self.projection = projection
+        self.reduction = reduction
+        # 가중치별 결합 인덱스 LRU (스냅샷과 함께 교체됨)
+        self.weighted_indexes = OrderedDict()
+        self._lock = threading.Lock()
+        self._hierarchy = None
+        self._fuzzy_matcher = None
+        self.index = index if index is not None else self._build_weighted_index(weights)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """스냅샷의 모델로 쿼리를 인코딩해 정규화합니다 (차원 축소를 했으면 같은 사영 적용)."""
+        vectors = normalize_embeddings(self.model.encode(texts).cpu().numpy().astype('float32'))
+        return self.projection.transform(vectors) if self.projection is not None else vectors
+
+    def _build_weighted_index(self, weights: Dict[str, float]):
+        """쌓아 둔 필드 행렬을 가중치로 결합해 정규화한 FAISS 인덱스를 만듭니다 (재인코딩 없음)."""
+        index = faiss.IndexFlatIP(self.dimension)
+        index.add(combine_fields(self.field_embeddings, weights))
+        return index
+
+    @property
+    def fuzzy_matcher(self) -> FuzzyMatcher:
+        """메뉴 용어 오타 색인 (처음 교정할 때 만들어 둠, FUZZY_ENABLED가 꺼져 있으면 None)
+
+        색인은 프로세스마다 수십 MiB이므로 세그먼트를 매핑한 워커도 교정을 하지 않으면 만들지 않습니다.
+        """
+        matcher = self._fuzzy_matcher
+        if matcher is None and FUZZY_ENABLED:
+            # 동시에 처음 요청하면 중복으로 만들 수 있지만 결과는 같음
+            matcher = self._fuzzy_matcher = FuzzyMatcher.from_menu_data(self.menu_data, FUZZY_MAX_DISTANCE)
+        return matcher
+
+    def rewrite_query(self, query: str) -> str:
+        """메뉴 용어 색인으로 쿼리의 오타를 교정합니다."""
+        matcher = self.fuzzy_matcher
+        return matcher.rewrite(query) if matcher is not None else query
+
+    def resolve_weights(self, weights: Dict[str, float] = None) -> Dict[str, float]:
+        """요청별 가중치를 기본 가중치와 합칩니다. 바꿀 필드만 지정하면 됩니다."""
+        if not weights:
+            return self.weights
+        unknown = set(weights) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"알 수 없는 가중치 필드: {sorted(unknown)} (사용 가능: {list(FIELDS)})")
+        merged = {**self.weights, **weights}
+        if not all(isinstance(value, Real) and not isinstance(value, bool) for value in merged.values()):
+            raise ValueError("가중치는 숫자여야 합니다.")
+        if any(value < 0 for value in merged.values()):
+            raise ValueError("가중치는 0 이상이어야 합니다.")
+        if not any(merged.values()):
+            raise ValueError("가중치가 모두 0일 수는 없습니다.")
+        return merged
+
+    def field_similarities(self, query_vectors: np.ndarray) -> np.ndarray:
+        """쌓아 둔 (3N, D) 행렬과 한 번의 행렬 곱으로 모든 필드의 유사도를 계산합니다 -> (3, N) 또는 (Q, 3, N)"""
+        fields, n, dim = self.field_embeddings.shape
+        scores = query_vectors @ self.field_embeddings.reshape(fields * n, dim).T
+        return scores.reshape(scores.shape[:-1] + (fields, n))
+
+    def _combined_norms(self, w: np.ndarray, gram: np.ndarray) -> np.ndarray:
+        """가중 결합 벡터 sum(w_f * e_f)의 노름 = sqrt(w^T G w)"""
+        return np.sqrt(np.maximum(np.einsum('f,nfg,g->n', w, gram, w), 1e-12))
+
+    def top_k_weighted(self, query_vector: np.ndarray, weights: Dict[str, float], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """정규화된 가중 결합 벡터와의 내적(인덱스 점수와 같은 기준)으로 상위 top_k개의 (점수, 인덱스)를 구합니다."""
+        w = np.array([weights[field] for field in FIELDS], dtype='float32')
+        if len(self.menu_data) > EXACT_SCAN_MAX_ITEMS:
+            # 메뉴가 많으면 가중치별 결합 인덱스(N행)로 검색해 3N행 전체를 훑지 않음
+            scores, indices = self.weighted_index(weights).search(query_vector[None, :], top_k)
+            valid = indices[0] >= 0
+            return scores[0][valid], indices[0][valid]
+        scores = (w @ self.field_similarities(query_vector)) / self._combined_norms(w, self.field_gram)
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return scores[top], top
+
+    def top_k_weighted_many(self, query_vectors: np.ndarray, weights: Dict[str, float],
+                            top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """여러 쿼리의 상위 top_k개를 한 번에 구합니다 -> (Q, top_k) 점수와 인덱스 (모자라면 인덱스 -1)"""
+        if weights == self.weights:
+            return self.index.search(query_vectors, top_k)
+        if len(self.menu_data) > EXACT_SCAN_MAX_ITEMS:
+            return self.weighted_index(weights).search(query_vectors, top_k)
+        # (Q, 3, N) 필드 유사도를 한 번의 행렬 곱으로 구해 가중 결합한 뒤 행마다 부분 정렬
+        w = np.array([weights[field] for field in FIELDS], dtype='float32')
+        scores = np.einsum('f,qfn->qn', w, self.field_similarities(query_vectors)) / self._combined_norms(w, self.field_gram)
+        return MappedFlatIndex.top_k(scores, top_k)
+
+    def weighted_index(self, weights: Dict[str, float]):
+        """가중치별 결합 인덱스 (최근 사용한 WEIGHTED_INDEX_CACHE_SIZE개만 보관)"""
+        if weights == self.weights:
+            return self.index
+        key = tuple(float(weights[field]) for field in FIELDS)
+        with self._lock:
+            index = self.weighted_indexes.get(key)
+            if index is not None:
+                self.weighted_indexes.move_to_end(key)
+                return index
+        # 구축은 잠금 밖에서 (같은 가중치로 동시에 들어오면 중복으로 만들 수 있지만 결과는 같음)
+        index = self._build_weighted_index(weights)
+        with self._lock:
+            self.weighted_indexes[key] = index
+            while len(self.weighted_indexes) > WEIGHTED_INDEX_CACHE_SIZE:
+                self.weighted_indexes.popitem(last=False)
+        return index
+
+    def hierarchy(self) -> HierarchyTree:
+        """메뉴 계층 트리 (처음 요청할 때 기본 가중치 결합 벡터로 구역 중심 벡터를 만들어 둠)"""
+        tree = self._hierarchy
+        if tree is None:
+            # 동시에 처음 요청하면 중복으로 만들 수 있지만 결과는 같음
+            tree = self._hierarchy = HierarchyTree.build(self.menu_data, combine_fields(self.field_embeddings, self.weights))
+        return tree
+
+    def weighted_scores(self, query_vector: np.ndarray, weights: Dict[str, float], rows: np.ndarray) -> np.ndarray:
+        """rows 메뉴만 골라 정규화된 가중 결합 벡터와의 내적을 계산합니다 (top_k_weighted와 같은 기준)."""
+        w = np.array([weights[field] for field in FIELDS], dtype='float32')
+        similarities = self.field_embeddings[:, rows] @ query_vector
+        return (w @ similarities) / self._combined_norms(w, self.field_gram[rows])
+
+    def format_section(self, tree: HierarchyTree, node: int, score: float) -> Dict[str, Any]:
+        """구역 결과 한 건 (메뉴 결과와 같은 0.6 ~ 1.0 범위의 유사도)"""
+        return {**tree.section(node), 'similarity': 0.6 + (float(score) * 0.4)}
+
+    def format_result(self, query_vector, score, idx, weights: Dict[str, float] = None) -> Dict[str, Any]:
+        """인덱스 검색 결과 한 건을 필드별 유사도와 함께 결과 형식으로 변환합니다."""
+        weights = weights or self.weights
+        item = self.menu_data[idx]
+        # 각각의 유사도 계산
+        page_sim = float(np.dot(query_vector, self.page_name_embeddings[idx]))
+        service_sim = float(np.dot(query_vector, self.service_embeddings[idx]))
+        context_sim = float(np.dot(query_vector, self.context_embeddings[idx]))
+
+        # 유사도 점수 조정 (0.6 ~ 1.0 범위로)
+        page_sim = 0.6 + (page_sim * 0.4)
+        service_sim = 0.6 + (service_sim * 0.4)
+        context_sim = 0.6 + (context_sim * 0.4)
+        total_sim = 0.6 + (float(score) * 0.4)
+
+        # 가중치 적용
+        weighted_score = (
+            weights['page_name'] * page_sim +
+            weights['service'] * service_sim +
+            weights['context'] * context_sim
+        )
+
+        return {
+            'similarity': total_sim,
+            'page_name_similarity': page_sim,
+            'service_similarity': service_sim,
+            'context_similarity': context_sim,
+            'weighted_score': weighted_score,
+            'category': item['Category'],
+            'service': item['Service'],
+            'menu_item': item['page_name']
+        }
+
+def _snapshot_attribute(name, default=None):
+    """현재 스냅샷의 속성을 읽는 엔진 속성 (인덱스가 없으면 default)"""
+    def getter(self):
+        snapshot = self.snapshot
+        return getattr(snapshot, name) if snapshot is not None else default
+    return property(getter)
 
 class SearchEngine:
-    def __init__(self, model_manager):
+    # 인덱스 상태는 모두 현재 스냅샷에서 읽음 (읽기 전용)
+    menu_data = _snapshot_attribute('menu_data', [])
+    index = _snapshot_attribute('index')
+    dimension = _snapshot_attribute('dimension')
+    data_hash = _snapshot_attribute('data_hash')
+    fuzzy_matcher = _snapshot_attribute('fuzzy_matcher')
+    field_embeddings = _snapshot_attribute('field_embeddings')
+    page_name_embeddings = _snapshot_attribute('page_name_embeddings')
+    service_embeddings = _snapshot_attribute('service_embeddings')
+    context_embeddings = _snapshot_attribute('context_embeddings')
+    field_gram = _snapshot_attribute('field_gram')
+    weighted_indexes = _snapshot_attribute('weighted_indexes')
+    segment = _snapshot_attribute('segment')
+    projection = _snapshot_attribute('projection')
+    reduction = _snapshot_attribute('reduction')
+    build_timings = _snapshot_attribute('build_timings', {})
+
+    def __init__(self, model_manager, use_cache: bool = True, reduced_dimension: int = REDUCED_DIMENSION,
+                 reduction_method: str = REDUCTION_METHOD):
+        """
+        Args:
+            model_manager: 모델을 로드한 ModelManager
+            use_cache: 검색 결과 캐시 사용 여부
+            reduced_dimension: build_index()에서 벡터를 이 차원으로 줄여 저장 (None이면 모델 차원 그대로)
+            reduction_method: 'pca' 또는 'truncate'
+        """
         self.model_manager = model_manager
-        self.menu_data = []
-        self.index = None
-        self.dimension = None
+        self.reduced_dimension = reduced_dimension
+        self.reduction_method = reduction_method
+        self.snapshot = None  # IndexSnapshot, build_index()/세그먼트 매핑 때 참조 하나만 교체
         self.WEIGHTS = {'page_name': 0.4, 'service': 0.4, 'context': 0.2}
+        self.result_cache = ResultCache('part2', RESULT_CACHE_PATH, RESULT_CACHE_SIZE) if use_cache else None
+        # 기본적으로 꺼져 있음 (PROFILE_SAMPLE_RATE/PROFILE_MEMORY 환경 변수 또는 search(..., profile=True))
+        self.profiler = Profiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY)
 
     def normalize_embeddings(self, embeddings):
-        faiss.normalize_L2(embeddings)
-        return embeddings
+        return normalize_embeddings(embeddings)
 
     def build_index(self, menu_data):
-        self.menu_data = menu_data
-        self.dimension = self.model_manager.get_current_model_info()['dimension']
+        # PROFILE_MEMORY가 켜져 있으면 인코딩/인덱스 구축 중 메모리 사용을 보고
+        with self.profiler.memory('build_index'):
+            self._build_index(menu_data)
+
+    def _build_index(self, menu_data):
+        model = self.model_manager.active
+        if model is None:
+            raise ValueError("No model loaded. Please load a model first.")
         page_names = [item['page_name'] for item in menu_data]
         services = [item['Service'] for item in menu_data]
         contexts = [f"{item['Category']} {' '.join(item['hierarchy'])}" for item in menu_data]
-        self.page_name_embeddings = self.model_manager.encode(page_names).cpu().numpy().astype('float32')
-        self.service_embeddings = self.model_manager.encode(services).cpu().numpy().astype('float32')
-        self.context_embeddings = self.model_manager.encode(contexts).cpu().numpy().astype('float32')
-        self.page_name_embeddings = self.normalize_embeddings(self.page_name_embeddings)
-        self.service_embeddings = self.normalize_embeddings(self.service_embeddings)
-        self.context_embeddings = self.normalize_embeddings(self.context_embeddings)
-        weighted_embeddings = (
-            self.WEIGHTS['page_name'] * self.page_name_embeddings +
-            self.WEIGHTS['service'] * self.service_embeddings +
-            self.WEIGHTS['context'] * self.context_embeddings
+        build_timings = {}
+        start = time.perf_counter()
+        # 필드별 임베딩을 (3, N, D) 연속 배열 하나로 쌓아 두고, 필드별 행렬은 그 뷰로 사용
+        field_embeddings = np.ascontiguousarray(np.stack([
+            model.encode(texts).cpu().numpy().astype('float32')
+            for texts in (page_names, services, contexts)
+        ]))
+        for field_matrix in field_embeddings:
+            normalize_embeddings(field_matrix)
+        build_timings['encode'] = time.perf_counter() - start
+
+        projection, reduction = None, None
+        if self.reduced_dimension and self.reduced_dimension < field_embeddings.shape[2]:
+            start = time.perf_counter()
+            # 세 필드를 한 공간에서 비교하므로 필드 벡터를 모두 모아 사영 하나를 학습
+            projection = Projection.fit(field_embeddings.reshape(-1, field_embeddings.shape[2]),
+                                        self.reduced_dimension, self.reduction_method)
+            full_embeddings = field_embeddings
+            field_embeddings = np.ascontiguousarray(np.stack([projection.transform(f) for f in full_embeddings]))
+            reduction = {**projection.describe(), **self._recall_report(full_embeddings, field_embeddings)}
+            build_timings['reduce'] = time.perf_counter() - start
+
+        # 메뉴별 필드 간 Gram 행렬 (N, 3, 3): 가중 결합 벡터의 노름을 가중치만으로 바로 계산
+        field_gram = np.einsum('fnd,gnd->nfg', field_embeddings, field_embeddings)
+
+        start = time.perf_counter()
+        snapshot = IndexSnapshot(
+            model, menu_data, content_hash(menu_data), dict(self.WEIGHTS), field_embeddings, field_gram,
+            build_timings=build_timings, projection=projection, reduction=reduction
+        )
+        build_timings['index'] = time.perf_counter() - start
+        self.snapshot = snapshot
+
+    def _recall_report(self, full_embeddings: np.ndarray, reduced_embeddings: np.ndarray) -> Dict[str, Any]:
+        """메뉴 page_name 벡터를 쿼리로 기본 가중치 검색을 해 축소 전 대비 상위 k개가 얼마나 유지되는지 계산합니다.
+
+        쿼리로 쓴 메뉴 자신은 축소 전후 모두 1등이 되어 recall을 부풀리므로 이웃에서 뺍니다.
+        """
+        rows = sample_rows(full_embeddings.shape[1], REDUCTION_EVAL_QUERIES)
+        recall = recall_at_k(full_embeddings[0][rows], combine_fields(full_embeddings, self.WEIGHTS),
+                             reduced_embeddings[0][rows], combine_fields(reduced_embeddings, self.WEIGHTS),
+                             REDUCTION_EVAL_KS, exclude=rows)
+        return {'eval_queries': len(rows), 'recall': {f"@{k}": round(value, 4) for k, value in recall.items()}}
+
+    @classmethod
+    def from_segment(cls, model_manager, segment_path: str, use_cache: bool = True) -> 'SearchEngine':
+        """save_segment()/build_index.py로 만든 파일을 읽기 전용으로 매핑해 인덱스 구축 없이 엔진을 만듭니다.
+
+        벡터와 메뉴 데이터는 mmap 위의 뷰이므로 같은 파일을 연 워커 프로세스들이 한 사본을 공유합니다.
+        세그먼트의 모델이 model_manager에 로드되어 있지 않으면 로드합니다.
+        """
+        engine = cls(model_manager, use_cache=use_cache)
+        engine._attach_segment(IndexSegment(segment_path))
+        return engine
+
+    @classmethod
+    def load_artifact(cls, model_manager, artifact_path: str, data_file: str = None,
+                      use_cache: bool = True) -> 'SearchEngine':
+        """build_index.py로 만든 아티팩트의 manifest를 검증한 뒤 엔진을 만듭니다.
+
+        data_file을 주면 그 파일의 현재 내용으로 만든 아티팩트인지도 확인합니다.
+        """
+        segment = IndexSegment(artifact_path)
+        manifest = check_manifest(segment, 'part2')
+        if data_file is not None:
+            with open(data_file, 'r', encoding='utf-8') as f:
+                if content_hash(json.load(f)) != manifest['data_hash']:
+                    raise ValueError(f"아티팩트가 {data_file}의 현재 내용으로 만들어지지 않았습니다 (version={manifest['version']})")
+        engine = cls(model_manager, use_cache=use_cache)
+        engine._attach_segment(segment)
+        return engine
+
+    def _attach_segment(self, segment: IndexSegment):
+        manifest = check_manifest(segment, 'part2')
+        model_info = AVAILABLE_MODELS.get(manifest['model'])
+        if model_info is None:
+            raise ValueError(f"지원하지 않는 모델로 만든 아티팩트입니다: {manifest['model']}")
+        reduction = manifest.get('reduction')
+        model_dimension = reduction['source_dimension'] if reduction else manifest['dimension']
+        if model_info['dimension'] != model_dimension:
+            raise ValueError(f"모델 차원({model_info['dimension']})과 아티팩트 차원({model_dimension})이 다릅니다")
+        if set(manifest['weights']) != set(FIELDS):
+            raise ValueError(f"아티팩트 가중치 필드가 {list(FIELDS)}와 다릅니다: {sorted(manifest['weights'])}")
+        self.model_manager.load_model(manifest['model'])
+        if 'faiss_index' in segment.arrays:
+            # 평면 인덱스가 아니면 직렬화된 FAISS 인덱스를 복원 (프로세스마다 사본이 생김)
+            index = faiss.deserialize_index(np.array(segment['faiss_index']))
+        else:
+            # 평면 내적 인덱스의 내용은 결합 벡터 그 자체이므로 매핑한 배열을 바로 검색 (워커 간 공유)
+            index = MappedFlatIndex(segment['weighted_embeddings'])
+        self.WEIGHTS = manifest['weights']
+        self.snapshot = IndexSnapshot(
+            self.model_manager.active, segment.records, manifest['data_hash'], manifest['weights'],
+            segment['field_embeddings'], segment['field_gram'], index,
+            segment=segment, build_timings=dict(manifest['timings']),
+            projection=Projection.from_segment(segment, reduction) if reduction else None, reduction=reduction
         )
-        weighted_embeddings = self.normalize_embeddings(weighted_embeddings)
-        self.index = faiss.IndexFlatIP(self.dimension)
-        self.index.add(weighted_embeddings)
 
-    def search(self, query: str, top_k: int = TOP_K_RESULTS) -> List[Dict]:
-        """쿼리에 대해 가장 유사한 메뉴를 검색합니다."""
-        if not self.index:
+    def artifact_arrays(self) -> Dict[str, np.ndarray]:
+        """아티팩트/세그먼트에 기록할 배열 (평면 인덱스는 결합 벡터로, 그 외 FAISS 인덱스는 직렬화해 저장)"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise ValueError("인덱스가 구축되지 않았습니다. build_index()를 먼저 호출하세요.")
+        arrays = {'field_embeddings': snapshot.field_embeddings, 'field_gram': snapshot.field_gram}
+        if snapshot.projection is not None:
+            arrays.update(snapshot.projection.arrays())
+        if isinstance(snapshot.index, MappedFlatIndex):
+            arrays['weighted_embeddings'] = snapshot.index.vectors
+        elif isinstance(snapshot.index, faiss.IndexFlat):
+            arrays['weighted_embeddings'] = snapshot.index.reconstruct_n(0, snapshot.index.ntotal)
+        else:
+            arrays['faiss_index'] = faiss.serialize_index(snapshot.index)
+        return arrays
+
+    def manifest(self, timings: Dict[str, float] = None) -> Dict[str, Any]:
+        snapshot = self.snapshot
+        index_type = 'IndexFlatIP' if isinstance(snapshot.index, MappedFlatIndex) else type(snapshot.index).__name__
+        return make_manifest('part2', snapshot.model.model_id, snapshot.dimension, snapshot.weights, snapshot.data_hash,
+                             len(snapshot.menu_data), {**snapshot.build_timings, **(timings or {})}, index_type=index_type,
+                             reduction=snapshot.reduction)
+
+    def save_segment(self, segment_path: str, timings: Dict[str, float] = None):
+        """구축한 인덱스와 메뉴 데이터를 manifest와 함께 기록합니다 (같은 경로의 이전 버전은 원자적으로 교체)."""
+        write_segment(segment_path, self.artifact_arrays(), self.manifest(timings), list(self.snapshot.menu_data))
+
+    def reload_segment(self) -> bool:
+        """같은 경로에 새 버전이 게시되었으면 다시 매핑합니다 (바뀌었으면 True)."""
+        segment = self.segment
+        if segment is None or not segment.is_stale():
+            return False
+        self._attach_segment(IndexSegment(segment.path))
+        return True
+
+    # 아래 메서드는 호출 시점의 스냅샷으로 계산 (여러 단계를 한 스냅샷으로 처리하려면 self.snapshot을 직접 사용)
+    def rewrite_query(self, query: str) -> str:
+        """메뉴 용어 색인으로 쿼리의 오타를 교정합니다."""
+        return self.snapshot.rewrite_query(query) if self.snapshot is not None else query
+
+    def resolve_weights(self, weights: Dict[str, float] = None) -> Dict[str, float]:
+        """요청별 가중치를 기본 가중치(WEIGHTS)와 합칩니다. 바꿀 필드만 지정하면 됩니다."""
+        return self.snapshot.resolve_weights(weights)
+
+    def field_similarities(self, query_vectors: np.ndarray) -> np.ndarray:
+        return self.snapshot.field_similarities(query_vectors)
+
+    def top_k_weighted(self, query_vector: np.ndarray, weights: Dict[str, float], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.snapshot.top_k_weighted(query_vector, weights, top_k)
+
+    def weighted_index(self, weights: Dict[str, float]):
+        return self.snapshot.weighted_index(weights)
+
+    def format_result(self, query_vector, score, idx, weights: Dict[str, float] = None) -> Dict[str, Any]:
+        return self.snapshot.format_result(query_vector, score, idx, weights)
+
+    def search(self, query: str, top_k: int = TOP_K_RESULTS, weights: Dict[str, float] = None,
+               profile: bool = False) -> List[Dict]:
+        """쿼리에 대해 가장 유사한 메뉴를 검색합니다.
+
+        weights로 필드 가중치({'page_name', 'service', 'context'} 중 일부)를 요청마다 바꿀 수 있으며,
+        인덱스를 다시 만들 필요 없이 쌓아 둔 필드 행렬로 계산합니다.
+        여러 스레드에서 동시에 호출해도 되며, 각 호출은 시작할 때의 인덱스 스냅샷 하나로 계산합니다.
+        profile=True이거나 PROFILE_SAMPLE_RATE 비율에 뽑힌 검색은 cProfile로 기록해 PROFILE_DIR에 저장합니다.
+        """
+        if self.profiler.sampled(profile):
+            with self.profiler.profile(f"search-{query}"):
+                return self._search(query, top_k, weights)
+        return self._search(query, top_k, weights)
+
+    def _search(self, query: str, top_k: int, weights: Dict[str, float]) -> List[Dict]:
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.index:
             return []
+        query = snapshot.rewrite_query(query)
+        weights = snapshot.resolve_weights(weights)
+
+        # 같은 모델/데이터/가중치로 검색한 적이 있으면 캐시된 결과 반환
+        cache_params = {
+            'model': snapshot.model.model_id, 'data': snapshot.data_hash,
+            'weights': weights, 'top_k': top_k,
+            'projection': snapshot.projection.describe() if snapshot.projection is not None else None
+        }
+        if self.result_cache is not None:
+            cached = self.result_cache.get(query, **cache_params)
+            if cached is not None:
+                return cached
 
         # 쿼리 임베딩 생성
-        query_embedding = self.model_manager.encode([query]).cpu().numpy().astype('float32')
-        query_embedding = self.normalize_embeddings(query_embedding)
+        query_embedding = snapshot.encode([query])
 
-        # FAISS를 사용하여 검색
-        scores, indices = self.index.search(query_embedding, top_k)
+        if weights == snapshot.weights:
+            # 기본 가중치는 미리 결합해 둔 FAISS 인덱스로 검색
+            scores, indices = snapshot.index.search(query_embedding, top_k)
+            scores, indices = scores[0], indices[0]
+        else:
+            scores, indices = snapshot.top_k_weighted(query_embedding[0], weights, top_k)
 
         # 결과 포맷팅
         results = []
-        for score, idx in zip(scores[0], indices[0]):
-            if idx < len(self.menu_data):
-                item = self.menu_data[idx]
-                # 각각의 유사도 계산
-                page_sim = float(np.dot(query_embedding[0], self.page_name_embeddings[idx]))
-                service_sim = float(np.dot(query_embedding[0], self.service_embeddings[idx]))
-                context_sim = float(np.dot(query_embedding[0], self.context_embeddings[idx]))
-                
-                # 유사도 점수 조정 (0.6 ~ 1.0 범위로)
-                page_sim = 0.6 + (page_sim * 0.4)
-                service_sim = 0.6 + (service_sim * 0.4)
-                context_sim = 0.6 + (context_sim * 0.4)
-                total_sim = 0.6 + (float(score) * 0.4)
-                
-                # 가중치 적용
-                weighted_score = (
-                    self.WEIGHTS['page_name'] * page_sim +
-                    self.WEIGHTS['service'] * service_sim +
-                    self.WEIGHTS['context'] * context_sim
-                )
-                
-                results.append({
-                    'similarity': total_sim,
-                    'page_name_similarity': page_sim,
-                    'service_similarity': service_sim,
-                    'context_similarity': context_sim,
-                    'weighted_score': weighted_score,
-                    'category': item['Category'],
-                    'service': item['Service'],
-                    'menu_item': item['page_name']
-                })
-
-        return results 
\ No newline at end of file
+        for score, idx in zip(scores, indices):
+            if 0 <= idx < len(snapshot.menu_data):
+                results.append(snapshot.format_result(query_embedding[0], score, idx, weights))
+
+        if self.result_cache is not None:
+            self.result_cache.set(query, results, **cache_params)
+        return results
+
+    def search_hierarchical(self, query: str, top_k: int = TOP_K_RESULTS, weights: Dict[str, float] = None,
+                            beam: int = HIERARCHY_BEAM, sections: int = HIERARCHY_SECTIONS) -> Dict[str, Any]:
+        """메뉴 계층 트리를 위에서부터 내려가며 유망한 구역 안의 메뉴만 점수를 매깁니다.
+
+        단계마다 구역 중심 벡터 점수가 높은 beam개 구역으로만 내려가므로 메뉴가 많을수록 점수를 매길
+        메뉴가 크게 줄어듭니다 (대신 다른 구역에 있는 메뉴는 놓칠 수 있음). 구역 중심 벡터는 기본 가중치로
+        만들고, 메뉴 점수는 weights를 적용해 search()와 같은 기준으로 계산합니다.
+
+        Returns:
+            {'results': search()와 같은 형식의 메뉴 결과,
+             'sections': 구역 결과 ({'section': '계좌 > ...', 'path', 'category', 'service', 'item_count', 'similarity'}),
+             'scored_items': 점수를 매긴 메뉴 수}
+        """
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.index:
+            return {'results': [], 'sections': [], 'scored_items': 0}
+        query = snapshot.rewrite_query(query)
+        weights = snapshot.resolve_weights(weights)
+        query_vector = snapshot.encode([query])[0]
+        tree = snapshot.hierarchy()
+        rows, nodes, node_scores = tree.descend(query_vector, beam, HIERARCHY_LEAF_SIZE)
+
+        results = []
+        if len(rows):
+            scores = snapshot.weighted_scores(query_vector, weights, rows)
+            k = min(top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            results = [snapshot.format_result(query_vector, scores[i], int(rows[i]), weights) for i in top]
+        section_nodes, section_scores = tree.top_sections(nodes, node_scores, sections, HIERARCHY_SECTION_MIN_ITEMS)
+        return {
+            'results': results,
+            'sections': [snapshot.format_section(tree, node, score) for node, score in zip(section_nodes, section_scores)],
+            'scored_items': len(rows)
+        }
+
+    def search_many(self, queries: List[str], top_k: int = TOP_K_RESULTS,
+                    weights: Dict[str, float] = None) -> List[List[Dict]]:
+        """여러 쿼리를 한 번에 검색합니다 (쿼리마다 search()와 같은 형식의 결과 목록).
+
+        캐시에 없는 쿼리만 모아 한 번의 인코딩(배치 forward pass)과 한 번의 FAISS 검색 또는
+        (쿼리 x 메뉴) 행렬 곱으로 점수를 구하고, 행마다 부분 정렬로 상위 top_k개를 고릅니다.
+        모든 쿼리는 호출 시점의 인덱스 스냅샷 하나로 계산합니다.
+        """
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.index or not queries:
+            return [[] for _ in queries]
+        queries = [snapshot.rewrite_query(query) for query in queries]
+        weights = snapshot.resolve_weights(weights)
+        cache_params = {
+            'model': snapshot.model.model_id, 'data': snapshot.data_hash,
+            'weights': weights, 'top_k': top_k,
+            'projection': snapshot.projection.describe() if snapshot.projection is not None else None
+        }
+        all_results = [None] * len(queries)
+        if self.result_cache is not None:
+            for i, query in enumerate(queries):
+                all_results[i] = self.result_cache.get(query, **cache_params)
+        # 같은 쿼리가 여러 번 있으면 한 번만 계산
+        pending = list(dict.fromkeys(query for query, results in zip(queries, all_results) if results is None))
+        if pending:
+            query_embeddings = snapshot.encode(pending)
+            scores, indices = snapshot.top_k_weighted_many(query_embeddings, weights, top_k)
+            computed = {}
+            for row, query in enumerate(pending):
+                computed[query] = [
+                    snapshot.format_result(query_embeddings[row], score, idx, weights)
+                    for score, idx in zip(scores[row], indices[row])
+                    if 0 <= idx < len(snapshot.menu_data)
+                ]
+                if self.result_cache is not None:
+                    self.result_cache.set(query, computed[query], **cache_params)
+            all_results = [results if results is not None else computed[query]
+                           for query, results in zip(queries, all_results)]
+        return all_results
+
+    def candidate_indices(self, query: str, k: int) -> List[int]:
+        """쿼리와 가까운 메뉴 k개의 인덱스를 반환합니다 (LLM 매칭 전 후보 축소용)."""
+        snapshot = self.snapshot
+        if snapshot is None or not snapshot.index:
+            return []
+        query_embedding = snapshot.encode([snapshot.rewrite_query(query)])
+        _, indices = snapshot.index.search(query_embedding, k)
+        return [int(idx) for idx in indices[0] if 0 <= idx < len(snapshot.menu_data)]
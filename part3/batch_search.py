@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List
+from menu_data_loader import MenuDataLoader
+from vector_llm_search import VectorLLMSearch
+from local_fallback import LocalSearchFallback
+from config import MENU_DATA_PATH, MAX_RESULTS, BATCH_SIZE, LLM_MAX_CONCURRENCY
+
+def iter_queries(path: str) -> Iterator[str]:
+    """JSONL 또는 CSV 파일에서 검색어를 한 줄씩 스트리밍합니다."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.lower().endswith('.csv'):
+            rows = csv.reader(f)
+            header = next(rows, None)
+            if header is None:
+                return
+            col = header.index('query') if 'query' in header else 0
+            # 'query' 헤더가 없으면 첫 행도 검색어로 취급
+            if 'query' not in header and header[col].strip():
+                yield header[col].strip()
+            for row in rows:
+                if len(row) > col and row[col].strip():
+                    yield row[col].strip()
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                query = record.get('query') if isinstance(record, dict) else record
+                if query:
+                    yield str(query)
+
+def iter_batches(queries: Iterable[str], batch_size: int) -> Iterator[List[str]]:
+    """검색어 스트림을 batch_size 단위로 묶습니다."""
+    queries = iter(queries)
+    while True:
+        batch = list(islice(queries, batch_size))
+        if not batch:
+            return
+        yield batch
+
+def run(input_path: str, output_path: str, menu_file: str = MENU_DATA_PATH, batch_size: int = BATCH_SIZE,
+        concurrency: int = LLM_MAX_CONCURRENCY, max_results: int = MAX_RESULTS, use_llm: bool = True,
+        use_reranker: bool = False, use_fallback: bool = True) -> int:
+    """검색어 파일을 일괄 검색하여 결과를 JSONL로 순서대로 기록합니다.
+
+    1단계 벡터 검색은 배치 단위로 임베딩 요청 한 번과 행렬 곱 한 번으로 처리하고,
+    2단계 LLM 정교화는 최대 concurrency개의 요청만 동시에 수행합니다.
+    use_reranker이면 LLM 대신 로컬 cross-encoder로 재정렬합니다.
+    use_fallback이면 OpenAI 임베딩 회로가 열려 1단계 결과가 없는 검색어를 part1/part2 로컬 검색 엔진으로 처리합니다
+    (엔진 워커 프로세스는 시작할 때 띄워 두고 끝나면 종료).
+    """
+    data_loader = MenuDataLoader(menu_file)
+    if not data_loader.load_data():
+        raise RuntimeError(f"메뉴 데이터 로드 실패: {menu_file}")
+    menu_data = data_loader.get_menu_data()
+
+    reranker = None
+    if use_reranker:
+        from reranker import CrossEncoderReranker
+        reranker = CrossEncoderReranker()
+    fallback_engine = LocalSearchFallback.from_config(menu_file) if use_fallback else None
+    searcher = VectorLLMSearch(verbose=False, reranker=reranker, fallback_engine=fallback_engine)
+
+    def answer(query, candidates):
+        # 회로가 열려 임베딩을 받지 못한 검색어는 로컬 검색 엔진으로 처리
+        if not candidates and searcher.fallback_available():
+            return searcher.fallback_search(query, max_results)
+        return searcher.refine(query, candidates, max_results) if use_llm else candidates[:max_results]
+
+    count = 0
+    try:
+        with open(output_path, 'w', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            for batch in iter_batches(iter_queries(input_path), batch_size):
+                vector_results = searcher.vector_search_many(batch, menu_data, top_k=20)
+                results = list(executor.map(lambda args: answer(*args), zip(batch, vector_results)))
+
+                for query, query_results in zip(batch, results):
+                    out.write(json.dumps({'query': query, 'results': query_results}, ensure_ascii=False) + '\n')
+                out.flush()
+                count += len(batch)
+    finally:
+        # 새로 계산한 메뉴 임베딩은 중간에 실패해도 캐시에 남김 (검색어 임베딩은 저장하지 않음)
+        searcher.save_cache()
+        if fallback_engine is not None:
+            fallback_engine.close()
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="검색어 파일(JSONL/CSV)을 일괄 검색해 JSONL로 저장합니다.")
+    parser.add_argument('input', help="검색어 파일 (.jsonl 또는 .csv)")
+    parser.add_argument('output', help="결과 JSONL 파일")
+    parser.add_argument('--data', default=MENU_DATA_PATH, help="메뉴 데이터 파일")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=LLM_MAX_CONCURRENCY, help="동시 LLM 요청 수")
+    parser.add_argument('--max-results', type=int, default=MAX_RESULTS)
+    parser.add_argument('--no-llm', action='store_true', help="LLM 정교화 없이 벡터 검색 결과만 저장")
+    parser.add_argument('--reranker', action='store_true', help="LLM 대신 로컬 cross-encoder로 재정렬")
+    parser.add_argument('--no-local-fallback', action='store_true',
+                        help="OpenAI 회로가 열려도 part1/part2 로컬 검색 엔진으로 전환하지 않음")
+    args = parser.parse_args()
+    count = run(args.input, args.output, args.data, args.batch_size, args.concurrency,
+                args.max_results, use_llm=not args.no_llm, use_reranker=args.reranker,
+                use_fallback=not args.no_local_fallback)
+    print(f"✅ {count}개 검색어 처리 완료: {args.output}")
+
+if __name__ == "__main__":
+    main()
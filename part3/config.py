@@ -1,16 +1,70 @@
 import os
+import sys
 from dotenv import load_dotenv
 
+# 공용 모듈(common 패키지)을 import할 수 있도록 저장소 루트를 경로에 추가
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.append(ROOT_DIR)
+
 # .env 파일을 part3 폴더에서 명시적으로 로드
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '.env'))
 
 # OpenAI API 설정
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL = "gpt-3.5-turbo"  # 또는 "gpt-4" 사용 가능
+EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # 로컬 가짜 서버 등 다른 주소로 보낼 때 설정
+
+# OpenAI 클라이언트 설정 (llm_client.py)
+OPENAI_TIMEOUT = 10.0  # 요청 1회 타임아웃(초)
+OPENAI_DEADLINE = 20.0  # 재시도를 포함한 요청 전체 제한 시간(초)
+OPENAI_MAX_RETRIES = 3  # 타임아웃/속도 제한/서버 오류 시 재시도 횟수
+OPENAI_MAX_CONNECTIONS = 20  # 연결 풀 크기
+OPENAI_CONCURRENCY = {'chat': 4, 'embeddings': 8}  # 엔드포인트별 동시 요청 수
+OPENAI_TOKENS_PER_MINUTE = {'chat': 90000, 'embeddings': 1000000}  # 엔드포인트별 분당 토큰 제한
+OPENAI_BREAKER_FAILURES = 5  # 연속 실패가 이 횟수에 이르면 회로 차단
+OPENAI_BREAKER_RESET = 30.0  # 회로 차단 후 시험 요청까지 대기 시간(초)
 
 # 메뉴 데이터 경로
 MENU_DATA_PATH = "ia-data.json"
 
+# 검색 결과 캐시 (프로세스 내 LRU + 같은 호스트의 워커가 공유하는 SQLite)
+RESULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), 'result_cache.sqlite3')  # None이면 프로세스 내 캐시만 사용
+RESULT_CACHE_SIZE = 1024  # 프로세스 내 LRU 항목 수
+
+# 로컬 대체 검색 설정 (local_fallback.py, OpenAI 임베딩 회로가 열렸을 때 별도 프로세스의 part1/part2 엔진 사용)
+LOCAL_FALLBACK_PART = 'part1'  # 'part1' 또는 'part2' 검색 엔진 (None이면 사용 안 함)
+LOCAL_FALLBACK_ARTIFACT = None  # 엔진 아티팩트 경로 (None이면 그 part의 artifacts/menu_index.seg, 없으면 인덱스 구축)
+LOCAL_FALLBACK_MODEL = "jhgan/ko-sroberta-multitask"  # part2 엔진이 아티팩트 없이 인덱스를 구축할 때 쓸 모델
+LOCAL_FALLBACK_PRELOAD = True  # 시작할 때 워커를 띄워 모델/인덱스를 미리 로드 (False면 처음 전환할 때 시작)
+LOCAL_FALLBACK_TIMEOUT = 5.0  # 워커 준비와 검색 응답을 각각 기다릴 최대 시간(초), 넘으면 빈 결과
+
+# Cross-encoder 재정렬 설정 (reranker.py, LLM 정교화 대신 로컬 CPU에서 실행)
+RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"  # 다국어 MiniLM (한국어 지원)
+RERANKER_MAX_CANDIDATES = 10  # 재정렬할 최대 후보 수 (LLM_MAX_CANDIDATES와 같은 기준)
+RERANKER_BATCH_SIZE = 32  # 한 번의 forward pass에 넣을 (검색어, 후보) 쌍 수
+RERANKER_MAX_LENGTH = 128  # 쌍 하나의 최대 토큰 수
+RERANKER_LATENCY_BUDGET_MS = 50  # 예상 소요 시간이 이를 넘으면 점수 계산할 후보 수를 줄임
+RERANKER_CACHE_SIZE = 10000  # (검색어, 후보) 점수 캐시 항목 수
+RERANKER_MIN_SIMILARITY = 0.1  # 이 점수 미만 후보는 제외 (모두 제외되면 벡터 결과 반환)
+RERANKER_WARM_UP = True  # 생성할 때 예열 호출로 쌍당 소요 시간 추정치를 채움 (첫 검색부터 시간 예산 적용)
+
+# 오타 교정 설정 (fuzzy_matcher.py)
+FUZZY_ENABLED = True
+FUZZY_MAX_DISTANCE = 2  # 자모 단위 최대 편집 거리
+
+# 프로파일링 설정 (profiling.py, 기본값은 꺼짐)
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(__file__), 'profiles'))
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # cProfile로 기록할 검색 비율 (0이면 profile=True로 요청한 검색만)
+PROFILE_MEMORY = os.getenv('PROFILE_MEMORY') == '1'  # 임베딩 캐시 로드의 tracemalloc 메모리 보고
+
+# 임베딩 차원 축소 설정 (dim_reduction.py, 메뉴 임베딩 행렬을 줄여 메모리와 유사도 계산량 절감)
+REDUCED_DIMENSION = None  # None이면 임베딩 차원 그대로 (text-embedding-3-small은 1536)
+REDUCTION_METHOD = 'truncate'  # text-embedding-3은 앞쪽 차원만 써도 되도록 학습되어 있음 ('pca'도 가능)
+REDUCTION_EVAL_QUERIES = 1000  # 축소 전후 recall@k를 잴 때 쓸 메뉴 수
+REDUCTION_EVAL_KS = (1, 5, 10)
+
 # 매칭 설정
 MAX_RESULTS = 5  # 최대 결과 수
 SIMILARITY_THRESHOLD = 0.7  # 유사도 임계값
@@ -40,4 +94,29 @@ MATCHING_PROMPT_TEMPLATE = """
 ]
 
 유사도 점수는 0.0~1.0 사이로 주세요.
-""" 
\ No newline at end of file
+""" 
+
+# 일괄 검색 설정
+BATCH_SIZE = 256  # 한 번에 임베딩/검색할 검색어 수
+EMBEDDING_BATCH_SIZE = 1000  # 임베딩 API 요청당 최대 입력 수
+QUERY_EMBEDDING_CACHE_SIZE = 1024  # 프로세스 내에 보관할 검색어 임베딩 수 (검색어 임베딩은 캐시 파일에 저장하지 않음)
+LLM_MAX_CONCURRENCY = 4  # 동시에 수행할 LLM 요청 수
+
+# LLM 정교화 게이트 설정 (벡터 단계 결과가 확실하면 LLM 호출 생략)
+LLM_GATE_ENABLED = True
+LLM_GATE_SKIP_ON_KEYWORD_MATCH = True  # 검색어를 그대로 포함하는 후보(keyword_score == 1.0)가 1위 하나뿐이면 생략
+LLM_GATE_MIN_SCORE = 0.85  # 1위 점수가 이 값 이상이고
+LLM_GATE_MIN_MARGIN = 0.1  # 2위와의 점수 차가 이 값 이상이면 생략
+
+# LLM 정교화 프롬프트 설정 (후보는 번호로 참조하고 JSON으로만 응답받음)
+REFINEMENT_SYSTEM_PROMPT = "You rank Korean app menu pages for a search query. Reply with JSON only."
+# JSON 모드(response_format=json_object)를 지원하는 모델 이름 접두사 (그 밖의 모델, 예: gpt-4는 프롬프트로만 JSON 요청)
+LLM_JSON_MODE_MODELS = ('gpt-3.5-turbo', 'gpt-4o', 'gpt-4-turbo', 'gpt-4-1106', 'gpt-4-0125', 'gpt-4.1', 'gpt-5',
+                        'o1', 'o3', 'o4')
+LLM_MAX_CANDIDATES = 10  # LLM에 전달할 최대 후보 수
+LLM_PROMPT_TOKEN_BUDGET = 400  # 프롬프트 추정 토큰 상한 (넘으면 하위 후보부터 제외)
+LLM_MAX_TOKENS = 300  # 응답 max_tokens 상한
+LLM_TOKENS_PER_RESULT = 12  # 결과 한 건당 응답 토큰 ({"id":1,"s":0.9})
+LLM_TOKENS_PER_REASON = 20  # 이유를 함께 받을 때 결과 한 건당 추가 토큰
+LLM_INCLUDE_REASON = False  # True이면 결과마다 짧은 이유("why")를 함께 요청
+LLM_MIN_SIMILARITY = 0.4  # 이 값 미만인 LLM 결과는 제외
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Dict, Any
+from menu_data_loader import MenuDataLoader
+from vector_llm_search import VectorLLMSearch
+from batch_search import iter_queries, iter_batches
+from config import MENU_DATA_PATH, MAX_RESULTS, BATCH_SIZE, LLM_MAX_CONCURRENCY
+
+def _result_key(result: Dict[str, Any]):
+    """같은 페이지명이 여러 번 나올 수 있으므로 메뉴 데이터 전체로 결과를 식별"""
+    item = result.get('menu_data', {})
+    return (item.get('Category'), item.get('Service'), result.get('menu_name'), tuple(item.get('hierarchy', [])))
+
+def ranking_agreement(gated: List[Dict[str, Any]], refined: List[Dict[str, Any]], k: int) -> Dict[str, float]:
+    """게이트 결과와 LLM 결과의 1위 일치 여부와 상위 k개 겹침 비율"""
+    gated_keys = [_result_key(r) for r in gated[:k]]
+    refined_keys = [_result_key(r) for r in refined[:k]]
+    if not refined_keys:
+        return {'top1': float(not gated_keys), 'overlap': float(not gated_keys)}
+    return {
+        'top1': float(bool(gated_keys) and gated_keys[0] == refined_keys[0]),
+        'overlap': len(set(gated_keys) & set(refined_keys)) / len(refined_keys)
+    }
+
+def evaluate(input_path: str, menu_file: str = MENU_DATA_PATH, limit: int = None,
+             concurrency: int = LLM_MAX_CONCURRENCY, max_results: int = MAX_RESULTS) -> Dict[str, Any]:
+    """게이트가 생략하는 검색어에 대해서도 LLM을 실행해 포기한 순위 일치도를 측정합니다."""
+    data_loader = MenuDataLoader(menu_file)
+    if not data_loader.load_data():
+        raise RuntimeError(f"메뉴 데이터 로드 실패: {menu_file}")
+    menu_data = data_loader.get_menu_data()
+
+    searcher = VectorLLMSearch(verbose=False)
+    reasons = Counter()
+    agreements = []
+
+    queries = islice(iter_queries(input_path), limit)
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for batch in iter_batches(queries, BATCH_SIZE):
+            skipped = []
+            for query, vector_results in zip(batch, searcher.vector_search_many(batch, menu_data, top_k=20)):
+                if not vector_results:
+                    continue
+                run_llm, reason = searcher.gate.decide(vector_results)
+                reasons[reason] += 1
+                if not run_llm:
+                    skipped.append((query, vector_results))
+
+            refined = executor.map(
+                lambda args: searcher.llm_refinement(args[0], args[1], max_results, use_gate=False),
+                skipped
+            )
+            for (_, vector_results), refined_results in zip(skipped, refined):
+                agreements.append(ranking_agreement(vector_results[:max_results], refined_results, max_results))
+    searcher.save_cache()
+
+    report = searcher.gate.rates()
+    report['reasons'] = dict(reasons)
+    report['evaluated_skips'] = len(agreements)
+    if agreements:
+        report['top1_agreement'] = sum(a['top1'] for a in agreements) / len(agreements)
+        report['overlap_at_k'] = sum(a['overlap'] for a in agreements) / len(agreements)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM 게이트가 생략한 검색어의 순위 일치도를 측정합니다.")
+    parser.add_argument('input', help="검색어 파일 (.jsonl 또는 .csv)")
+    parser.add_argument('--data', default=MENU_DATA_PATH, help="메뉴 데이터 파일")
+    parser.add_argument('--limit', type=int, default=None, help="평가할 최대 검색어 수")
+    parser.add_argument('--concurrency', type=int, default=LLM_MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    report = evaluate(args.input, args.data, args.limit, args.concurrency)
+    print(f"검색어 수: {report['total']}")
+    print(f"LLM 실행률: {report['run_rate']:.1%} / 생략률: {report['skip_rate']:.1%}")
+    for reason, count in sorted(report['reasons'].items()):
+        print(f"  - {reason}: {count}")
+    if report['evaluated_skips']:
+        print(f"생략한 {report['evaluated_skips']}개 검색어의 LLM 결과 대비 일치도:")
+        print(f"  1위 일치율: {report['top1_agreement']:.1%}")
+        print(f"  상위 {MAX_RESULTS}개 겹침: {report['overlap_at_k']:.1%}")
+
+if __name__ == "__main__":
+    main()
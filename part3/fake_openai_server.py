@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""로컬 테스트용 가짜 OpenAI 서버
+
+    python fake_openai_server.py --port 8765 --latency 0.2 --failure-rate 0.3
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=test python run_search.py
+
+지연, 오류율(500/429)을 조절해 재시도, 제한 시간, 회로 차단 동작을 확인할 수 있습니다.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EMBEDDING_DIMENSION = 1536
+
+def fake_embedding(text: str):
+    """텍스트마다 항상 같은 값을 주는 임베딩"""
+    seed = int(hashlib.md5(text.encode()).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSION)]
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    failure_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        time.sleep(self.latency)
+
+        if random.random() < self.failure_rate:
+            status = random.choice([429, 500])
+            return self._send(status, {"error": {"message": "fake failure", "type": "server_error"}})
+
+        if self.path.endswith('/embeddings'):
+            inputs = body.get('input', [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            return self._send(200, {
+                "object": "list",
+                "model": body.get('model'),
+                "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                         for i, text in enumerate(inputs)],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            })
+
+        if self.path.endswith('/chat/completions'):
+            # 후보 목록의 첫 번호를 그대로 1위로 돌려줌
+            content = json.dumps({"r": [{"id": 1, "s": 0.9}]})
+            return self._send(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get('model'),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            })
+
+        self._send(404, {"error": {"message": "not found"}})
+
+    def _send(self, status: int, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 테스트용 가짜 OpenAI 서버")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="응답 지연(초)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="500/429 오류 비율 (0~1)")
+    args = parser.parse_args()
+
+    FakeOpenAIHandler.latency = args.latency
+    FakeOpenAIHandler.failure_rate = args.failure_rate
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), FakeOpenAIHandler)
+    print(f"가짜 OpenAI 서버 실행 중: http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from typing import List, Dict, Any, Optional
+from config import (
+    ROOT_DIR, MENU_DATA_PATH, LOCAL_FALLBACK_PART, LOCAL_FALLBACK_ARTIFACT, LOCAL_FALLBACK_MODEL,
+    LOCAL_FALLBACK_PRELOAD, LOCAL_FALLBACK_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+class LocalSearchFallback:
+    """part1/part2의 sentence-transformer 검색 엔진을 별도 프로세스로 띄워 part3 결과 형식으로 검색하는 대체 검색
+
+    OpenAI 회로가 열렸을 때 VectorLLMSearch(fallback_engine=...)가 대신 사용합니다.
+    part마다 config 등 같은 이름의 모듈이 있으므로 엔진은 part3 프로세스에 import하지 않고
+    `python -m common.search_worker` 프로세스에서 만들고 표준 입출력의 JSON 줄로 검색합니다.
+
+    - start()를 부르면(preload=True면 생성할 때) 워커가 모델 로드와 인덱스 매핑/구축을 미리 해 둠
+    - 검색은 준비될 때까지, 그리고 응답까지 각각 최대 timeout초만 기다리고 넘으면 빈 결과를 반환
+    - 워커를 시작하지 못했거나 종료되면 load_error에 남기고 빈 결과를 반환
+    """
+
+    def __init__(self, part: str = LOCAL_FALLBACK_PART, data_file: str = MENU_DATA_PATH,
+                 artifact: Optional[str] = LOCAL_FALLBACK_ARTIFACT, model_id: str = LOCAL_FALLBACK_MODEL,
+                 timeout: float = LOCAL_FALLBACK_TIMEOUT, preload: bool = LOCAL_FALLBACK_PRELOAD):
+        if part not in ('part1', 'part2'):
+            raise ValueError(f"지원하지 않는 로컬 검색 엔진: {part} (사용 가능: ['part1', 'part2'])")
+        self.part = part
+        self.data_file = os.path.abspath(data_file)
+        self.artifact = os.path.abspath(artifact) if artifact else None
+        self.model_id = model_id
+        self.timeout = timeout
+        self.load_error = None
+        self.process = None
+        self._closed = False
+        self._ready = threading.Event()
+        self._responses = queue.Queue()
+        self._ids = itertools.count()
+        self._start_lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        if preload:
+            self.start()
+
+    @classmethod
+    def from_config(cls, data_file: str = MENU_DATA_PATH, part: Optional[str] = LOCAL_FALLBACK_PART,
+                    artifact: Optional[str] = LOCAL_FALLBACK_ARTIFACT,
+                    preload: bool = LOCAL_FALLBACK_PRELOAD) -> Optional['LocalSearchFallback']:
+        """설정 파일의 part로 대체 검색을 만듭니다 (part가 None이면 None)."""
+        if not part:
+            return None
+        return cls(part, data_file, artifact, preload=preload)
+
+    def command(self) -> List[str]:
+        command = [sys.executable, '-m', 'common.search_worker', '--part', self.part, '--data', self.data_file]
+        if self.artifact:
+            command += ['--artifact', self.artifact]
+        if self.model_id:
+            command += ['--model', self.model_id]
+        return command
+
+    def start(self):
+        """워커 프로세스를 시작합니다 (이미 시작했으면 아무 일도 하지 않음). 준비는 백그라운드에서 진행됩니다."""
+        with self._start_lock:
+            if self.process is not None or self.load_error is not None or self._closed:
+                return
+            try:
+                # 엔진 로그(모델 로드 진행률 등)가 대화형 출력에 섞이지 않도록 표준 오류는 버리고,
+                # 시작 실패 원인은 프로토콜의 error 응답으로 받음
+                self.process = subprocess.Popen(self.command(), cwd=ROOT_DIR, stdin=subprocess.PIPE,
+                                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            except OSError as e:
+                self._fail(e)
+                return
+            threading.Thread(target=self._read_responses, args=(self.process,), name=f"local-fallback-{self.part}",
+                             daemon=True).start()
+            atexit.register(self.close)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and self.load_error is None
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """워커가 준비될 때까지 기다립니다 (timeout초 안에 준비되면 True)."""
+        self.start()
+        self._ready.wait(timeout)
+        return self.ready
+
+    def _fail(self, error):
+        if self.load_error is None:
+            logger.warning("로컬 검색 엔진을 사용할 수 없습니다: %s", error)
+            self.load_error = error
+        self._ready.set()
+
+    def _read_responses(self, process: subprocess.Popen):
+        for line in process.stdout:
+            message = json.loads(line.decode('utf-8'))
+            if not self._ready.is_set():
+                if 'error' in message:
+                    self._fail(RuntimeError(message['error']))
+                self._ready.set()
+                continue
+            self._responses.put(message)
+        code = process.wait()
+        if not self._closed:
+            self._fail(RuntimeError(f"로컬 검색 워커가 종료되었습니다 (코드 {code})"))
+        self._ready.set()
+        self._responses.put(None)
+
+    def search(self, query: str, max_results: int = 5) -> List[Dict[str, Any]]:
+        self.start()
+        if not self._ready.wait(self.timeout):
+            logger.warning("로컬 검색 엔진이 아직 준비되지 않았습니다 (%.1f초 대기)", self.timeout)
+            return []
+        if self.load_error is not None or self._closed:
+            return []
+
+        with self._request_lock:
+            request_id = next(self._ids)
+            try:
+                self.process.stdin.write((json.dumps({'id': request_id, 'query': query, 'max_results': max_results},
+                                                     ensure_ascii=False) + '\n').encode('utf-8'))
+                self.process.stdin.flush()
+            except OSError as e:
+                self._fail(e)
+                return []
+            while True:
+                try:
+                    message = self._responses.get(timeout=self.timeout)
+                except queue.Empty:
+                    logger.warning("로컬 검색 응답 시간 초과: %s", query)
+                    return []
+                if message is None:
+                    return []
+                # 이전에 시간 초과로 버린 요청의 늦은 응답은 건너뜀
+                if message.get('id') != request_id:
+                    continue
+                if 'error' in message:
+                    logger.warning("로컬 검색 실패: %s", message['error'])
+                    return []
+                return message['results']
+
+    def close(self):
+        """워커 프로세스를 종료합니다."""
+        self._closed = True
+        process = self.process
+        if process is None or process.poll() is not None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+from collections import Counter
+from typing import List, Dict, Any, Tuple
+from config import (
+    LLM_GATE_ENABLED, LLM_GATE_SKIP_ON_KEYWORD_MATCH, LLM_GATE_MIN_SCORE, LLM_GATE_MIN_MARGIN
+)
+
+class RefinementGate:
+    """벡터 단계 결과의 확신도를 보고 LLM 정교화 실행 여부를 결정하는 정책"""
+
+    def __init__(self, enabled: bool = LLM_GATE_ENABLED,
+                 skip_on_keyword_match: bool = LLM_GATE_SKIP_ON_KEYWORD_MATCH,
+                 min_score: float = LLM_GATE_MIN_SCORE,
+                 min_margin: float = LLM_GATE_MIN_MARGIN):
+        self.enabled = enabled
+        self.skip_on_keyword_match = skip_on_keyword_match
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def evaluate(self, vector_results: List[Dict[str, Any]]) -> Tuple[bool, str]:
+        """(LLM 실행 여부, 사유)를 반환합니다. 통계는 기록하지 않습니다."""
+        if not self.enabled:
+            return True, 'disabled'
+        if len(vector_results) < 2:
+            return False, 'single_candidate'
+
+        top, second = vector_results[0], vector_results[1]
+        margin = top['vector_score'] - second['vector_score']
+
+        # 검색어를 그대로 포함하는 후보가 1위 하나뿐이면 순위가 사실상 확정
+        if self.skip_on_keyword_match and top.get('keyword_score', 0) >= 1.0:
+            exact_matches = sum(1 for r in vector_results if r.get('keyword_score', 0) >= 1.0)
+            if exact_matches == 1:
+                return False, 'keyword_match'
+
+        if top['vector_score'] >= self.min_score and margin >= self.min_margin:
+            return False, 'score_margin'
+
+        return True, 'uncertain'
+
+    def decide(self, vector_results: List[Dict[str, Any]]) -> Tuple[bool, str]:
+        """evaluate()와 같지만 실행/생략 횟수를 통계에 기록합니다."""
+        run_llm, reason = self.evaluate(vector_results)
+        with self._lock:
+            self.stats['run' if run_llm else 'skipped'] += 1
+            self.stats[f'reason:{reason}'] += 1
+        return run_llm, reason
+
+    def rates(self) -> Dict[str, float]:
+        """지금까지의 LLM 실행률과 생략률"""
+        with self._lock:
+            total = self.stats['run'] + self.stats['skipped']
+            if not total:
+                return {'total': 0, 'run_rate': 0.0, 'skip_rate': 0.0}
+            return {
+                'total': total,
+                'run_rate': self.stats['run'] / total,
+                'skip_rate': self.stats['skipped'] / total
+            }
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from config import (
+    RERANKER_MODEL, RERANKER_MAX_CANDIDATES, RERANKER_BATCH_SIZE, RERANKER_MAX_LENGTH,
+    RERANKER_LATENCY_BUDGET_MS, RERANKER_CACHE_SIZE, RERANKER_MIN_SIMILARITY, RERANKER_WARM_UP
+)
+from common.menu_results import convert_result
+
+class CrossEncoderReranker:
+    """로컬 CPU cross-encoder로 벡터 단계 후보를 재정렬하는 2단계 (LLM 정교화 대체)
+
+    (검색어, 후보) 쌍을 한 번의 배치 forward pass로 점수화하고, 결과는 llm_refinement와 같은 형식
+    (llm_similarity, llm_reason, final_score 포함)으로 반환합니다.
+    part3 벡터 검색 결과뿐 아니라 part1 DataFrame, part2 결과 dict 목록도 그대로 받을 수 있습니다.
+
+    - 쌍 점수는 LRU 캐시에 보관해 같은 검색어/후보는 다시 계산하지 않음
+    - 측정한 쌍당 소요 시간으로 latency_budget_ms 안에 끝낼 수 있는 후보 수만 점수화하고,
+      나머지 후보는 벡터 순서대로 뒤에 붙임 (생성할 때 예열 호출로 첫 추정치를 잼)
+    - 여러 스레드에서 동시에 호출해도 되며, 캐시와 통계는 잠금 안에서만 읽고 씀
+    """
+
+    def __init__(self, model_name: str = RERANKER_MODEL, max_candidates: int = RERANKER_MAX_CANDIDATES,
+                 batch_size: int = RERANKER_BATCH_SIZE, max_length: int = RERANKER_MAX_LENGTH,
+                 latency_budget_ms: Optional[float] = RERANKER_LATENCY_BUDGET_MS,
+                 cache_size: int = RERANKER_CACHE_SIZE, min_similarity: float = RERANKER_MIN_SIMILARITY,
+                 model=None, warm_up: bool = RERANKER_WARM_UP):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder 모델 ID
+            max_candidates: 재정렬할 최대 후보 수
+            batch_size: 한 번의 forward pass에 넣을 쌍 수
+            max_length: 쌍 하나의 최대 토큰 수
+            latency_budget_ms: 점수 계산 시간 예산 (None이면 제한 없음)
+            cache_size: 쌍 점수 캐시 항목 수
+            min_similarity: 이 점수 미만 후보는 제외
+            model: 이미 로드한 CrossEncoder (테스트 등에서 주입)
+            warm_up: 생성할 때 예열 호출을 해 쌍당 소요 시간 추정치를 미리 채울지 여부
+                (끄면 첫 호출은 추정치가 없어 시간 예산 없이 모든 후보를 점수화)
+        """
+        if model is None:
+            try:
+                from sentence_transformers import CrossEncoder
+            except ImportError as e:
+                raise ImportError("cross-encoder 재정렬에는 sentence-transformers 패키지가 필요합니다.") from e
+            model = CrossEncoder(model_name, max_length=max_length, device='cpu')
+        self.model = model
+        # predict가 적용하는 활성화는 모델마다 고정 (단일 레이블 모델은 기본이 시그모이드).
+        # 활성화가 Identity라 로짓을 그대로 돌려주는 모델만 항상 시그모이드를 적용해 배치와 무관하게 같은 점수를 냄
+        activation = getattr(model, 'activation_fn', None) or getattr(model, 'default_activation_function', None)
+        self.apply_sigmoid = type(activation).__name__ == 'Identity'
+        self.model_name = model_name
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.latency_budget_ms = latency_budget_ms
+        self.cache_size = cache_size
+        self.min_similarity = min_similarity
+        self.seconds_per_pair = None  # 최근 측정한 쌍당 소요 시간 (지수 이동 평균)
+        self.truncated = 0  # 시간 예산 때문에 점수화하지 못한 후보 수 (누적)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()  # 캐시, seconds_per_pair, truncated 보호
+        self._predict_lock = threading.Lock()
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self):
+        """첫 predict의 지연 초기화 비용을 미리 치르고, 후보 한 묶음 크기의 호출로 쌍당 소요 시간을 잽니다."""
+        pairs = [['검색', f'메뉴 {i}'] for i in range(max(1, min(self.max_candidates, self.batch_size)))]
+        with self._predict_lock:
+            self.model.predict(pairs[:1], batch_size=self.batch_size, show_progress_bar=False)
+        self._predict(pairs)
+
+    def cache_key(self) -> List[Any]:
+        """검색 결과 캐시 키에 넣을 재정렬 설정"""
+        return [self.model_name, self.max_candidates, self.min_similarity]
+
+    def _candidate_text(self, result: Dict[str, Any]) -> str:
+        menu_data = result.get('menu_data') or {}
+        parts = [menu_data.get('Category'), menu_data.get('Service'), result['menu_name']]
+        return ' > '.join(str(part) for part in parts if part)
+
+    def _scorable_count(self, uncached: int) -> int:
+        """시간 예산 안에 점수화할 수 있는 새 쌍의 수 (self._lock 안에서 호출)"""
+        if self.latency_budget_ms is None or self.seconds_per_pair is None:
+            return uncached
+        return min(uncached, max(1, int(self.latency_budget_ms / 1000.0 / self.seconds_per_pair)))
+
+    def _predict(self, pairs: List[List[str]]) -> np.ndarray:
+        with self._predict_lock:
+            # 다른 요청의 predict를 기다린 시간은 쌍당 소요 시간에서 제외
+            start = time.perf_counter()
+            scores = np.asarray(self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False),
+                                dtype=np.float32).reshape(-1)
+            elapsed = (time.perf_counter() - start) / len(pairs)
+        with self._lock:
+            self.seconds_per_pair = elapsed if self.seconds_per_pair is None else 0.8 * self.seconds_per_pair + 0.2 * elapsed
+        if self.apply_sigmoid:
+            scores = 1.0 / (1.0 + np.exp(-scores))
+        return scores
+
+    def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[Optional[float]]:
+        """후보별 cross-encoder 점수 (시간 예산 때문에 계산하지 못한 후보는 None)"""
+        texts = [self._candidate_text(candidate) for candidate in candidates]
+        scores: List[Optional[float]] = [None] * len(candidates)
+        missing = []
+        with self._lock:
+            for i, text in enumerate(texts):
+                cached = self._cache.get((query, text))
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end((query, text))
+                    scores[i] = cached
+            # 벡터 순위가 높은 후보부터 시간 예산 안에서만 계산
+            allowed = self._scorable_count(len(missing))
+            self.truncated += len(missing) - allowed
+        missing = missing[:allowed]
+        if missing:
+            predicted = self._predict([[query, texts[i]] for i in missing])
+            with self._lock:
+                for i, value in zip(missing, predicted.tolist()):
+                    scores[i] = value
+                    self._cache[(query, texts[i])] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return scores
+
+    def rerank(self, query: str, results, max_results: int = 5) -> List[Dict[str, Any]]:
+        """벡터 단계 결과를 재정렬합니다 (part1 DataFrame, part2/part3 결과 목록 모두 가능)."""
+        if hasattr(results, 'to_dict'):
+            results = results.to_dict('records')
+        candidates = [convert_result(result) for result in results][:self.max_candidates]
+        if not candidates:
+            return []
+
+        scores = self.score(query, candidates)
+        reranked, unscored = [], []
+        for candidate, similarity in zip(candidates, scores):
+            if similarity is None:
+                unscored.append(candidate)
+                continue
+            if similarity < self.min_similarity:
+                continue
+            reranked.append({
+                'menu_name': candidate['menu_name'],
+                'menu_data': candidate['menu_data'],
+                'vector_score': candidate['vector_score'],
+                'llm_similarity': similarity,
+                'llm_reason': 'cross-encoder',
+                'final_score': candidate['vector_score'] * similarity
+            })
+        reranked.sort(key=lambda x: x['final_score'], reverse=True)
+
+        # 모두 기준 미만이면 벡터 결과를 그대로 반환 (llm_refinement와 같은 동작)
+        if not reranked and not unscored:
+            return candidates[:max_results]
+        return (reranked + unscored)[:max_results]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'cache_size': len(self._cache),
+                'ms_per_pair': self.seconds_per_pair * 1000.0 if self.seconds_per_pair is not None else None,
+                'truncated': self.truncated
+            }
@@ -1,5 +1,6 @@
 from menu_data_loader import MenuDataLoader
 from vector_llm_search import VectorLLMSearch
+from local_fallback import LocalSearchFallback
 from config import MENU_DATA_PATH
 
 # 메뉴 데이터 로드
@@ -8,8 +9,8 @@ if not data_loader.load_data():
     print("❌ 메뉴 데이터 로드에 실패했습니다.")
     exit(1)
 
-# 검색 시스템 초기화
-searcher = VectorLLMSearch()
+# 검색 시스템 초기화 (OpenAI 임베딩 회로가 열리면 part1/part2 로컬 검색 엔진으로 전환, 엔진 프로세스는 지금 미리 띄움)
+searcher = VectorLLMSearch(fallback_engine=LocalSearchFallback.from_config(MENU_DATA_PATH))
 
 # 검색어 입력
 query = input("검색어를 입력하세요: ").strip()
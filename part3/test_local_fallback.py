@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""OpenAI 임베딩 회로가 열렸을 때 part1 로컬 검색 엔진이 대신 답하는지 확인 (가짜 OpenAI 서버 사용)
+
+    python -m pytest test_local_fallback.py
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+import pytest
+
+pytest.importorskip('sentence_transformers')
+
+import config
+from fake_openai_server import FakeOpenAIHandler
+from local_fallback import LocalSearchFallback
+from vector_llm_search import VectorLLMSearch
+from common.llm_client import ResilientOpenAIClient
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ia-data.json')
+
+class FailingHandler(FakeOpenAIHandler):
+    failure_rate = 1.0
+
+@pytest.fixture
+def failing_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FailingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fallback(tmp_path):
+    fallback = LocalSearchFallback.from_config(DATA_FILE, part='part1', artifact=str(tmp_path / 'missing.seg'))
+    yield fallback
+    fallback.close()
+
+def test_open_circuit_uses_local_engine(failing_server, fallback, tmp_path, monkeypatch):
+    # 임베딩 캐시 파일(embeddings_cache.pkl)을 건드리지 않도록 빈 폴더에서 실행
+    monkeypatch.chdir(tmp_path)
+    client = ResilientOpenAIClient.from_config(config, api_key='test', base_url=failing_server, max_retries=0,
+                                               deadline=5.0, breaker_failures=1, breaker_reset=60.0)
+    searcher = VectorLLMSearch(verbose=False, client=client, fallback_engine=fallback, use_cache=False)
+    with open(DATA_FILE, encoding='utf-8') as f:
+        menu_data = json.load(f)
+    # 시작할 때 띄운 워커가 준비를 마친 뒤 장애 상황을 만듦
+    assert fallback.wait_ready(timeout=120)
+
+    results = searcher.search('회원가입', menu_data, max_results=3)
+
+    assert not client.is_available('embeddings')
+    assert len(results) == 3
+    assert results[0]['menu_name'] == '회원가입'
+    assert {'menu_name', 'menu_data', 'vector_score'} <= set(results[0])
+
+    # 회로가 열린 뒤에는 OpenAI를 거치지 않고 바로 로컬 엔진이 답함
+    assert searcher.search('계좌 이체', menu_data, max_results=3)
+
+def test_engine_runs_in_worker_process(fallback):
+    assert fallback.wait_ready(timeout=120)
+    assert fallback.search('회원가입', max_results=1)[0]['menu_name'] == '회원가입'
+    # part1 모듈은 part3 프로세스에 import되지 않음
+    assert fallback.process.pid != os.getpid()
+    assert 'search_engine' not in sys.modules and 'menu_processor' not in sys.modules
+    assert hasattr(sys.modules['config'], 'LOCAL_FALLBACK_PART')
+
+def test_worker_start_failure_returns_empty_results(tmp_path):
+    fallback = LocalSearchFallback('part1', str(tmp_path / 'missing.json'), timeout=30)
+    try:
+        assert fallback.search('회원가입') == []
+        assert fallback.load_error is not None
+    finally:
+        fallback.close()
@@ -2,70 +2,169 @@
 # -*- coding: utf-8 -*-
 
 import json
-import re
 import numpy as np
-from typing import List, Dict, Any, Optional
-from openai import OpenAI
-from config import OPENAI_API_KEY, OPENAI_MODEL
+import openai
+from typing import List, Dict, Any, Optional, Tuple
+import config
+from config import (
+    OPENAI_API_KEY, OPENAI_MODEL, EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, QUERY_EMBEDDING_CACHE_SIZE,
+    REFINEMENT_SYSTEM_PROMPT, LLM_MAX_CANDIDATES, LLM_PROMPT_TOKEN_BUDGET, LLM_MAX_TOKENS, LLM_TOKENS_PER_RESULT,
+    LLM_TOKENS_PER_REASON, LLM_INCLUDE_REASON, LLM_MIN_SIMILARITY, LLM_JSON_MODE_MODELS, RESULT_CACHE_PATH,
+    RESULT_CACHE_SIZE, FUZZY_ENABLED, FUZZY_MAX_DISTANCE, PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY, REDUCED_DIMENSION, REDUCTION_METHOD, REDUCTION_EVAL_QUERIES,
+    REDUCTION_EVAL_KS
+)
+from common.result_cache import ResultCache, content_hash
+from common.fuzzy_matcher import FuzzyMatcher
+from common.llm_client import ResilientOpenAIClient, estimate_tokens
+from common.profiling import Profiler
+from common.dim_reduction import Projection, recall_at_k, sample_rows
+from refinement_gate import RefinementGate
 import hashlib
 import pickle
 import os
+import threading
+from collections import OrderedDict
 
 class VectorLLMSearch:
     """벡터 임베딩 + LLM 2단계 검색 시스템"""
     
-    def __init__(self):
-        if not OPENAI_API_KEY:
+    def __init__(self, verbose: bool = True, gate: Optional[RefinementGate] = None,
+                 client: Optional[ResilientOpenAIClient] = None, fallback_engine=None, use_cache: bool = True,
+                 reranker=None, profiler: Optional[Profiler] = None,
+                 reduced_dimension: Optional[int] = REDUCED_DIMENSION, reduction_method: str = REDUCTION_METHOD):
+        """
+        Args:
+            verbose: 진행 상황 출력 여부
+            gate: LLM 정교화 실행 여부를 결정하는 정책
+            client: OpenAI 클라이언트 (기본값: 설정 파일 기반 ResilientOpenAIClient)
+            fallback_engine: OpenAI 회로가 열렸을 때 대신 사용할 로컬 검색 (LocalSearchFallback 등)
+            use_cache: 검색 결과 캐시 사용 여부
+            reranker: 2단계에서 LLM 대신 사용할 로컬 재정렬기 (CrossEncoderReranker 등)
+            profiler: 검색 cProfile 캡처/캐시 로드 메모리 보고 (기본값: 설정 파일 기반, 기본적으로 꺼짐)
+            reduced_dimension: 메뉴 임베딩 행렬을 이 차원으로 줄여 보관 (None이면 임베딩 차원 그대로)
+            reduction_method: 'truncate' (text-embedding-3처럼 앞쪽 차원만 써도 되는 모델) 또는 'pca'
+        """
+        if not OPENAI_API_KEY and client is None:
             raise ValueError("OpenAI API 키가 설정되지 않았습니다.")
         
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
+        self.client = client or ResilientOpenAIClient.from_config(config)
+        self.fallback_engine = fallback_engine
+        self.reranker = reranker
         self.model = OPENAI_MODEL
-        self.embeddings_cache = {}
+        self._json_mode_rejected = set()  # response_format을 400으로 거부한 모델
+        self.embeddings_cache = {}  # 메뉴 이름 임베딩 (float32 배열, embeddings_cache.pkl에 저장)
         self.cache_file = "embeddings_cache.pkl"
+        self._cache_dirty = False
+        self._cache_released = False  # 차원 축소 후 원래 차원 임베딩을 메모리에서 내렸는지 여부
+        # 검색어 임베딩은 파일에 저장하지 않고 최근 QUERY_EMBEDDING_CACHE_SIZE개만 보관
+        # (일괄 검색에서 입력 파일 크기만큼 메모리와 캐시 파일이 커지지 않도록)
+        self.query_embeddings = OrderedDict()
+        self._query_lock = threading.Lock()
+        self.verbose = verbose
+        self._catalog = None
+        self.reduced_dimension = reduced_dimension
+        self.reduction_method = reduction_method
+        self._projection = None
+        self.reduction = None  # 차원 축소 방식과 축소 전 대비 recall@k (카탈로그를 만들 때 기록)
+        self._fuzzy_matcher = None
+        self.gate = gate or RefinementGate()
+        self.result_cache = ResultCache('part3', RESULT_CACHE_PATH, RESULT_CACHE_SIZE) if use_cache else None
+        self._data_hash = None
+        self.profiler = profiler or Profiler(PROFILE_DIR, PROFILE_SAMPLE_RATE, PROFILE_MEMORY)
         self.load_cache()
     
+    def _log(self, message: str):
+        """진행 상황 메시지 출력 (verbose=False이면 생략)"""
+        if self.verbose:
+            print(message)
+    
     def load_cache(self):
         """임베딩 캐시 로드"""
+        with self.profiler.memory('load_cache'):
+            self._load_cache()
+
+    def _load_cache(self):
         try:
             if os.path.exists(self.cache_file):
                 with open(self.cache_file, 'rb') as f:
-                    self.embeddings_cache = pickle.load(f)
-                print(f"✅ 임베딩 캐시 로드됨 ({len(self.embeddings_cache)}개)")
+                    # 예전 형식(float 리스트)도 float32 배열로 변환해 보관 (리스트 대비 메모리 약 1/8)
+                    self.embeddings_cache = {key: np.asarray(value, dtype=np.float32)
+                                             for key, value in pickle.load(f).items()}
+                self._cache_released = False
+                self._log(f"✅ 임베딩 캐시 로드됨 ({len(self.embeddings_cache)}개)")
         except Exception as e:
             print(f"캐시 로드 실패: {e}")
             self.embeddings_cache = {}
     
     def save_cache(self):
-        """임베딩 캐시 저장"""
+        """임베딩 캐시 저장 (마지막 저장 뒤 새 메뉴 임베딩이 없으면 생략)"""
+        if not self._cache_dirty:
+            return
         try:
             with open(self.cache_file, 'wb') as f:
                 pickle.dump(self.embeddings_cache, f)
-            print(f"✅ 임베딩 캐시 저장됨 ({len(self.embeddings_cache)}개)")
+            self._cache_dirty = False
+            self._log(f"✅ 임베딩 캐시 저장됨 ({len(self.embeddings_cache)}개)")
         except Exception as e:
             print(f"캐시 저장 실패: {e}")
     
     def get_embedding(self, text: str) -> List[float]:
-        """텍스트의 임베딩 벡터를 가져옵니다."""
-        # 캐시 확인
-        text_hash = hashlib.md5(text.encode()).hexdigest()
-        if text_hash in self.embeddings_cache:
-            return self.embeddings_cache[text_hash]
-        
-        try:
-            response = self.client.embeddings.create(
-                model="text-embedding-3-small",
-                input=text
-            )
-            embedding = response.data[0].embedding
+        """검색어의 임베딩 벡터를 가져옵니다 (실패하면 빈 리스트)."""
+        return self.get_embeddings([text], persistent=False)[0]
+    
+    def _cached_embedding(self, text_hash: str):
+        embedding = self.embeddings_cache.get(text_hash)
+        if embedding is None:
+            with self._query_lock:
+                embedding = self.query_embeddings.get(text_hash)
+                if embedding is not None:
+                    self.query_embeddings.move_to_end(text_hash)
+        return embedding
+    
+    def _store_embedding(self, text_hash: str, embedding, persistent: bool):
+        if persistent:
+            # 내려 둔 캐시에 덧붙여 저장하면 파일의 다른 임베딩을 잃으므로 먼저 다시 읽음
+            if self._cache_released:
+                self._load_cache()
             self.embeddings_cache[text_hash] = embedding
-            return embedding
-        except Exception as e:
-            print(f"임베딩 생성 실패: {e}")
-            return []
+            self._cache_dirty = True
+            return
+        with self._query_lock:
+            self.query_embeddings[text_hash] = embedding
+            while len(self.query_embeddings) > QUERY_EMBEDDING_CACHE_SIZE:
+                self.query_embeddings.popitem(last=False)
+    
+    def get_embeddings(self, texts: List[str], persistent: bool = True) -> List[List[float]]:
+        """여러 텍스트의 임베딩을 가져옵니다. 캐시에 없는 텍스트만 묶어서 요청합니다.
+
+        persistent=True(메뉴 이름)이면 임베딩 캐시 파일에 저장하고, False(검색어)이면 크기가 제한된
+        프로세스 내 캐시에만 보관합니다. 임베딩은 float32 배열이고, 얻지 못한 텍스트는 빈 리스트입니다.
+        """
+        hashes = [hashlib.md5(text.encode()).hexdigest() for text in texts]
+        found = {text_hash: self._cached_embedding(text_hash) for text_hash in set(hashes)}
+        missing = list(dict.fromkeys(
+            text for text, text_hash in zip(texts, hashes) if found[text_hash] is None
+        ))
+        
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            chunk = missing[start:start + EMBEDDING_BATCH_SIZE]
+            try:
+                response = self.client.embeddings.create(
+                    model=EMBEDDING_MODEL,
+                    input=chunk
+                )
+                for data in response.data:
+                    text_hash = hashlib.md5(chunk[data.index].encode()).hexdigest()
+                    found[text_hash] = np.asarray(data.embedding, dtype=np.float32)
+                    self._store_embedding(text_hash, found[text_hash], persistent)
+            except Exception as e:
+                print(f"임베딩 생성 실패: {e}")
+        
+        return [found[text_hash] if found[text_hash] is not None else [] for text_hash in hashes]
     
     def cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
         """코사인 유사도 계산"""
-        if not vec1 or not vec2:
+        if len(vec1) == 0 or len(vec2) == 0:
             return 0.0
         
         vec1 = np.array(vec1)
@@ -80,53 +179,164 @@ class VectorLLMSearch:
         
         return dot_product / (norm1 * norm2)
     
-    def vector_search(self, query: str, menu_data: List[Dict[str, Any]], top_k: int = 20) -> List[Dict[str, Any]]:
-        """1단계: 벡터 임베딩 기반 검색"""
-        print("🔍 1단계: 벡터 임베딩 검색 수행 중...")
+    def _normalize_rows(self, matrix: np.ndarray) -> np.ndarray:
+        """행 단위 L2 정규화 (영벡터는 그대로 둠)"""
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+    
+    def _menu_data_hash(self, menu_data: List[Dict[str, Any]]) -> str:
+        """메뉴 데이터의 내용 해시 (같은 리스트 객체를 다시 넘기면 계산하지 않음)
+
+        MenuDataLoader.get_menu_data()는 호출마다 사본을 돌려주므로 카탈로그, 오타 색인, 결과 캐시는
+        리스트 객체가 아니라 이 해시로 같은 데이터인지 판단합니다.
+        """
+        if self._data_hash is None or self._data_hash[0] is not menu_data or self._data_hash[1] != len(menu_data):
+            self._data_hash = (menu_data, len(menu_data), content_hash(menu_data))
+        return self._data_hash[2]
+    
+    def _get_catalog(self, menu_data: List[Dict[str, Any]]):
+        """검색 대상 메뉴 이름과 정규화된 임베딩 행렬을 구성합니다 (같은 데이터면 재사용)."""
+        data_hash = self._menu_data_hash(menu_data)
+        if self._catalog is not None and self._catalog[0] == data_hash:
+            return self._catalog[1]
         
-        query_embedding = self.get_embedding(query)
-        if not query_embedding:
-            return []
+        # 차원 축소 후 내려 둔 메뉴 임베딩은 파일에서 다시 읽음
+        if self._cache_released:
+            self._load_cache()
         
-        results = []
         # 검색 범위를 늘려서 더 많은 후보 확보
         search_data = menu_data[:500] if len(menu_data) > 500 else menu_data
         
+        names, items = [], []
         for item in search_data:
             if isinstance(item, dict):
                 # 메뉴 이름 추출
                 menu_name = self._extract_menu_name(item)
                 if menu_name:
-                    # 키워드 매칭 우선 확인
-                    keyword_score = self._keyword_matching_score(query, menu_name)
-                    
-                    # 메뉴 이름의 임베딩 계산
-                    menu_embedding = self.get_embedding(menu_name)
-                    if menu_embedding:
-                        vector_similarity = self.cosine_similarity(query_embedding, menu_embedding)
-                        
-                        # 키워드 매칭이 있으면 우선 선택
-                        if keyword_score > 0:
-                            final_score = keyword_score * 0.7 + vector_similarity * 0.3
-                        else:
-                            # 키워드 매칭이 없으면 벡터 유사도가 높은 것만 선택
-                            final_score = vector_similarity
-                            if final_score < 0.3:  # 임계값을 더 엄격하게
-                                continue
-                        
-                        results.append({
-                            'menu_name': menu_name,
-                            'menu_data': item,
-                            'vector_score': final_score,
-                            'keyword_score': keyword_score,
-                            'vector_similarity': vector_similarity
-                        })
+                    names.append(menu_name)
+                    items.append(item)
+        
+        # 임베딩을 얻지 못한 메뉴는 후보에서 제외
+        embeddings = self.get_embeddings(names)
+        keep = [i for i, embedding in enumerate(embeddings) if len(embedding)]
+        names = [names[i] for i in keep]
+        items = [items[i] for i in keep]
+        if keep:
+            matrix = self._normalize_rows(np.array([embeddings[i] for i in keep], dtype=np.float32))
+        else:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        self._projection, self.reduction = None, None
+        if self.reduced_dimension and 0 < self.reduced_dimension < matrix.shape[1]:
+            matrix = self._reduce_catalog(matrix)
+            # 검색에는 축소한 행렬만 쓰므로 원래 차원 임베딩은 파일에 남기고 메모리에서 내림
+            # (다른 메뉴 데이터로 카탈로그를 다시 만들 때 파일에서 읽음)
+            self.save_cache()
+            if not self._cache_dirty:
+                self.embeddings_cache = {}
+                self._cache_released = True
+        
+        catalog = (names, items, matrix)
+        self._catalog = (data_hash, catalog)
+        return catalog
+    
+    def _reduce_catalog(self, matrix: np.ndarray) -> np.ndarray:
+        """메뉴 임베딩 행렬을 축소하고, 메뉴 자신을 쿼리로 한 이웃이 축소 전과 얼마나 겹치는지 기록합니다."""
+        projection = Projection.fit(matrix, self.reduced_dimension, self.reduction_method)
+        reduced = projection.transform(matrix)
+        rows = sample_rows(len(matrix), REDUCTION_EVAL_QUERIES)
+        recall = recall_at_k(matrix[rows], matrix, reduced[rows], reduced, REDUCTION_EVAL_KS, exclude=rows)
+        self._projection = projection
+        self.reduction = {**projection.describe(), 'eval_queries': len(rows),
+                          'recall': {f"@{k}": round(value, 4) for k, value in recall.items()}}
+        self._log(f"📉 임베딩 차원 축소: {projection.source_dimension} → {projection.dimension} "
+                  f"({self.reduction_method}, recall {self.reduction['recall']})")
+        return reduced
+    
+    def _query_matrix(self, embeddings: List[List[float]]) -> np.ndarray:
+        """검색어 임베딩을 카탈로그와 같은 공간의 정규화된 행렬로 변환합니다."""
+        matrix = self._normalize_rows(np.array(embeddings, dtype=np.float32))
+        return self._projection.transform(matrix) if self._projection is not None else matrix
+    
+    def rewrite_query(self, query: str, menu_data: List[Dict[str, Any]]) -> str:
+        """메뉴 용어의 자모 색인으로 검색어의 오타를 교정합니다 (같은 데이터면 색인 재사용)."""
+        if not FUZZY_ENABLED:
+            return query
+        data_hash = self._menu_data_hash(menu_data)
+        if self._fuzzy_matcher is None or self._fuzzy_matcher[0] != data_hash:
+            items = [item for item in menu_data if isinstance(item, dict)]
+            self._fuzzy_matcher = (data_hash, FuzzyMatcher.from_menu_data(items, FUZZY_MAX_DISTANCE))
+        rewritten = self._fuzzy_matcher[1].rewrite(query)
+        if rewritten != query:
+            self._log(f"✏️ 검색어 교정: '{query}' → '{rewritten}'")
+        return rewritten
+    
+    def _rank_candidates(self, query: str, similarities: np.ndarray, catalog, top_k: int) -> List[Dict[str, Any]]:
+        """벡터 유사도와 키워드 매칭 점수를 결합해 후보를 정렬합니다."""
+        names, items, _ = catalog
+        results = []
+        
+        for menu_name, item, vector_similarity in zip(names, items, similarities.tolist()):
+            # 키워드 매칭 우선 확인
+            keyword_score = self._keyword_matching_score(query, menu_name)
+            
+            # 키워드 매칭이 있으면 우선 선택
+            if keyword_score > 0:
+                final_score = keyword_score * 0.7 + vector_similarity * 0.3
+            else:
+                # 키워드 매칭이 없으면 벡터 유사도가 높은 것만 선택
+                final_score = vector_similarity
+                if final_score < 0.3:  # 임계값을 더 엄격하게
+                    continue
+            
+            results.append({
+                'menu_name': menu_name,
+                'menu_data': item,
+                'vector_score': final_score,
+                'keyword_score': keyword_score,
+                'vector_similarity': vector_similarity
+            })
         
         # 점수 순으로 정렬
         results.sort(key=lambda x: x['vector_score'], reverse=True)
-        print(f"✅ 벡터 검색 완료: {len(results)}개 결과 발견")
         return results[:top_k]
     
+    def vector_search(self, query: str, menu_data: List[Dict[str, Any]], top_k: int = 20) -> List[Dict[str, Any]]:
+        """1단계: 벡터 임베딩 기반 검색"""
+        self._log("🔍 1단계: 벡터 임베딩 검색 수행 중...")
+        
+        # 오타를 교정한 검색어로 임베딩과 키워드 매칭 수행
+        query = self.rewrite_query(query, menu_data)
+        query_embedding = self.get_embedding(query)
+        if len(query_embedding) == 0:
+            return []
+        
+        catalog = self._get_catalog(menu_data)
+        if not catalog[0]:
+            return []
+        
+        query_vector = self._query_matrix([query_embedding])[0]
+        results = self._rank_candidates(query, catalog[2] @ query_vector, catalog, top_k)
+        self._log(f"✅ 벡터 검색 완료: {len(results)}개 결과 발견")
+        return results
+    
+    def vector_search_many(self, queries: List[str], menu_data: List[Dict[str, Any]], top_k: int = 20) -> List[List[Dict[str, Any]]]:
+        """여러 검색어의 1단계 검색을 임베딩 요청 한 번과 행렬 곱 한 번으로 수행"""
+        queries = [self.rewrite_query(query, menu_data) for query in queries]
+        query_embeddings = self.get_embeddings(queries, persistent=False)
+        catalog = self._get_catalog(menu_data)
+        all_results = [[] for _ in queries]
+        
+        valid = [i for i, embedding in enumerate(query_embeddings) if len(embedding)]
+        if not valid or not catalog[0]:
+            return all_results
+        
+        query_matrix = self._query_matrix([query_embeddings[i] for i in valid])
+        similarities = query_matrix @ catalog[2].T
+        for row, i in enumerate(valid):
+            all_results[i] = self._rank_candidates(queries[i], similarities[row], catalog, top_k)
+        return all_results
+    
     def _keyword_matching_score(self, query: str, menu_name: str) -> float:
         """키워드 매칭 점수 계산"""
         query_words = set(query.lower().split())
@@ -156,55 +366,58 @@ class VectorLLMSearch:
         
         return None
     
-    def llm_refinement(self, query: str, vector_results: List[Dict[str, Any]], max_results: int = 5) -> List[Dict[str, Any]]:
+    def llm_refinement(self, query: str, vector_results: List[Dict[str, Any]], max_results: int = 5,
+                       use_gate: bool = True) -> List[Dict[str, Any]]:
         """2단계: LLM을 통한 검색 결과 정교화"""
-        print("🤖 2단계: LLM 정교화 수행 중...")
-        
+        return self._llm_refinement(query, vector_results, max_results, use_gate)[0]
+    
+    def _llm_refinement(self, query: str, vector_results: List[Dict[str, Any]], max_results: int = 5,
+                        use_gate: bool = True) -> Tuple[List[Dict[str, Any]], bool]:
+        """LLM 정교화 결과와, LLM 호출이 실패했거나 응답을 해석하지 못해 대체 결과를 반환했는지 여부"""
         if not vector_results:
-            return []
+            return [], False
         
-        # 상위 10개만 LLM에 전달 (더 정확한 결과를 위해)
-        top_candidates = vector_results[:10]
+        # 벡터 단계 결과가 확실하면 LLM 호출 생략
+        if use_gate:
+            run_llm, reason = self.gate.decide(vector_results)
+            if not run_llm:
+                self._log(f"⏭️ 2단계 생략: 벡터 검색 결과가 확실함 ({reason})")
+                return vector_results[:max_results], False
         
-        # 후보 텍스트 생성
-        candidates_text = ""
-        for i, result in enumerate(top_candidates, 1):
-            menu_name = result['menu_name']
-            score = result['vector_score']
-            keyword_score = result.get('keyword_score', 0)
-            candidates_text += f"{i}. {menu_name} (총점: {score:.3f}, 키워드: {keyword_score:.3f})\n"
+        self._log("🤖 2단계: LLM 정교화 수행 중...")
         
-        # LLM 프롬프트 생성
-        prompt = self._create_refinement_prompt(query, candidates_text, max_results)
+        # 후보에 짧은 번호를 부여하고 토큰 예산 안에서 프롬프트 구성
+        prompt, candidates = self._create_refinement_prompt(query, vector_results[:LLM_MAX_CANDIDATES], max_results)
         
         try:
             # OpenAI API 호출
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                model=self.model,
                 messages=[
-                    {"role": "system", "content": "당신은 메뉴 검색 전문가입니다. 사용자의 검색 의도를 정확히 파악하고 관련성 높은 메뉴만 선택해주세요. 관련성이 낮은 메뉴는 절대 선택하지 마세요."},
+                    {"role": "system", "content": REFINEMENT_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 temperature=0.1,  # 더 일관된 결과를 위해 낮춤
-                max_tokens=500
+                max_tokens=self._response_token_budget(max_results)
             )
             
             llm_response = response.choices[0].message.content.strip()
-            print(f"🤖 LLM 응답: {llm_response}")
+            self._log(f"🤖 LLM 응답: {llm_response}")
             
-            # JSON 파싱
-            refined_results = self._parse_llm_response(llm_response, vector_results)
+            # JSON 파싱 (해석할 수 없는 응답은 None)
+            refined_results = self._parse_llm_response(llm_response, candidates)
+            degraded = refined_results is None
             
-            # 유사도가 0.4 이상인 결과만 최종 반환 (완화)
-            final_results = [r for r in refined_results if r.get('similarity_score', 0) >= 0.4]
+            # 유사도가 기준 이상인 결과만 최종 반환
+            final_results = [r for r in refined_results or [] if r['llm_similarity'] >= LLM_MIN_SIMILARITY]
             
             # 결과가 없으면 벡터 유사도 상위 5개라도 무조건 출력
             if not final_results:
-                print("⚠️ LLM 필터를 통과한 결과가 없어, 벡터 유사도 상위 5개를 강제 출력합니다.")
-                return vector_results[:5]
+                self._log("⚠️ LLM 필터를 통과한 결과가 없어, 벡터 유사도 상위 5개를 강제 출력합니다.")
+                return vector_results[:5], degraded
             
-            print(f"✅ LLM 정교화 완료: {len(final_results)}개 최종 결과")
-            return final_results[:max_results]
+            self._log(f"✅ LLM 정교화 완료: {len(final_results)}개 최종 결과")
+            return final_results[:max_results], False
             
         except Exception as e:
             print(f"❌ LLM 정교화 오류: {e}")
@@ -212,8 +425,41 @@ class VectorLLMSearch:
             keyword_results = [r for r in vector_results if r.get('keyword_score', 0) > 0]
             if not keyword_results:
                 print("⚠️ LLM 오류 및 키워드 매칭 결과 없음, 벡터 유사도 상위 5개 강제 출력")
-                return vector_results[:5]
-            return keyword_results[:max_results]
+                return vector_results[:5], True
+            return keyword_results[:max_results], True
+    
+    def _chat_completion(self, **kwargs):
+        """JSON 모드를 지원하는 모델에만 response_format을 붙여 요청합니다.
+
+        지원 목록(LLM_JSON_MODE_MODELS)에 있어도 API가 response_format을 400으로 거부하면 빼고 다시 요청하고,
+        그 모델에는 이후 붙이지 않습니다 (JSON 응답은 시스템 프롬프트로도 요청하므로 파싱은 그대로 동작).
+        """
+        model = kwargs['model']
+        if not model.startswith(LLM_JSON_MODE_MODELS) or model in self._json_mode_rejected:
+            return self.client.chat.completions.create(**kwargs)
+        try:
+            return self.client.chat.completions.create(response_format={"type": "json_object"}, **kwargs)
+        except openai.BadRequestError as e:
+            if 'response_format' not in str(e):
+                raise
+            self._log(f"⚠️ {model} 모델은 JSON 모드를 지원하지 않아 response_format 없이 다시 요청합니다.")
+            self._json_mode_rejected.add(model)
+            return self.client.chat.completions.create(**kwargs)
+    
+    def refine(self, query: str, vector_results: List[Dict[str, Any]], max_results: int = 5) -> List[Dict[str, Any]]:
+        """2단계: 재정렬기가 있으면 로컬 cross-encoder로, 없으면 LLM으로 정교화"""
+        return self.refine_with_status(query, vector_results, max_results)[0]
+    
+    def refine_with_status(self, query: str, vector_results: List[Dict[str, Any]],
+                           max_results: int = 5) -> Tuple[List[Dict[str, Any]], bool]:
+        """refine()과 같되, LLM 실패로 키워드/벡터 결과로 대체했는지(degraded) 여부도 함께 반환합니다.
+
+        대체된 결과는 일시적인 장애의 산물이므로 결과 캐시처럼 오래 남는 곳에 저장하면 안 됩니다.
+        """
+        if self.reranker is None:
+            return self._llm_refinement(query, vector_results, max_results)
+        self._log("⚡ 2단계: cross-encoder 재정렬 수행 중...")
+        return self.reranker.rerank(query, vector_results, max_results), False
     
     def _format_candidates_for_llm(self, search_results: List[Dict[str, Any]]) -> str:
         """검색 결과를 LLM용 텍스트로 변환"""
@@ -238,103 +484,151 @@ class VectorLLMSearch:
         
         return "\n".join(formatted_items)
     
-    def _create_refinement_prompt(self, query: str, candidates_text: str, max_results: int) -> str:
-        """LLM 정교화용 프롬프트 생성"""
-        return f"""
-사용자가 "{query}"를 검색했습니다.
-
-다음은 벡터 검색으로 찾은 상위 후보들입니다:
-
-{candidates_text}
-
-위 후보들 중에서 사용자 검색어 "{query}"와 **실제로 관련이 있는** {max_results}개의 페이지/메뉴만 선택해주세요.
-
-**엄격한 매칭 기준:**
-1. **직접적인 단어 포함**: 검색어가 페이지명에 직접 포함되어야 함
-2. **기능적 연관성**: 검색어와 페이지 기능이 실제로 연관되어야 함
-3. **의미적 일치**: 검색어의 의미와 페이지 기능이 일치해야 함
-
-**절대 제외할 것:**
-- 검색어와 전혀 관련 없는 페이지
-- 단순히 비슷한 단어만 있는 페이지
-- 기능적으로 연관되지 않은 페이지
-- 추상적이거나 모호한 연관성
-
-**선택한 메뉴들을 JSON 형식으로 반환해주세요:**
-[
-  {{
-    "menu_name": "페이지명",
-    "similarity_score": 0.95,
-    "reason": "구체적인 연관성 이유"
-  }}
-]
-
-유사도 점수는 0.0~1.0 사이로 주세요. 
-- 완전 일치: 0.9~1.0
-- 높은 연관성: 0.7~0.8
-- 중간 연관성: 0.5~0.6
-- 낮은 연관성: 0.3~0.4
-- 관련 없음: 0.0~0.2 (선택하지 마세요)
-"""
-    
-    def _parse_llm_response(self, content: str, vector_results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """LLM 응답을 파싱하여 결과 리스트로 변환"""
+    def _response_token_budget(self, max_results: int) -> int:
+        """응답 max_tokens: 결과 수에 비례하되 상한을 넘지 않음"""
+        per_result = LLM_TOKENS_PER_RESULT + (LLM_TOKENS_PER_REASON if LLM_INCLUDE_REASON else 0)
+        return min(LLM_MAX_TOKENS, 16 + per_result * max_results)
+    
+    def _create_refinement_prompt(self, query: str, vector_results: List[Dict[str, Any]], max_results: int):
+        """LLM 정교화용 프롬프트와 {번호: 후보} 매핑 생성
+        
+        후보는 번호로만 참조하고, 프롬프트 추정 토큰이 LLM_PROMPT_TOKEN_BUDGET을 넘지 않도록
+        점수가 낮은 후보부터 잘라냅니다.
+        """
+        item_format = '{"id":1,"s":0.9,"why":"<=8 words"}' if LLM_INCLUDE_REASON else '{"id":1,"s":0.9}'
+        header = f"q: {query}\nid|page|service\n"
+        footer = (
+            f'\nReturn JSON {{"r":[{item_format}]}}: up to {max_results} ids truly relevant to q, best first. '
+            "s=relevance 0-1. Omit unrelated ids."
+        )
+        used_tokens = estimate_tokens(REFINEMENT_SYSTEM_PROMPT + header + footer)
+        
+        lines = []
+        candidates = {}
+        for candidate_id, result in enumerate(vector_results, 1):
+            service = result.get('menu_data', {}).get('Service', '')
+            line = f"{candidate_id}|{result['menu_name']}|{service}\n"
+            line_tokens = estimate_tokens(line)
+            if lines and used_tokens + line_tokens > LLM_PROMPT_TOKEN_BUDGET:
+                break
+            used_tokens += line_tokens
+            lines.append(line)
+            candidates[candidate_id] = result
+        
+        return header + "".join(lines) + footer, candidates
+    
+    def _parse_llm_response(self, content: str, candidates: Dict[int, Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """LLM 응답(JSON)을 파싱하여 결과 리스트로 변환 (번호로 후보를 바로 찾음, 해석할 수 없는 응답이면 None)"""
         try:
-            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group()
-                llm_results = json.loads(json_str)
-                
-                final_results = []
-                for llm_result in llm_results:
-                    if isinstance(llm_result, dict) and 'menu_name' in llm_result:
-                        menu_name = llm_result['menu_name']
-                        
-                        # 벡터 검색 결과에서 해당 메뉴 찾기
-                        for vector_result in vector_results:
-                            if vector_result['menu_name'] == menu_name:
-                                final_result = {
-                                    'menu_name': menu_name,
-                                    'menu_data': vector_result['menu_data'],
-                                    'vector_score': vector_result['vector_score'],
-                                    'llm_similarity': float(llm_result.get('similarity_score', 0.0)),
-                                    'llm_reason': str(llm_result.get('reason', 'LLM 매칭')),
-                                    'final_score': vector_result['vector_score'] * float(llm_result.get('similarity_score', 0.0))
-                                }
-                                final_results.append(final_result)
-                                break
-                
-                final_results.sort(key=lambda x: x['final_score'], reverse=True)
-                return final_results
-            else:
-                print("LLM 응답에서 JSON을 찾을 수 없습니다.")
-                return []
-                
+            parsed = json.loads(content)
         except json.JSONDecodeError as e:
             print(f"LLM 응답 JSON 파싱 오류: {e}")
-            return []
-        except Exception as e:
-            print(f"LLM 응답 파싱 중 오류 발생: {e}")
-            return []
+            return None
+        
+        items = parsed.get('r', []) if isinstance(parsed, dict) else parsed
+        if not isinstance(items, list):
+            print("LLM 응답에서 결과 목록을 찾을 수 없습니다.")
+            return None
+        
+        final_results = []
+        seen = set()
+        for llm_result in items:
+            if not isinstance(llm_result, dict):
+                continue
+            try:
+                candidate_id = int(llm_result.get('id'))
+                similarity = float(llm_result.get('s', 0.0))
+            except (TypeError, ValueError):
+                continue
+            
+            vector_result = candidates.get(candidate_id)
+            if vector_result is None or candidate_id in seen:
+                continue
+            seen.add(candidate_id)
+            
+            final_results.append({
+                'menu_name': vector_result['menu_name'],
+                'menu_data': vector_result['menu_data'],
+                'vector_score': vector_result['vector_score'],
+                'llm_similarity': similarity,
+                'llm_reason': str(llm_result.get('why') or 'LLM 매칭'),
+                'final_score': vector_result['vector_score'] * similarity
+            })
+        
+        final_results.sort(key=lambda x: x['final_score'], reverse=True)
+        return final_results
     
-    def search(self, query: str, menu_data: List[Dict[str, Any]], max_results: int = 5) -> List[Dict[str, Any]]:
-        """벡터 임베딩 + LLM 2단계 검색 수행"""
-        print(f"🔍 '{query}' 2단계 검색 시작...")
-        print("-" * 50)
+    def fallback_available(self) -> bool:
+        """로컬 검색 엔진이 있고 OpenAI 임베딩 회로가 열려 있는지 여부"""
+        return self.fallback_engine is not None and not self.client.is_available('embeddings')
+    
+    def fallback_search(self, query: str, max_results: int) -> List[Dict[str, Any]]:
+        """OpenAI 대신 로컬 검색 엔진으로 검색"""
+        self._log("⚠️ OpenAI 사용 불가: 로컬 검색 엔진으로 전환합니다.")
+        results = self.fallback_engine.search(query, max_results)
+        # 재정렬기는 네트워크 없이 동작하므로 로컬 검색 결과에도 적용
+        return self.reranker.rerank(query, results, max_results) if self.reranker is not None else results
+    
+    def _cache_params(self, menu_data: List[Dict[str, Any]], max_results: int) -> Dict[str, Any]:
+        """검색 결과에 영향을 주는 데이터/모델/설정 (캐시 키에 포함)"""
+        return {
+            'data': self._menu_data_hash(menu_data),
+            'models': [EMBEDDING_MODEL, self.model],
+            'fuzzy': [FUZZY_ENABLED, FUZZY_MAX_DISTANCE],
+            'gate': [self.gate.enabled, self.gate.skip_on_keyword_match, self.gate.min_score, self.gate.min_margin],
+            'refinement': [LLM_MAX_CANDIDATES, LLM_PROMPT_TOKEN_BUDGET, LLM_INCLUDE_REASON, LLM_MIN_SIMILARITY],
+            'reranker': self.reranker.cache_key() if self.reranker is not None else None,
+            'reduction': [self.reduced_dimension, self.reduction_method],
+            'max_results': max_results
+        }
+    
+    def search(self, query: str, menu_data: List[Dict[str, Any]], max_results: int = 5,
+               profile: bool = False) -> List[Dict[str, Any]]:
+        """벡터 임베딩 + LLM 2단계 검색 수행
+
+        profile=True이거나 PROFILE_SAMPLE_RATE 비율에 뽑힌 검색은 cProfile로 기록해 PROFILE_DIR에 저장합니다.
+        """
+        if self.profiler.sampled(profile):
+            with self.profiler.profile(f"search-{query}"):
+                return self._search(query, menu_data, max_results)
+        return self._search(query, menu_data, max_results)
+
+    def _search(self, query: str, menu_data: List[Dict[str, Any]], max_results: int) -> List[Dict[str, Any]]:
+        self._log(f"🔍 '{query}' 2단계 검색 시작...")
+        self._log("-" * 50)
+        
+        cache_params = self._cache_params(menu_data, max_results) if self.result_cache is not None else None
+        if cache_params is not None:
+            cached = self.result_cache.get(query, **cache_params)
+            if cached is not None:
+                self._log("✅ 캐시된 검색 결과 사용")
+                return cached
+        
+        # OpenAI 임베딩 회로가 열려 있으면 타임아웃을 기다리지 않고 로컬 검색으로 전환
+        if self.fallback_available():
+            return self.fallback_search(query, max_results)
         
         # 1단계: 벡터 검색
         vector_results = self.vector_search(query, menu_data, top_k=20)
         
+        # 1단계 도중 회로가 열린 경우
+        if not vector_results and self.fallback_available():
+            return self.fallback_search(query, max_results)
+        
         if not vector_results:
-            print("❌ 벡터 검색 결과가 없습니다.")
+            self._log("❌ 벡터 검색 결과가 없습니다.")
             return []
         
-        # 2단계: LLM 검색 결과 정교화
-        refined_results = self.llm_refinement(query, vector_results, max_results)
+        # 2단계: LLM(또는 로컬 재정렬기)로 검색 결과 정교화
+        refined_results, degraded = self.refine_with_status(query, vector_results, max_results)
         
         # 캐시 저장
         self.save_cache()
         
+        # LLM 호출이 실패해 대체된 결과는 만료되지 않는 결과 캐시에 남기지 않음 (회로가 열리기 전의 일회성 실패 포함)
+        if cache_params is not None and not degraded:
+            self.result_cache.set(query, refined_results, **cache_params)
+        
         return refined_results
     
     def format_results(self, results: List[Dict[str, Any]]) -> str:
@@ -347,15 +641,17 @@ class VectorLLMSearch:
         for i, result in enumerate(results, 1):
             menu_name = result['menu_name']
             vector_score = result['vector_score']
-            llm_similarity = result['llm_similarity']
-            final_score = result['final_score']
-            reason = result['llm_reason']
+            # 2단계를 생략했거나 재정렬 시간 예산 밖의 후보는 벡터 점수만 있음
+            llm_similarity = result.get('llm_similarity')
+            final_score = result.get('final_score', vector_score)
+            reason = result.get('llm_reason', '벡터 검색 결과')
             
             menu_data = result['menu_data']
             
             formatted_lines.append(f"\n{i}. {menu_name}")
             formatted_lines.append(f"   벡터 점수: {vector_score:.3f}")
-            formatted_lines.append(f"   LLM 연관도: {llm_similarity:.3f}")
+            if llm_similarity is not None:
+                formatted_lines.append(f"   LLM 연관도: {llm_similarity:.3f}")
             formatted_lines.append(f"   최종 점수: {final_score:.3f}")
             formatted_lines.append(f"   연관성 이유: {reason}")
             